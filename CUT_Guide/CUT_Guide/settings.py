@@ -57,7 +57,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so its timings cover the whole stack; inert unless enabled
+    'Navigator.middleware.PerfMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Buffers search/route analytics in memory; inert unless enabled
+    'Navigator.middleware.AnalyticsMiddleware',
+    # Answers /static/ before sessions and auth; inert unless enabled
+    'Navigator.middleware.StaticAssetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -126,6 +132,22 @@ STATICFILES_DIRS = [
 # Where collectstatic will collect files for production
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# collectstatic bundles and minifies css/js (Navigator/assets.py), gives
+# every file a content-hashed name and writes .gz/.br siblings
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "Navigator.storage.AssetManifestStorage"},
+}
+
+# Set `NAVIGATOR_SERVE_STATIC` to 'True' on hosts without a static file
+# server mapping: the app then serves STATIC_ROOT itself, precompressed and
+# with immutable caching for hashed names.
+NAVIGATOR_SERVE_STATIC = os.environ.get('NAVIGATOR_SERVE_STATIC', 'False').lower() in ('1', 'true', 'yes')
+
+# Uploaded files (floorplans) and the tiles generated from them
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / "media"
+
 # Messages Configuration
 from django.contrib.messages import constants as messages
 MESSAGE_TAGS = {
@@ -137,6 +159,63 @@ MESSAGE_TAGS = {
 }
 
 
+# ------------------------------------------------------------
+# PERFORMANCE INSTRUMENTATION
+# ------------------------------------------------------------
+# Set `NAVIGATOR_PERF` to 'True' to add Server-Timing headers and expose
+# per-view histograms at /metrics. Off by default: the middleware then
+# removes itself from the stack and /metrics returns 404.
+NAVIGATOR_PERF_ENABLED = os.environ.get('NAVIGATOR_PERF', 'False').lower() in ('1', 'true', 'yes')
+
+# REQUEST ANALYTICS
+# ------------------------------------------------------------
+# Set `NAVIGATOR_ANALYTICS` to 'True' to record search terms and route
+# requests with their latency. Events are buffered in memory and written in
+# batches by a background thread; `manage.py analytics_report` summarizes
+# them.
+NAVIGATOR_ANALYTICS_ENABLED = os.environ.get('NAVIGATOR_ANALYTICS', 'False').lower() in ('1', 'true', 'yes')
+
+# API RATE LIMITING
+# ------------------------------------------------------------
+# Token buckets per client IP (and per account when signed in) on the JSON
+# APIs; see Navigator/ratelimit.py for the default rates per scope, and
+# override them with e.g. NAVIGATOR_RATE_LIMITS = {'routing': (30, 10)}
+# (requests per minute, burst). Buckets live in the default cache, so use a
+# shared cache (Redis, Memcached) when running several worker processes.
+# Behind a reverse proxy set `NAVIGATOR_RATELIMIT_PROXIES` to the number of
+# proxies adding X-Forwarded-For, or every client shares one bucket.
+NAVIGATOR_RATELIMIT_ENABLED = os.environ.get('NAVIGATOR_RATELIMIT', 'True').lower() in ('1', 'true', 'yes')
+NAVIGATOR_RATELIMIT_PROXIES = int(os.environ.get('NAVIGATOR_RATELIMIT_PROXIES', '0'))
+
+# SHARED ROUTING GRAPH
+# ------------------------------------------------------------
+# With several worker processes (gunicorn -w N), point this at a directory
+# on tmpfs (e.g. /dev/shm/cut-guide) so the routing graph is built once and
+# memory-mapped by every worker instead of each holding its own copy.
+# Empty (the default) keeps a private graph per process.
+NAVIGATOR_SHARED_GRAPH_DIR = os.environ.get('NAVIGATOR_SHARED_GRAPH_DIR', '')
+
+# ROUTE WARMUP
+# ------------------------------------------------------------
+# Set `NAVIGATOR_WARMUP_ON_STARTUP` to 'True' to build the routing graphs and
+# refresh the most recently used cached routes in a background thread when
+# the server starts. `manage.py warm_routes` does the same on demand.
+NAVIGATOR_WARMUP_ON_STARTUP = os.environ.get('NAVIGATOR_WARMUP_ON_STARTUP', 'False').lower() in ('1', 'true', 'yes')
+NAVIGATOR_WARMUP_LIMIT = int(os.environ.get('NAVIGATOR_WARMUP_LIMIT', '200'))
+
+# PROJECTED COORDINATES
+# ------------------------------------------------------------
+# UTM zone that buildings, rooms and service points are projected onto for
+# planar distance math (WGS 84 / UTM 36S, EPSG:32736, covers Chinhoyi).
+# After changing it run `manage.py reproject`.
+NAVIGATOR_UTM_ZONE = os.environ.get('NAVIGATOR_UTM_ZONE', '36K')
+
+# FLOORPLAN TILES
+# ------------------------------------------------------------
+# Background threads that cut uploaded floorplans into tiles and thumbnails.
+NAVIGATOR_TILE_WORKERS = int(os.environ.get('NAVIGATOR_TILE_WORKERS', '2'))
+
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -1,7 +1,7 @@
 
 # Register your models here.
 from django.contrib import admin
-from .models import Building, Room, ServicePoint, Route, Floor, Pathway, ServiceArea
+from .models import Building, Room, ServicePoint, Route, Floor, Pathway, PathwayClosure, ServiceArea
 
 
 @admin.register(Building)
@@ -37,6 +37,14 @@ class PathwayAdmin(admin.ModelAdmin):
     list_filter = ('pathway_type', 'is_accessible')
 
 
+@admin.register(PathwayClosure)
+class PathwayClosureAdmin(admin.ModelAdmin):
+    list_display = ('pathway', 'reason', 'starts_at', 'ends_at')
+    list_filter = ('pathway__pathway_type',)
+    search_fields = ('reason', 'pathway__name')
+    readonly_fields = ('created_at',)
+
+
 @admin.register(Route)
 class RouteAdmin(admin.ModelAdmin):
     list_display = ('start_point', 'end_point', 'distance_meters', 'is_accessible')
@@ -0,0 +1,219 @@
+"""
+Search and route request analytics.
+
+AnalyticsMiddleware (see middleware.py) hands every search term and route
+pair, with its latency, to record(), which appends one tuple to an
+in-memory ring buffer and returns: the request never waits on the
+database. A daemon thread per process writes the buffer to RequestEvent
+with bulk_create, every FLUSH_INTERVAL seconds or as soon as BATCH_SIZE
+events are waiting, and once more when the process exits.
+
+The buffer holds at most CAPACITY events. If the database falls behind,
+the oldest events are overwritten and counted as dropped rather than
+letting memory grow or requests block.
+
+The report functions aggregate the stored events; top_route_pairs() also
+feeds `warm_routes --from-analytics`.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Avg, Count, Max
+from django.utils import timezone
+
+from .models import RequestEvent
+
+logger = logging.getLogger(__name__)
+
+CAPACITY = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 5.0
+
+MAX_TERM_LENGTH = RequestEvent._meta.get_field('term').max_length
+
+# Report window and size defaults
+DEFAULT_DAYS = 7
+DEFAULT_TOP = 10
+
+
+def is_enabled():
+    return getattr(settings, 'NAVIGATOR_ANALYTICS_ENABLED', False)
+
+
+class RingBuffer:
+    """Bounded FIFO of event tuples; full buffers overwrite their oldest entry"""
+
+    def __init__(self, capacity=CAPACITY):
+        self.events = deque(maxlen=capacity)
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def __len__(self):
+        return len(self.events)
+
+    def append(self, event):
+        with self.lock:
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            self.events.append(event)
+            if len(self.events) >= BATCH_SIZE:
+                self.ready.set()
+
+    def drain(self, limit):
+        with self.lock:
+            return [self.events.popleft() for _ in range(min(limit, len(self.events)))]
+
+
+_buffer = RingBuffer()
+_flusher = None
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def normalize_term(term):
+    return ' '.join(term.lower().split())[:MAX_TERM_LENGTH]
+
+
+def record(kind, duration, status=200, term='', start_id=None, end_id=None, accessible=False):
+    """Queue one request for the next batch write; duration in seconds"""
+    _buffer.append((kind, term, start_id, end_id, accessible, status, duration * 1000, timezone.now()))
+    if _flusher_pid != os.getpid():
+        _start_flusher()
+
+
+def record_search(term, duration, status=200):
+    term = normalize_term(term)
+    if term:
+        record('search', duration, status, term=term)
+
+
+def record_route(start_id, end_id, accessible, duration, status=200):
+    record('route', duration, status, start_id=start_id, end_id=end_id, accessible=accessible)
+
+
+# =====================================================
+# BACKGROUND FLUSH
+# =====================================================
+
+def flush():
+    """
+    Write every buffered event in batches.
+    Returns: number of events written
+    """
+    written = 0
+    while True:
+        batch = _buffer.drain(BATCH_SIZE)
+        if not batch:
+            return written
+        try:
+            RequestEvent.objects.bulk_create([
+                RequestEvent(
+                    kind=kind, term=term, start_id=start_id, end_id=end_id, accessible=accessible,
+                    status=status, duration_ms=duration_ms, created_at=created_at,
+                )
+                for kind, term, start_id, end_id, accessible, status, duration_ms, created_at in batch
+            ])
+            written += len(batch)
+        except Exception:
+            # Analytics must never take the site down; lose this batch only
+            logger.exception('Failed to write %d analytics event(s)', len(batch))
+
+
+def _run():
+    while True:
+        _buffer.ready.wait(FLUSH_INTERVAL)
+        _buffer.ready.clear()
+        try:
+            flush()
+        finally:
+            # A connection idling between flushes would outlive CONN_MAX_AGE
+            connection.close()
+
+
+def _start_flusher():
+    """Start this process's flush thread (again after a fork, which does not copy threads)"""
+    global _flusher, _flusher_pid
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        if _flusher_pid is None:
+            atexit.register(flush)
+        _flusher = threading.Thread(target=_run, name='navigator-analytics', daemon=True)
+        _flusher.start()
+        _flusher_pid = os.getpid()
+
+
+def buffer_stats():
+    return {'buffered': len(_buffer), 'dropped': _buffer.dropped}
+
+
+# =====================================================
+# REPORTS
+# =====================================================
+
+def _events(kind, days):
+    events = RequestEvent.objects.filter(kind=kind)
+    if days:
+        events = events.filter(created_at__gte=timezone.now() - timedelta(days=days))
+    return events
+
+
+def top_searches(limit=DEFAULT_TOP, days=DEFAULT_DAYS):
+    """Returns: list of dicts with term, count and avg_ms, most searched first"""
+    rows = (
+        _events('search', days).values('term')
+        .annotate(count=Count('id'), avg_ms=Avg('duration_ms'))
+        .order_by('-count', 'term')
+    )
+    return list(rows[:limit])
+
+
+def top_routes(limit=DEFAULT_TOP, days=DEFAULT_DAYS):
+    """Returns: list of dicts with start_id, end_id, accessible, count, avg_ms and max_ms, most requested first"""
+    rows = (
+        _events('route', days).filter(status__lt=400).values('start_id', 'end_id', 'accessible')
+        .annotate(count=Count('id'), avg_ms=Avg('duration_ms'), max_ms=Max('duration_ms'))
+        .order_by('-count', 'start_id', 'end_id')
+    )
+    return list(rows[:limit])
+
+
+def top_route_pairs(limit=DEFAULT_TOP, days=DEFAULT_DAYS):
+    """The most requested routes as (start_id, end_id, accessible), for warm_routes"""
+    return [(row['start_id'], row['end_id'], row['accessible']) for row in top_routes(limit, days)]
+
+
+def latency_summary(days=DEFAULT_DAYS, percentiles=(50, 95, 99)):
+    """
+    Request count and latency percentiles per kind, read by offset from the
+    sorted durations rather than by loading them all.
+    Returns: {kind: {'count': n, 'p50': ms, ...}}
+    """
+    summary = {}
+    for kind, _ in RequestEvent.KIND_CHOICES:
+        events = _events(kind, days)
+        count = events.count()
+        if not count:
+            continue
+        durations = events.order_by('duration_ms').values_list('duration_ms', flat=True)
+        summary[kind] = {'count': count}
+        for percentile in percentiles:
+            summary[kind][f'p{percentile}'] = durations[min(count - 1, count * percentile // 100)]
+    return summary
+
+
+def prune(days):
+    """
+    Delete events older than days.
+    Returns: number of events deleted
+    """
+    deleted, _ = RequestEvent.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
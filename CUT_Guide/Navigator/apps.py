@@ -1,6 +1,26 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class NavigatorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Navigator'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if getattr(settings, 'NAVIGATOR_WARMUP_ON_STARTUP', False) and _is_serving():
+            from .warmup import start_background_warmup
+            start_background_warmup()
+
+
+def _is_serving():
+    """True in a server process, not in other management commands or runserver's reloader parent"""
+    if os.path.basename(sys.argv[0]) != 'manage.py':
+        return True
+    return sys.argv[1:2] == ['runserver'] and (
+        os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+    )
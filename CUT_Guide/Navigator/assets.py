@@ -0,0 +1,171 @@
+"""
+Static asset bundles and precompression.
+
+collectstatic (through storage.AssetManifestStorage) concatenates and
+minifies each bundle below, gives every file a content-hashed name and
+writes .gz and, when the optional brotli package is installed, .br
+siblings. Pages then load one stylesheet and one script whose URLs never
+change meaning, so they can be cached forever (see
+middleware.StaticAssetMiddleware).
+
+Third-party libraries are vendored under static/vendor/ by
+``python manage.py vendor_assets``. Until that has been run, the
+{% bundle %} tag loads any missing vendored file from its CDN instead, so
+pages keep working either way. Under DEBUG the bundle tag emits one tag
+per source file so edits show up without running collectstatic.
+"""
+
+import gzip
+import os
+import posixpath
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Vendored file (relative to static/) -> where vendor_assets fetches it and
+# where pages load it from until it is vendored
+VENDOR_ASSETS = {
+    'vendor/bootstrap/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js',
+    'vendor/leaflet/leaflet.css': 'https://unpkg.com/leaflet@1.9.4/dist/leaflet.css',
+    'vendor/leaflet/leaflet.js': 'https://unpkg.com/leaflet@1.9.4/dist/leaflet.js',
+    'vendor/leaflet/images/layers.png': 'https://unpkg.com/leaflet@1.9.4/dist/images/layers.png',
+    'vendor/leaflet/images/layers-2x.png': 'https://unpkg.com/leaflet@1.9.4/dist/images/layers-2x.png',
+    'vendor/leaflet/images/marker-icon.png': 'https://unpkg.com/leaflet@1.9.4/dist/images/marker-icon.png',
+    'vendor/leaflet/images/marker-icon-2x.png': 'https://unpkg.com/leaflet@1.9.4/dist/images/marker-icon-2x.png',
+    'vendor/leaflet/images/marker-shadow.png': 'https://unpkg.com/leaflet@1.9.4/dist/images/marker-shadow.png',
+}
+
+# Bundle -> its sources in load order
+BUNDLES = {
+    'bundles/app.css': [
+        'vendor/bootstrap/bootstrap.min.css',
+        'vendor/leaflet/leaflet.css',
+        'css/style.css',
+    ],
+    'bundles/app.js': [
+        'vendor/bootstrap/bootstrap.bundle.min.js',
+        'vendor/leaflet/leaflet.js',
+        'js/index.js',
+    ],
+}
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+# Smaller files gain nothing worth a second request path
+MIN_COMPRESS_SIZE = 256
+
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+?)\1\s*\)''')
+JS_LINE_COMMENT = re.compile(r'^\s*//.*$', re.M)
+
+
+@lru_cache(maxsize=None)
+def _find_cached(path):
+    return finders.find(path)
+
+
+def find_source(path):
+    """Absolute path of a static source file, or None"""
+    return finders.find(path) if settings.DEBUG else _find_cached(path)
+
+
+def source_url(path):
+    """Static URL of a source file, or its CDN URL while it is not vendored"""
+    from django.templatetags.static import static
+
+    if path in VENDOR_ASSETS and not find_source(path):
+        return VENDOR_ASSETS[path]
+    return static(path)
+
+
+def minify_css(text):
+    """Conservative CSS minifier: drops comments and insignificant whitespace"""
+    text = CSS_COMMENT.sub('', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip() + '\n'
+
+
+def minify_js(text):
+    """
+    Whitespace-only JS minifier: strips indentation, blank lines and
+    whole-line // comments but keeps line breaks, so automatic semicolon
+    insertion behaves exactly as in the source.
+    """
+    text = JS_LINE_COMMENT.sub('', text)
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip()) + '\n'
+
+
+def rewrite_css_urls(text, source, bundle):
+    """Re-point relative url()s in source so they still resolve from the bundle's directory"""
+    source_dir = posixpath.dirname(source)
+    bundle_dir = posixpath.dirname(bundle)
+
+    def rewrite(match):
+        quote, url = match.groups()
+        if re.match(r'^(?:[a-z]+:|/|#)', url, re.I):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(source_dir, url))
+        return f'url({quote}{posixpath.relpath(target, bundle_dir)}{quote})'
+
+    return CSS_URL.sub(rewrite, text)
+
+
+def build_bundle(name):
+    """
+    Concatenate and minify a bundle's sources.
+    Returns: (content, sources included, sources missing)
+    """
+    parts, included, missing = [], [], []
+    for source in BUNDLES[name]:
+        path = find_source(source)
+        if path is None:
+            missing.append(source)
+            continue
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        if name.endswith('.css'):
+            text = rewrite_css_urls(text, source, name)
+        if not source.endswith(('.min.css', '.min.js')):
+            text = minify_css(text) if name.endswith('.css') else minify_js(text)
+        parts.append(text)
+        included.append(source)
+    # ';' keeps a script that ends without one from running into the next
+    separator = '\n' if name.endswith('.css') else ';\n'
+    return separator.join(parts), included, missing
+
+
+def compress_file(path):
+    """
+    Write .gz (and .br with brotli installed) beside path when it is a
+    compressible type and compression pays off.
+    Returns: list of files written
+    """
+    if not path.endswith(COMPRESSIBLE_EXTENSIONS):
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+
+    written = []
+    encoders = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encoders.append(('.br', lambda d: brotli.compress(d, quality=11)))
+    for suffix, encode in encoders:
+        compressed = encode(data)
+        if len(compressed) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(path + suffix)
+        elif os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+    return written
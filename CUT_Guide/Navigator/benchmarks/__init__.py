@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for CUT Guide.
+
+Run with ``python manage.py run_benchmarks``; see synthetic.py for the
+campus generator and suite.py for the individual benchmarks.
+"""
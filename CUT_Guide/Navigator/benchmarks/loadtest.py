@@ -0,0 +1,361 @@
+"""
+Load-testing harness driving the full Django stack.
+
+A weighted traffic mix of page and API requests is replayed by N
+concurrent workers against one of three transports:
+
+- wsgi: the project's WSGI application called in-process (all middleware,
+  URL resolution, templates and the database, but no sockets)
+- asgi: the project's ASGI application called in-process on one event loop
+- http: a running local server (runserver, gunicorn, ...) over keep-alive
+  HTTP connections
+
+Results report throughput and p50/p95/p99 latency per concurrency level.
+"""
+
+import asyncio
+import http.client
+import io
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.db import connections
+
+from ..models import ServicePoint
+from .suite import SEARCH_TERMS
+from .synthetic import ORIGIN_LAT, ORIGIN_LON
+
+DEFAULT_MIX = 'home=15,search=30,directions=20,nearest=20,nearby=15'
+
+
+class TrafficContext:
+    """Sample data the scenarios draw request parameters from"""
+
+    def __init__(self, service_ids):
+        if len(service_ids) < 2:
+            raise ValueError('Need at least two service points to generate traffic')
+        self.service_ids = service_ids
+        self.service_types = [code for code, _ in ServicePoint.SERVICE_TYPES]
+
+    @classmethod
+    def from_database(cls):
+        return cls(list(ServicePoint.objects.values_list('id', flat=True)))
+
+    def location(self, rng):
+        return (
+            round(ORIGIN_LAT + rng.uniform(0, 600) / 111320, 6),
+            round(ORIGIN_LON + rng.uniform(0, 600) / 106000, 6),
+        )
+
+
+def _home(ctx, rng):
+    return '/'
+
+
+def _search(ctx, rng):
+    return '/search/?' + urlencode({'q': rng.choice(SEARCH_TERMS)})
+
+
+def _directions(ctx, rng):
+    start, end = rng.sample(ctx.service_ids, 2)
+    return f'/directions/{start}/{end}/'
+
+
+def _nearest(ctx, rng):
+    lat, lon = ctx.location(rng)
+    return '/api/nearest-service/?' + urlencode({'lat': lat, 'lon': lon, 'type': rng.choice(ctx.service_types), 'radius': 300})
+
+
+def _nearby(ctx, rng):
+    lat, lon = ctx.location(rng)
+    return '/api/nearby-services/?' + urlencode({'lat': lat, 'lon': lon, 'radius': 300, 'limit': 10})
+
+
+SCENARIOS = {
+    'home': _home,
+    'search': _search,
+    'directions': _directions,
+    'nearest': _nearest,
+    'nearby': _nearby,
+}
+
+
+def parse_mix(text):
+    """Parse 'home=10,search=30' into [(name, weight), ...]"""
+    mix = []
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in SCENARIOS:
+            raise ValueError(f'Unknown scenario {name!r}; choose from {", ".join(SCENARIOS)}')
+        weight = float(weight or 1)
+        if weight > 0:
+            mix.append((name, weight))
+    if not mix:
+        raise ValueError('Traffic mix is empty')
+    return mix
+
+
+# =====================================================
+# TRANSPORTS
+# =====================================================
+
+def _environ(path, method='GET'):
+    path, _, query = path.partition('?')
+    return {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(b''),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+class WSGITransport:
+    """Call the WSGI application directly; one instance shared by all threads"""
+
+    def __init__(self):
+        from django.core.wsgi import get_wsgi_application
+        self.app = get_wsgi_application()
+
+    def connect(self):
+        return self
+
+    def request(self, path):
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+
+        result = self.app(_environ(path), start_response)
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return status[0]
+
+    def close(self):
+        connections.close_all()
+
+
+class HTTPTransport:
+    """Keep-alive HTTP connection to a running server, one per worker"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+
+    def connect(self):
+        return _HTTPConnection(self.host, self.port, self.prefix)
+
+
+class _HTTPConnection:
+    def __init__(self, host, port, prefix):
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+        self.prefix = prefix
+
+    def request(self, path):
+        self.conn.request('GET', self.prefix + path)
+        response = self.conn.getresponse()
+        response.read()
+        return response.status
+
+    def close(self):
+        self.conn.close()
+
+
+class ASGITransport:
+    """Call the ASGI application on an event loop owned by the runner"""
+
+    def __init__(self):
+        from django.core.asgi import get_asgi_application
+        self.app = get_asgi_application()
+
+    async def request(self, path):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [(b'host', b'localhost')],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+        status = []
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Park until the app finishes; a disconnect would abort it
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await self.app(scope, receive, send)
+        return status[0]
+
+
+# =====================================================
+# RUNNER
+# =====================================================
+
+class LevelResult:
+    """Latencies and errors collected at one concurrency level"""
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.samples = []  # (scenario, seconds, status)
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def summary(self):
+        latencies = sorted(s[1] for s in self.samples)
+        by_scenario = {}
+        for name, seconds, _ in self.samples:
+            by_scenario.setdefault(name, []).append(seconds)
+        return {
+            'concurrency': self.concurrency,
+            'requests': len(self.samples),
+            'errors': self.errors,
+            'client_errors': sum(1 for s in self.samples if 400 <= s[2] < 500),
+            'server_errors': sum(1 for s in self.samples if s[2] >= 500),
+            'elapsed_s': round(self.elapsed, 3),
+            'throughput_rps': round(len(self.samples) / self.elapsed, 2) if self.elapsed else 0.0,
+            **percentiles(latencies),
+            'scenarios': {
+                name: {'requests': len(values), **percentiles(sorted(values))}
+                for name, values in sorted(by_scenario.items())
+            },
+        }
+
+
+def percentiles(ordered):
+    """p50/p95/p99 in milliseconds of an already sorted list of seconds"""
+    if not ordered:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+
+    def rank(p):
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+    return {'p50_ms': rank(0.50), 'p95_ms': rank(0.95), 'p99_ms': rank(0.99)}
+
+
+class LoadTest:
+    """Replay a traffic mix against a transport at several concurrency levels"""
+
+    def __init__(self, transport, ctx, mix, requests=None, duration=None, seed=42):
+        if not requests and not duration:
+            raise ValueError('Give a request count or a duration')
+        self.transport = transport
+        self.ctx = ctx
+        self.names = [name for name, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.requests = requests
+        self.duration = duration
+        self.seed = seed
+
+    def _budget(self):
+        """Shared request counter/deadline check for one level"""
+        lock = threading.Lock()
+        issued = [0]
+        deadline = time.perf_counter() + self.duration if self.duration else None
+
+        def take():
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            if self.requests:
+                with lock:
+                    if issued[0] >= self.requests:
+                        return False
+                    issued[0] += 1
+            return True
+        return take
+
+    def _next_path(self, rng):
+        name = rng.choices(self.names, self.weights)[0]
+        return name, SCENARIOS[name](self.ctx, rng)
+
+    def run_level(self, concurrency):
+        if isinstance(self.transport, ASGITransport):
+            return asyncio.run(self._run_level_async(concurrency))
+
+        result = LevelResult(concurrency)
+        take = self._budget()
+        lock = threading.Lock()
+
+        def worker(index):
+            rng = random.Random(self.seed * 1000 + index)
+            client = self.transport.connect()
+            samples, errors = [], 0
+            try:
+                while take():
+                    name, path = self._next_path(rng)
+                    start = time.perf_counter()
+                    try:
+                        status = client.request(path)
+                    except Exception:
+                        errors += 1
+                        continue
+                    samples.append((name, time.perf_counter() - start, status))
+            finally:
+                client.close()
+                with lock:
+                    result.samples.extend(samples)
+                    result.errors += errors
+
+        threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    async def _run_level_async(self, concurrency):
+        result = LevelResult(concurrency)
+        take = self._budget()
+
+        async def worker(index):
+            rng = random.Random(self.seed * 1000 + index)
+            while take():
+                name, path = self._next_path(rng)
+                start = time.perf_counter()
+                try:
+                    status = await self.transport.request(path)
+                except Exception:
+                    result.errors += 1
+                    continue
+                result.samples.append((name, time.perf_counter() - start, status))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        result.elapsed = time.perf_counter() - start
+        return result
@@ -0,0 +1,223 @@
+"""
+Cold-start measurement.
+
+Every run starts a fresh interpreter, so nothing is imported yet, and
+times the phases a WSGI worker goes through before it can answer:
+
+- import_django: importing the django package
+- setup: settings, app registry, models and every AppConfig.ready()
+- middleware: building the WSGI handler's middleware chain
+- urlconf: importing the URLconf and the view modules it names
+- first_request (optional): one GET through the handler, templates and DB
+- first_graph (optional): building or attaching the routing graphs
+
+Children run with -X importtime, so import cost is also attributed to
+individual modules. This module is also the child's entry point, so it
+imports nothing at module level that Django would otherwise pay for.
+Run with ``python manage.py startup_report``.
+"""
+
+import json
+import os
+import sys
+import time
+
+PHASES = ('import_django', 'setup', 'middleware', 'urlconf', 'first_request', 'first_graph')
+RESULT_PREFIX = 'STARTUP-RESULT '
+
+
+def measure(path=None, graph=False):
+    """Time the startup phases in this (fresh) process"""
+    timings = {}
+    mark = time.perf_counter()
+
+    def lap(name):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[name] = (now - mark) * 1000
+        mark = now
+
+    import django
+    lap('import_django')
+
+    django.setup(set_prefix=False)
+    lap('setup')
+
+    from django.core.handlers.wsgi import WSGIHandler
+    handler = WSGIHandler()
+    lap('middleware')
+
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    lap('urlconf')
+    loaded = sorted(
+        name for name in sys.modules
+        if name.split('.')[0] == 'Navigator' and not name.startswith('Navigator.benchmarks')
+    )
+
+    status = None
+    if path:
+        from io import BytesIO
+        from wsgiref.util import setup_testing_defaults
+
+        path, _, query = path.partition('?')
+        environ = {'PATH_INFO': path, 'QUERY_STRING': query, 'wsgi.input': BytesIO()}
+        setup_testing_defaults(environ)
+        statuses = []
+        response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        b''.join(response)
+        response.close()
+        status = statuses[0]
+        lap('first_request')
+
+    if graph:
+        from Navigator.graph import get_graph
+        for accessible in (False, True):
+            get_graph(accessible)
+        lap('first_graph')
+
+    return {
+        'phases': timings,
+        'navigator_modules': loaded,
+        'status': status,
+        'origins': _origins(),
+        'uncompiled': _uncompiled(),
+    }
+
+
+def _origins():
+    """Top-level imported package -> 'stdlib', 'third-party' or the package itself for project code"""
+    import sysconfig
+    site = {sysconfig.get_paths()['purelib'], sysconfig.get_paths()['platlib']}
+    origins = {}
+    for name, module in list(sys.modules.items()):
+        top = name.split('.')[0]
+        if top in origins or name != top:
+            continue
+        location = getattr(module, '__file__', None) or ''
+        if top in ('django', 'Navigator', 'CUT_Guide'):
+            origins[top] = top
+        elif any(location.startswith(path) for path in site):
+            origins[top] = 'third-party'
+        else:
+            origins[top] = 'stdlib'
+    return origins
+
+
+def _uncompiled():
+    """
+    Project modules with no up-to-date .pyc, which every cold start
+    compiles from source (e.g. a read-only checkout or
+    PYTHONDONTWRITEBYTECODE); `python -m compileall .` fixes it.
+    """
+    from importlib.util import cache_from_source
+
+    stale = []
+    for name, module in list(sys.modules.items()):
+        source = getattr(module, '__file__', None)
+        if name.split('.')[0] not in ('Navigator', 'CUT_Guide') or name.startswith('Navigator.benchmarks'):
+            continue
+        if not source or not source.endswith('.py'):
+            continue
+        try:
+            if os.stat(cache_from_source(source)).st_mtime < os.stat(source).st_mtime:
+                stale.append(name)
+        except OSError:
+            stale.append(name)
+    return sorted(stale)
+
+
+def parse_importtime(stderr):
+    """{module: (self ms, cumulative ms)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+    return modules
+
+
+def run_once(path=None, graph=False, cwd=None):
+    """Measure one cold start in a child interpreter"""
+    import subprocess
+
+    command = [sys.executable, '-X', 'importtime', '-m', __name__]
+    if path:
+        command += ['--path', path]
+    if graph:
+        command.append('--graph')
+
+    env = dict(os.environ)
+    # Measure serving startup only; never write warmed routes from here
+    env['NAVIGATOR_WARMUP_ON_STARTUP'] = 'False'
+    if cwd:
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(cwd), env.get('PYTHONPATH')]))
+
+    started = time.perf_counter()
+    child = subprocess.run(command, capture_output=True, text=True, cwd=cwd, env=env)
+    wall = (time.perf_counter() - started) * 1000
+    lines = [line for line in child.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if child.returncode or not lines:
+        raise RuntimeError(f'Startup measurement failed:\n{child.stderr[-2000:]}')
+
+    result = json.loads(lines[-1][len(RESULT_PREFIX):])
+    result['process_ms'] = wall
+    result['imports'] = parse_importtime(child.stderr)
+    return result
+
+
+def startup_report(runs=5, path=None, graph=False, top=15, cwd=None, log=None):
+    """
+    Median phase timings over several cold starts, plus the modules that
+    cost the most to import.
+    """
+    from collections import defaultdict
+    from statistics import median
+
+    results = []
+    for i in range(runs):
+        results.append(run_once(path, graph, cwd))
+        if log:
+            log(i + 1, results[-1])
+
+    phases = {
+        phase: median(r['phases'][phase] for r in results)
+        for phase in PHASES if phase in results[0]['phases']
+    }
+    self_times = defaultdict(list)
+    cumulative = {}
+    for r in results:
+        for module, (self_ms, cumulative_ms) in r['imports'].items():
+            self_times[module].append(self_ms)
+            cumulative[module] = max(cumulative.get(module, 0), cumulative_ms)
+    modules = {module: median(times) for module, times in self_times.items()}
+
+    packages = defaultdict(float)
+    for module, ms in modules.items():
+        packages[results[-1]['origins'].get(module.split('.')[0], 'stdlib')] += ms
+
+    return {
+        'runs': runs,
+        'process_ms': median(r['process_ms'] for r in results),
+        'phases': phases,
+        'status': results[-1]['status'],
+        'packages': dict(sorted(packages.items(), key=lambda item: -item[1])),
+        'slowest_imports': [
+            {'module': module, 'self_ms': ms, 'cumulative_ms': cumulative[module]}
+            for module, ms in sorted(modules.items(), key=lambda item: -item[1])[:top]
+        ],
+        'navigator_modules': results[-1]['navigator_modules'],
+        'uncompiled': results[-1]['uncompiled'],
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--path')
+    parser.add_argument('--graph', action='store_true')
+    args = parser.parse_args()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CUT_Guide.settings')
+    print(RESULT_PREFIX + json.dumps(measure(args.path, args.graph)), flush=True)
@@ -0,0 +1,196 @@
+"""
+Repeatable micro-benchmarks for the routing, lookup and page code paths.
+
+Each benchmark is a function taking a BenchContext and returning a
+callable (one timed iteration) plus an optional per-iteration setup that
+runs outside the timed region. Results are summarized in milliseconds
+and written as JSON by the run_benchmarks management command.
+"""
+
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from io import StringIO
+
+import django
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.test import RequestFactory
+
+from .. import views
+from ..models import ServicePoint
+from ..routing import PathFinder
+from .synthetic import ORIGIN_LAT, ORIGIN_LON, WORDS, generate_campus, write_gps_points
+
+SEARCH_TERMS = [w.lower() for w in WORDS] + ['toilet', 'lab', '101', 'b01', 'library', 'zzz']
+
+
+class BenchContext:
+    """Shared state for one suite run: deterministic RNG and sample data"""
+
+    def __init__(self, spec, gps_points=500):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        self.factory = RequestFactory()
+        self.service_ids = list(ServicePoint.objects.values_list('id', flat=True))
+        self.service_types = [code for code, _ in ServicePoint.SERVICE_TYPES]
+        self.gps_points = gps_points
+        self.tmpdir = tempfile.mkdtemp(prefix='cut-bench-')
+
+    def random_location(self, spread_meters=600):
+        return (
+            ORIGIN_LAT + self.rng.uniform(0, spread_meters) / 111320,
+            ORIGIN_LON + self.rng.uniform(0, spread_meters) / 106000,
+        )
+
+    def get(self, path, params=None):
+        request = self.factory.get(path, params or {})
+        request.user = AnonymousUser()
+        return request
+
+
+def bench_shortest_path(ctx, accessibility_required=False):
+    def run():
+        start, end = ctx.rng.sample(ctx.service_ids, 2)
+        PathFinder(accessibility_required=accessibility_required).find_shortest_path(start, end)
+    return run, None
+
+
+def bench_shortest_path_accessible(ctx):
+    return bench_shortest_path(ctx, accessibility_required=True)
+
+
+def bench_nearest_service(ctx):
+    def run():
+        PathFinder().find_nearest_service(ctx.random_location(), ctx.rng.choice(ctx.service_types), 200)
+    return run, None
+
+
+def bench_nearby_services(ctx):
+    def run():
+        PathFinder().find_nearby_services(ctx.random_location(), None, 300, 10)
+    return run, None
+
+
+def bench_service_detail(ctx):
+    def run():
+        service_id = ctx.rng.choice(ctx.service_ids)
+        views.service_detail(ctx.get(f'/service/{service_id}/'), service_id)
+    return run, None
+
+
+def bench_search(ctx):
+    def run():
+        views.search(ctx.get('/search/', {'q': ctx.rng.choice(SEARCH_TERMS)}))
+    return run, None
+
+
+def bench_home(ctx):
+    def run():
+        views.home(ctx.get('/'))
+    return run, None
+
+
+def bench_import_gps_points(ctx):
+    path = write_gps_points(os.path.join(ctx.tmpdir, 'gps_points.json'), ctx.gps_points, ctx.spec.seed)
+
+    def setup():
+        # Start each run from the campus alone so every iteration inserts
+        ServicePoint.objects.filter(description__startswith='GPS Point:').delete()
+
+    def run():
+        call_command('import_gps_points', path, stdout=StringIO())
+    return run, setup
+
+
+BENCHMARKS = {
+    'routing.shortest_path': bench_shortest_path,
+    'routing.shortest_path_accessible': bench_shortest_path_accessible,
+    'nearest.find_nearest_service': bench_nearest_service,
+    'nearest.find_nearby_services': bench_nearby_services,
+    'nearest.service_detail': bench_service_detail,
+    'views.search': bench_search,
+    'views.home': bench_home,
+    'import.gps_points': bench_import_gps_points,
+}
+
+# Benchmarks too slow to repeat as often as the rest
+REPEAT_DIVISOR = {
+    'import.gps_points': 10,
+}
+
+
+def measure(run, setup=None, repeat=20, warmup=2):
+    """Time repeat iterations of run() after warmup; returns seconds per run"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        run()
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(spec, repeat=20, only=None, gps_points=500, log=None):
+    """
+    Generate the synthetic campus described by spec and run the benchmarks.
+    Returns: JSON-serializable dict with metadata and per-benchmark summaries
+    """
+    counts = generate_campus(spec)
+    ctx = BenchContext(spec, gps_points=gps_points)
+
+    results = {}
+    for name, factory in BENCHMARKS.items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        run, setup = factory(ctx)
+        runs = max(1, repeat // REPEAT_DIVISOR.get(name, 1))
+        results[name] = summarize(measure(run, setup, repeat=runs, warmup=1 if setup else 2))
+        if log:
+            log(name, results[name])
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'campus': spec.as_dict(),
+            'counts': counts,
+            'gps_points': gps_points,
+        },
+        'results': results,
+    }
@@ -0,0 +1,247 @@
+"""
+Synthetic campus generator for benchmarks and load tests.
+
+Builds a reproducible campus of configurable size around the CUT campus
+origin: buildings laid out on a jittered grid, floors with rooms and
+service points, and a pathway graph made of indoor corridors, staircases
+and elevators between floors, and outdoor/ramp paths between building
+entrances.
+"""
+
+import json
+import random
+from dataclasses import dataclass
+from math import cos, radians, sqrt
+
+from django.db import transaction
+
+from ..geo import haversine_meters, project
+from ..models import Building, Floor, Room, ServicePoint, Pathway
+from ..sync import record_reset
+
+# CUT campus centre (Chinhoyi), matching the imported GPS survey
+ORIGIN_LAT = -17.3520
+ORIGIN_LON = 30.2075
+
+METERS_PER_DEGREE = 111320
+WALKING_SPEED_M_PER_MIN = 80
+BUILDING_SPACING_METERS = 60
+FLOOR_SIZE_METERS = 30
+
+SERVICE_TYPES = [code for code, _ in ServicePoint.SERVICE_TYPES]
+ROOM_TYPES = ['office', 'classroom', 'lab', 'lecture_hall', 'meeting_room', 'storage', 'other']
+WORDS = ['Science', 'Engineering', 'Library', 'Admin', 'Hostel', 'Business', 'Arts', 'Agriculture',
+         'Computing', 'Media', 'Design', 'Health', 'Wildlife', 'Tourism', 'Hospitality', 'Research']
+
+
+@dataclass
+class CampusSpec:
+    """Size parameters for a synthetic campus"""
+    buildings: int = 20
+    floors: int = 4
+    rooms_per_floor: int = 12
+    services_per_floor: int = 6
+    outdoor_links: int = 3
+    seed: int = 42
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+def _offset(lat, lon, dx_meters, dy_meters):
+    """Shift a coordinate by dx (east) / dy (north) meters"""
+    return (
+        lat + dy_meters / METERS_PER_DEGREE,
+        lon + dx_meters / (METERS_PER_DEGREE * cos(radians(lat))),
+    )
+
+
+def _pathway(kind, a, b, distance, floor_from=None, floor_to=None, accessible=True, minutes=None):
+    return Pathway(
+        name=f'{kind} {a.name} - {b.name}'[:100],
+        pathway_type=kind,
+        start_point=a,
+        end_point=b,
+        distance_meters=round(distance, 2),
+        estimated_time_minutes=round(minutes if minutes is not None else distance / WALKING_SPEED_M_PER_MIN, 3),
+        is_accessible=accessible,
+        floor_from=floor_from,
+        floor_to=floor_to or floor_from,
+    )
+
+
+@transaction.atomic
+def generate_campus(spec=None, clear=True):
+    """
+    Populate the database with a synthetic campus.
+    Returns: dict of object counts
+    """
+    spec = spec or CampusSpec()
+    rng = random.Random(spec.seed)
+
+    if clear:
+        for model in (Pathway, ServicePoint, Room, Floor, Building):
+            model.objects.all().delete()
+
+    grid = max(1, int(sqrt(spec.buildings)) + 1)
+    buildings = []
+    for i in range(spec.buildings):
+        lat, lon = _offset(
+            ORIGIN_LAT, ORIGIN_LON,
+            (i % grid) * BUILDING_SPACING_METERS + rng.uniform(-10, 10),
+            (i // grid) * BUILDING_SPACING_METERS + rng.uniform(-10, 10),
+        )
+        buildings.append(Building(
+            name=f'{rng.choice(WORDS)} Block {i + 1}',
+            code=f'B{i + 1:03d}',
+            description=f'Synthetic building {i + 1}',
+            latitude=lat,
+            longitude=lon,
+            total_floors=spec.floors,
+            accessibility_features='Ramp and elevator' if i % 3 else None,
+        ))
+    # bulk_create skips save(), so project the coordinates here
+    for obj in buildings:
+        obj.easting, obj.northing = project(obj.latitude, obj.longitude)
+    Building.objects.bulk_create(buildings)
+
+    floors = Floor.objects.bulk_create([
+        Floor(building=b, floor_number=n, floor_name='Ground Floor' if n == 0 else f'Level {n}')
+        for b in buildings for n in range(spec.floors)
+    ])
+
+    rooms = []
+    for floor in floors:
+        b = floor.building
+        for r in range(spec.rooms_per_floor):
+            lat, lon = _offset(b.latitude, b.longitude, rng.uniform(0, FLOOR_SIZE_METERS), rng.uniform(0, FLOOR_SIZE_METERS))
+            rooms.append(Room(
+                building=b,
+                floor=floor,
+                name=f'{rng.choice(WORDS)} {rng.choice(ROOM_TYPES).replace("_", " ").title()}',
+                room_number=f'{floor.floor_number}{r + 1:02d}',
+                room_type=rng.choice(ROOM_TYPES),
+                latitude=lat,
+                longitude=lon,
+                capacity=rng.choice([None, 20, 40, 80, 200]),
+            ))
+    for obj in rooms:
+        obj.easting, obj.northing = project(obj.latitude, obj.longitude)
+    Room.objects.bulk_create(rooms)
+
+    # One stairwell and one lift shaft per building, shared by every floor:
+    # the router turns them into one (point, floor) node per floor
+    services = []
+    shafts = {}
+    ground_floors = {floor.building_id: floor for floor in floors if floor.floor_number == 0}
+    for b in buildings:
+        for kind in ('stairs', 'elevator'):
+            lat, lon = _offset(b.latitude, b.longitude, 0 if kind == 'stairs' else FLOOR_SIZE_METERS, FLOOR_SIZE_METERS / 2)
+            shafts.setdefault(b.id, []).append(ServicePoint(
+                name=f'{b.code} {kind}',
+                service_type='other',
+                building=b,
+                floor=ground_floors[b.id],
+                latitude=lat,
+                longitude=lon,
+                accessibility_features='Elevator access' if kind == 'elevator' else None,
+            ))
+        services.extend(shafts[b.id])
+
+    # Per floor: the shafts plus ordinary services, strung along a corridor
+    floor_nodes = {}
+    for floor in floors:
+        b = floor.building
+        nodes = list(shafts[b.id])
+        for s in range(spec.services_per_floor):
+            dx = rng.uniform(0, FLOOR_SIZE_METERS)
+            lat, lon = _offset(b.latitude, b.longitude, dx, rng.uniform(0, FLOOR_SIZE_METERS))
+            service_type = rng.choice(SERVICE_TYPES)
+            nodes.append(ServicePoint(
+                name=f'{b.code} {service_type.replace("_", " ")} {floor.floor_number}-{s + 1}',
+                service_type=service_type,
+                building=b,
+                floor=floor,
+                latitude=lat,
+                longitude=lon,
+                accessibility_features='Step-free access' if rng.random() < 0.5 else None,
+            ))
+        floor_nodes[floor.id] = nodes
+        services.extend(nodes[2:])
+    # bulk_create skips save(), so set the denormalized fields here
+    for service in services:
+        service.is_accessible = ServicePoint.accessibility_flag(service.accessibility_features)
+        service.easting, service.northing = project(service.latitude, service.longitude)
+    ServicePoint.objects.bulk_create(services)
+
+    pathways = []
+
+    def walk(a, b):
+        return haversine_meters(a.latitude, a.longitude, b.latitude, b.longitude)
+
+    # Indoor corridors: chain each floor by longitude plus a few shortcuts
+    for floor in floors:
+        nodes = sorted(floor_nodes[floor.id], key=lambda sp: sp.longitude)
+        for a, b in zip(nodes, nodes[1:]):
+            pathways.append(_pathway('indoor_corridor', a, b, walk(a, b) + 2, floor))
+        for _ in range(max(1, len(nodes) // 4)):
+            a, b = rng.sample(nodes, 2)
+            pathways.append(_pathway('indoor_corridor', a, b, walk(a, b) * 1.2 + 2, floor))
+
+    # Vertical transitions between consecutive floors of each building
+    building_floors = {}
+    for floor in floors:
+        building_floors.setdefault(floor.building_id, []).append(floor)
+    for building_id, b_floors in building_floors.items():
+        stairs, lift = shafts[building_id]
+        for lower, upper in zip(b_floors, b_floors[1:]):
+            pathways.append(_pathway('staircase', stairs, stairs, 8, lower, upper, accessible=False, minutes=0.4))
+            pathways.append(_pathway('elevator', lift, lift, 4, lower, upper, minutes=0.5))
+
+    # Outdoor paths between ground floor entrances (the stairwell)
+    entrances = [shafts[building_id][0] for building_id in building_floors]
+    links = {}
+    for a in entrances:
+        nearest = sorted((walk(a, b), b.id, b) for b in entrances if b is not a)[:spec.outdoor_links]
+        for distance, _, b in nearest:
+            links[tuple(sorted((a.id, b.id)))] = (a, b, distance)
+    for key in sorted(links):
+        a, b, distance = links[key]
+        kind = 'ramp' if rng.random() < 0.2 else 'outdoor'
+        pathways.append(_pathway(kind, a, b, distance * rng.uniform(1.05, 1.3)))
+    Pathway.objects.bulk_create(pathways)
+    # bulk_create sends no signals; have sync clients start over
+    record_reset()
+
+    return {
+        'buildings': len(buildings),
+        'floors': len(floors),
+        'rooms': len(rooms),
+        'service_points': len(services),
+        'pathways': len(pathways),
+    }
+
+
+def generate_gps_points(count, seed=42):
+    """
+    GPS survey records in the format read by import_gps_points.
+    Returns: list of dicts
+    """
+    rng = random.Random(seed)
+    kinds = ['toilet', 'admin block', 'library', 'clinic', 'canteen', 'lab', 'hostel', 'block', 'water point']
+    points = []
+    for i in range(count):
+        lat, lon = _offset(ORIGIN_LAT, ORIGIN_LON, rng.uniform(0, 1500), rng.uniform(0, 1500))
+        points.append({
+            'ID': f'{rng.choice(kinds)} {i + 1}',
+            'Latitude': round(lat, 7),
+            'Longitude': round(lon, 7),
+            'Elevation(MSL)': round(rng.uniform(1100, 1180), 2),
+        })
+    return points
+
+
+def write_gps_points(path, count, seed=42):
+    with open(path, 'w') as f:
+        json.dump(generate_gps_points(count, seed), f)
+    return path
@@ -0,0 +1,241 @@
+"""
+Floorplan tile pyramids and thumbnails.
+
+Uploaded floorplans are often multi-megabyte scans. When a Floor's
+floorplan_image changes, a background worker cuts it into a pyramid of
+256 px WebP tiles (zoom 0 fits the whole plan in one tile, the top zoom is
+full resolution) plus WebP and JPEG thumbnails, so the floor page downloads
+only the tiles in view.
+
+Output lives under MEDIA_ROOT/floortiles/<floor id>/<version>/, where the
+version is a hash of the source image: tile URLs never change meaning, so
+they are served with immutable cache headers. The manifest describing the
+pyramid is stored on Floor.floorplan_tiles.
+
+Workers are threads rather than processes: Pillow releases the GIL while
+resizing and encoding, and forking from inside a web worker is not safe.
+"""
+
+import hashlib
+import io
+import logging
+import math
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from PIL import Image, ImageOps, features
+
+from .models import Floor
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+THUMBNAIL_SIZE = 640
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# Superseded versions kept for pages rendered before the change
+KEEP_PREVIOUS = 1
+
+TILE_DIR = 'floortiles'
+
+_executor = None
+_executor_lock = threading.Lock()
+# Floor id -> whether it changed again while its build was running
+_pending = {}
+
+
+def tile_extension():
+    """WebP tiles, or JPEG where Pillow was built without WebP support"""
+    return 'webp' if features.check('webp') else 'jpg'
+
+
+def floor_dir(floor_id):
+    return os.path.join(settings.MEDIA_ROOT, TILE_DIR, str(floor_id))
+
+
+def tile_path(floor_id, version, name):
+    return os.path.join(floor_dir(floor_id), version, name)
+
+
+def _save(image, f, extension):
+    if extension == 'webp':
+        image.save(f, 'WEBP', quality=WEBP_QUALITY)
+    else:
+        image.convert('RGB').save(f, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+
+def _write_tiles(level, zoom, directory, extension, background):
+    """Cut one pyramid level into TILE_SIZE tiles, padding the right and bottom edges"""
+    os.makedirs(os.path.join(directory, str(zoom)), exist_ok=True)
+    columns = math.ceil(level.width / TILE_SIZE)
+    rows = math.ceil(level.height / TILE_SIZE)
+    for x in range(columns):
+        for y in range(rows):
+            box = (x * TILE_SIZE, y * TILE_SIZE, min((x + 1) * TILE_SIZE, level.width), min((y + 1) * TILE_SIZE, level.height))
+            tile = level.crop(box)
+            if tile.size != (TILE_SIZE, TILE_SIZE):
+                padded = Image.new(level.mode, (TILE_SIZE, TILE_SIZE), background)
+                padded.paste(tile, (0, 0))
+                tile = padded
+            with open(os.path.join(directory, str(zoom), f'{x}_{y}.{extension}'), 'wb') as f:
+                _save(tile, f, extension)
+    return columns * rows
+
+
+def render_pyramid(data, directory):
+    """
+    Write the tile pyramid and thumbnails for image bytes into directory.
+    Returns: the manifest (without URLs)
+    """
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    background = (0, 0, 0, 0) if has_alpha else (255, 255, 255)
+
+    extension = tile_extension()
+    width, height = image.size
+    max_zoom = max(0, math.ceil(math.log2(max(width, height) / TILE_SIZE)))
+
+    # Top zoom is full resolution; each level below halves the previous one
+    tiles = 0
+    level = image
+    for zoom in range(max_zoom, -1, -1):
+        tiles += _write_tiles(level, zoom, directory, extension, background)
+        if zoom:
+            level = level.reduce(2)
+
+    thumbnail = image.copy()
+    thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.LANCZOS)
+    thumbnails = {}
+    for name, thumb_extension in (('webp', 'webp'), ('jpeg', 'jpg')):
+        if thumb_extension == 'webp' and extension != 'webp':
+            continue
+        with open(os.path.join(directory, f'thumb.{thumb_extension}'), 'wb') as f:
+            _save(thumbnail, f, thumb_extension)
+        thumbnails[name] = f'thumb.{thumb_extension}'
+
+    return {
+        'width': width,
+        'height': height,
+        'tile_size': TILE_SIZE,
+        'max_zoom': max_zoom,
+        'format': extension,
+        'tiles': tiles,
+        'thumbnails': thumbnails,
+        'thumbnail_size': list(thumbnail.size),
+    }
+
+
+def _remove_superseded(floor_id, current):
+    directory = floor_dir(floor_id)
+    try:
+        old = sorted(
+            (
+                entry for entry in os.scandir(directory)
+                if entry.is_dir() and entry.name != current and '.tmp' not in entry.name
+            ),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True,
+        )
+    except FileNotFoundError:
+        return
+    for entry in old[KEEP_PREVIOUS:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def remove_tiles(floor_id):
+    shutil.rmtree(floor_dir(floor_id), ignore_errors=True)
+
+
+def build_tiles(floor, force=False):
+    """
+    Bring floor's tiles up to date with its floorplan_image.
+    Returns: the manifest, or None when the floor has no floorplan
+    """
+    if not floor.floorplan_image:
+        if floor.floorplan_tiles:
+            Floor.objects.filter(pk=floor.pk).update(floorplan_tiles=None)
+            floor.floorplan_tiles = None
+        remove_tiles(floor.pk)
+        return None
+
+    with floor.floorplan_image.open('rb') as f:
+        data = f.read()
+    version = hashlib.sha1(data).hexdigest()[:16]
+    directory = os.path.join(floor_dir(floor.pk), version)
+
+    current = floor.floorplan_tiles or {}
+    if not force and current.get('version') == version and os.path.isdir(directory):
+        if current.get('source') != floor.floorplan_image.name:
+            current['source'] = floor.floorplan_image.name
+            Floor.objects.filter(pk=floor.pk).update(floorplan_tiles=current)
+        return current
+
+    # Render beside the final directory and rename it into place, so readers
+    # never see a half-written pyramid
+    tmp_directory = f'{directory}.tmp{os.getpid()}-{threading.get_ident()}'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    try:
+        manifest = render_pyramid(data, tmp_directory)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_directory, directory)
+    finally:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+
+    manifest.update(version=version, source=floor.floorplan_image.name)
+    Floor.objects.filter(pk=floor.pk).update(floorplan_tiles=manifest)
+    floor.floorplan_tiles = manifest
+    _remove_superseded(floor.pk, version)
+    return manifest
+
+
+def needs_tiles(floor):
+    """Whether the stored pyramid is missing or was cut from another image"""
+    source = floor.floorplan_image.name if floor.floorplan_image else None
+    return (floor.floorplan_tiles or {}).get('source') != source
+
+
+def _build_in_background(floor_id):
+    try:
+        while True:
+            floor = Floor.objects.filter(pk=floor_id).first()
+            if floor is not None:
+                manifest = build_tiles(floor)
+                if manifest:
+                    logger.info('Floor %s: %d floorplan tiles (version %s)', floor_id, manifest['tiles'], manifest['version'])
+            with _executor_lock:
+                if not _pending.get(floor_id):
+                    break
+                _pending[floor_id] = False
+    except Exception:
+        logger.exception('Building floorplan tiles for floor %s failed', floor_id)
+    finally:
+        with _executor_lock:
+            _pending.pop(floor_id, None)
+        connections.close_all()
+
+
+def schedule_tiles(floor_id):
+    """
+    Queue a tile build on the background pool. A floor already queued or
+    building is not queued twice; a running build just runs once more.
+    """
+    global _executor
+    with _executor_lock:
+        if floor_id in _pending:
+            _pending[floor_id] = True
+            return None
+        _pending[floor_id] = False
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'NAVIGATOR_TILE_WORKERS', 2),
+                thread_name_prefix='floor-tiles',
+            )
+    return _executor.submit(_build_in_background, floor_id)
@@ -0,0 +1,283 @@
+"""
+Lightweight geographic helpers for campus-scale distance queries.
+Uses plain latitude/longitude floats so no GIS libraries are required.
+
+Buildings, rooms and service points also store their position projected
+onto the campus's UTM zone (easting/northing in meters, see project()).
+Within a zone the grid is flat to a fraction of a millimetre per meter, so
+distances between stored points are a hypot() with no trig per pair.
+"""
+
+import re
+from functools import lru_cache
+from math import atan2, atanh, cos, cosh, degrees, hypot, radians, sin, sinh, sqrt
+
+from django.conf import settings
+from django.db.models import Q
+
+EARTH_RADIUS_METERS = 6371000
+
+# WGS 84 ellipsoid and the UTM grid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+UTM_K0 = 0.9996
+UTM_FALSE_EASTING = 500000.0
+UTM_FALSE_NORTHING_SOUTH = 10000000.0
+# UTM covers 80°S to 84°N; the poles use UPS instead
+UTM_MIN_LATITUDE = -80.0
+UTM_MAX_LATITUDE = 84.0
+# Farthest from a zone's central meridian a position is projected: the
+# zone (±3°) and its neighbours. The series diverges towards ±90°.
+UTM_MAX_MERIDIAN_OFFSET = 9.0
+
+# Chinhoyi; override with NAVIGATOR_UTM_ZONE for campuses elsewhere
+DEFAULT_UTM_ZONE = '36K'
+
+# Krüger series coefficients (third order in n: sub-millimetre within a zone)
+_N = WGS84_F / (2 - WGS84_F)
+_RECTIFYING_RADIUS = WGS84_A / (1 + _N) * (1 + _N ** 2 / 4 + _N ** 4 / 64)
+_ALPHA = (
+    _N / 2 - 2 * _N ** 2 / 3 + 5 * _N ** 3 / 16,
+    13 * _N ** 2 / 48 - 3 * _N ** 3 / 5,
+    61 * _N ** 3 / 240,
+)
+_E = 2 * sqrt(_N) / (1 + _N)
+
+UTM_TEXT = re.compile(r'^\s*([\d.]+)\s*E\s+([\d.]+)\s*N\s+(\d{1,2})\s*([C-HJ-NP-X])\s*$', re.IGNORECASE)
+
+
+def check_position(latitude, longitude, zone=None):
+    """
+    Raise ValueError unless the position is finite, inside the UTM latitude
+    band and within UTM_MAX_MERIDIAN_OFFSET of the zone (the configured one
+    by default), where every distance query can project it (NaN fails
+    every comparison, so it is caught here too).
+    """
+    if not (UTM_MIN_LATITUDE <= latitude <= UTM_MAX_LATITUDE and -180 <= longitude <= 180):
+        raise ValueError(f'Position out of range: {latitude}, {longitude}')
+    number, _ = zone or utm_zone()
+    offset = (longitude - (number * 6 - 183) + 180) % 360 - 180
+    if abs(offset) > UTM_MAX_MERIDIAN_OFFSET:
+        raise ValueError(f'Position too far from UTM zone {number}: {latitude}, {longitude}')
+
+
+def parse_fix(latitude, longitude):
+    """
+    A (latitude, longitude) fix from request parameters as floats.
+    Raises ValueError (TypeError when missing) unless it is a finite
+    position on the globe.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError(f'Position out of range: {latitude}, {longitude}')
+    return latitude, longitude
+
+
+def parse_position(latitude, longitude):
+    """
+    A (latitude, longitude) fix from request parameters as floats.
+    Raises ValueError (TypeError when missing) unless it passes check_position().
+    """
+    latitude, longitude = parse_fix(latitude, longitude)
+    check_position(latitude, longitude)
+    return latitude, longitude
+
+
+def haversine_meters(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in meters"""
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
+    return EARTH_RADIUS_METERS * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def bounding_box(latitude, longitude, radius_meters):
+    """
+    Latitude/longitude box enclosing a circle of radius_meters.
+    Returns: (min_lat, max_lat, min_lon, max_lon)
+    """
+    dlat = degrees(radius_meters / EARTH_RADIUS_METERS)
+    # Longitude degrees shrink towards the poles; guard against cos(90) == 0
+    dlon = degrees(radius_meters / (EARTH_RADIUS_METERS * max(cos(radians(latitude)), 1e-6)))
+    return latitude - dlat, latitude + dlat, longitude - dlon, longitude + dlon
+
+
+def within_radius(queryset, latitude, longitude, radius_meters):
+    """
+    Filter a queryset of objects with easting/northing columns to a circle.
+    The position is projected once; the bounding box is resolved by the
+    database (indexed) and the exact planar check runs only on the few
+    rows inside the box. Rows not projected yet (bulk writes that bypass
+    save()) are matched by latitude/longitude box and haversine instead.
+    Returns: list of (object, distance_meters) sorted by distance
+    """
+    x, y = to_utm(latitude, longitude)
+    half = radius_meters * utm_scale(x)
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_meters)
+    candidates = queryset.filter(
+        Q(easting__range=(x - half, x + half), northing__range=(y - half, y + half))
+        | Q(easting__isnull=True, latitude__range=(min_lat, max_lat), longitude__range=(min_lon, max_lon))
+    )
+
+    results = []
+    for obj in candidates:
+        if obj.easting is None:
+            distance = haversine_meters(latitude, longitude, obj.latitude, obj.longitude)
+        else:
+            distance = planar_meters(x, y, obj.easting, obj.northing)
+        if distance <= radius_meters:
+            results.append((obj, distance))
+
+    results.sort(key=lambda item: item[1])
+    return results
+
+
+def convex_hull(points):
+    """
+    Convex hull of (latitude, longitude) pairs by Andrew's monotone chain.
+    Planar math is fine at campus scale.
+    Returns: hull vertices counter-clockwise, without repeating the first;
+    fewer than three distinct points are returned as they are
+    """
+    points = sorted(set(points))
+    if len(points) < 3:
+        return points
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower, upper = [], []
+    for p in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+
+# =====================================================
+# PROJECTED COORDINATES
+# =====================================================
+
+@lru_cache(maxsize=None)
+def parse_zone(zone):
+    """
+    '36K' (number and latitude band) or '36S' / '36N' (hemisphere).
+    Returns: (zone number, southern hemisphere)
+    """
+    match = re.fullmatch(r'\s*(\d{1,2})\s*([A-Z])\s*', zone.upper())
+    if not match or not 1 <= int(match.group(1)) <= 60:
+        raise ValueError(f'Invalid UTM zone {zone!r}')
+    number, letter = int(match.group(1)), match.group(2)
+    # 'S' is both a band (north) and the hemisphere; as zones are written
+    # here it means south, as in EPSG names ("UTM zone 36S")
+    return number, letter == 'S' or letter < 'N'
+
+
+def utm_zone():
+    return parse_zone(getattr(settings, 'NAVIGATOR_UTM_ZONE', DEFAULT_UTM_ZONE))
+
+
+def utm_epsg(zone=None):
+    """EPSG code of the WGS 84 / UTM zone, e.g. 32736 for 36K"""
+    number, south = zone or utm_zone()
+    return (32700 if south else 32600) + number
+
+
+def to_utm(latitude, longitude, zone=None):
+    """
+    Project WGS 84 latitude/longitude onto a UTM zone (the configured one
+    by default), also for points just outside it.
+    Returns: (easting, northing) in meters
+    Raises: ValueError for positions outside check_position()'s range
+    """
+    number, south = zone or utm_zone()
+    check_position(latitude, longitude, (number, south))
+    phi = radians(latitude)
+    lam = radians(longitude - (number * 6 - 183))
+
+    t = sinh(atanh(sin(phi)) - _E * atanh(_E * sin(phi)))
+    xi = atan2(t, cos(lam))
+    eta = atanh(sin(lam) / sqrt(1 + t * t))
+
+    easting, northing = eta, xi
+    for j, alpha in enumerate(_ALPHA, 1):
+        easting += alpha * cos(2 * j * xi) * sinh(2 * j * eta)
+        northing += alpha * sin(2 * j * xi) * cosh(2 * j * eta)
+    easting = UTM_FALSE_EASTING + UTM_K0 * _RECTIFYING_RADIUS * easting
+    northing = UTM_K0 * _RECTIFYING_RADIUS * northing + (UTM_FALSE_NORTHING_SOUTH if south else 0.0)
+    return easting, northing
+
+
+def project(latitude, longitude):
+    """Stored easting/northing for a position, or (None, None) without a projectable one"""
+    if latitude is None or longitude is None:
+        return None, None
+    try:
+        return to_utm(float(latitude), float(longitude))
+    except ValueError:
+        return None, None
+
+
+def projected(easting, northing, latitude, longitude):
+    """
+    A row's stored projection, or one computed from its latitude/longitude
+    when a bulk write (bulk_create, queryset.update(), raw SQL) left it
+    unset. Returns: (easting, northing), (None, None) if neither works
+    """
+    if easting is not None and northing is not None:
+        return easting, northing
+    return project(latitude, longitude)
+
+
+def parse_utm(text):
+    """
+    UTM coordinates written as "203230.625E 8079086.754N 36K".
+    Returns: (easting, northing, (zone number, southern hemisphere)), or
+    None when text is not in that form
+    """
+    match = UTM_TEXT.match(text or '')
+    if not match:
+        return None
+    easting, northing, number, band = match.groups()
+    return float(easting), float(northing), parse_zone(number + band)
+
+
+def utm_scale(easting):
+    """
+    UTM grid meters per ground meter at an easting: 0.9996 on the central
+    meridian, growing with the square of the distance from it (1.0007 at
+    the edge of Chinhoyi's zone).
+    """
+    offset = easting - UTM_FALSE_EASTING
+    return UTM_K0 * (1 + offset * offset / (2 * EARTH_RADIUS_METERS ** 2 * UTM_K0 ** 2))
+
+
+def planar_meters(x1, y1, x2, y2):
+    """Ground distance between two projected points, without trig"""
+    return hypot(x2 - x1, y2 - y1) / utm_scale((x1 + x2) / 2)
+
+
+def distance_between(a, b):
+    """Meters between two objects with a location, planar when both are projected"""
+    if a.easting is not None and b.easting is not None:
+        return planar_meters(a.easting, a.northing, b.easting, b.northing)
+    return haversine_meters(a.latitude, a.longitude, b.latitude, b.longitude)
+
+
+def reproject(queryset, batch_size=1000):
+    """
+    Recompute easting/northing for every row, for bulk writes that bypass
+    save() and after changing NAVIGATOR_UTM_ZONE.
+    Returns: number of rows updated
+    """
+    objects = list(queryset.only('id', 'latitude', 'longitude'))
+    for obj in objects:
+        obj.easting, obj.northing = project(obj.latitude, obj.longitude)
+    queryset.bulk_update(objects, ['easting', 'northing'], batch_size=batch_size)
+    return len(objects)
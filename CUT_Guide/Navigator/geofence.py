@@ -0,0 +1,135 @@
+"""
+Geofence lookups: which service areas contain a GPS fix.
+
+Every ServiceArea is a circle of buffer_radius_meters around its service
+point. The index hashes each circle's bounding box into a uniform grid of
+GRID_CELL_METERS cells over the projected (UTM) coordinates, so a lookup
+projects the fix once, reads the one cell holding it and runs the exact
+planar distance check only on the few circles registered there:
+per-fix cost depends on how many areas overlap that spot, not on how many
+areas exist. Areas whose box would span more than MAX_CELLS_PER_AREA cells
+(campus-wide buffers) are kept in a short list checked on every lookup
+instead of being copied into thousands of cells.
+
+The index is built once per process and rebuilt when the geofence version
+changes (see signals.py), so batches of fixes from a replayed trace never
+touch the database.
+"""
+
+import threading
+from math import floor
+
+from . import perf
+from .geo import planar_meters, projected, to_utm, utm_scale
+from .graph import geofence_version
+from .models import ServiceArea
+
+GRID_CELL_METERS = 100
+MAX_CELLS_PER_AREA = 400
+
+# Fixes accepted in one batch request
+MAX_BATCH_FIXES = 1000
+
+_index = None
+_index_lock = threading.Lock()
+
+
+class GeofenceIndex:
+    """Uniform grid over service area bounding boxes"""
+
+    def __init__(self, areas, version=None, cell_meters=GRID_CELL_METERS):
+        """
+        areas: iterable of (area id, service point id, service type,
+        easting, northing, radius meters)
+        """
+        self.version = version
+        self.areas = [area for area in areas if area[5] > 0]
+        self.cells = {}
+        self.oversized = []
+        self.cell = cell_meters
+
+        for position, (_, _, _, x, y, radius) in enumerate(self.areas):
+            # Radii are ground meters; the grid is slightly stretched
+            half = radius * utm_scale(x)
+            min_row, max_row = self._row(y - half), self._row(y + half)
+            min_col, max_col = self._col(x - half), self._col(x + half)
+            if (max_row - min_row + 1) * (max_col - min_col + 1) > MAX_CELLS_PER_AREA:
+                self.oversized.append(position)
+                continue
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    self.cells.setdefault((row, col), []).append(position)
+
+    def __len__(self):
+        return len(self.areas)
+
+    def _row(self, northing):
+        return floor(northing / self.cell)
+
+    def _col(self, easting):
+        return floor(easting / self.cell)
+
+    def containing(self, latitude, longitude, service_type=None):
+        """
+        Areas containing the point.
+        Returns: list of (area, distance to its service point in meters),
+        nearest first
+        """
+        x, y = to_utm(latitude, longitude)
+        candidates = self.cells.get((self._row(y), self._col(x)), ())
+        matches = []
+        for position in (*candidates, *self.oversized):
+            area = self.areas[position]
+            if service_type and area[2] != service_type:
+                continue
+            distance = planar_meters(x, y, area[3], area[4])
+            if distance <= area[5]:
+                matches.append((area, distance))
+        matches.sort(key=lambda item: item[1])
+        return matches
+
+
+def build_index(version=None):
+    rows = ServiceArea.objects.values_list(
+        'id', 'service_point_id', 'service_point__service_type',
+        'service_point__easting', 'service_point__northing',
+        'service_point__latitude', 'service_point__longitude', 'buffer_radius_meters',
+    )
+    areas = []
+    for area_id, point_id, service_type, easting, northing, latitude, longitude, radius in rows:
+        x, y = projected(easting, northing, latitude, longitude)
+        if x is not None:
+            areas.append((area_id, point_id, service_type, x, y, radius))
+    return GeofenceIndex(areas, version)
+
+
+def get_index():
+    """The process's GeofenceIndex for the current geofence version"""
+    global _index
+    version = geofence_version()
+    index = _index
+    if index is not None and index.version == version:
+        perf.cache_hit()
+        return index
+
+    perf.cache_miss()
+    with _index_lock:
+        if _index is None or _index.version != version:
+            with perf.timer('geofence_build'):
+                _index = build_index(version)
+        return _index
+
+
+def locate(fixes, service_type=None):
+    """
+    Areas containing each (latitude, longitude) fix, against one index so a
+    whole batch sees the same data.
+    Returns: one list of (area, distance meters) per fix
+    """
+    index = get_index()
+    return [index.containing(lat, lon, service_type) for lat, lon in fixes]
+
+
+def clear_index():
+    global _index
+    _index = None
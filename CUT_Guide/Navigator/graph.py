@@ -0,0 +1,516 @@
+"""
+Routing graph construction and caching.
+
+The campus is modelled as a layered graph: a node is a (service point,
+floor) pair, so a stairwell or lift shaft that appears on several floors
+becomes one node per floor and moving between floors is an explicit
+transition edge (staircase, elevator, escalator, or any pathway whose
+floor_from differs from floor_to). Transition edges carry mode-specific
+costs such as elevator waiting time and a per-floor stair penalty.
+
+Adjacency is stored in compressed sparse row (CSR) form using flat
+``array`` buffers. Each variant (full, accessible) is built once per data
+version and cached for the life of the process; accessibility pruning
+happens here, at build time, rather than per request.
+
+Temporary pathway closures do not trigger a rebuild: the served graph is a
+view of the built one with the closed edges' weights set to infinity, and
+it is re-derived whenever the closure version changes or a closure window
+opens or ends. Cached Route rows are checked against closure windows when
+they are looked up (see route_is_stale), so a window that opens or ends
+with nobody saving anything still takes effect in every process.
+"""
+
+import copy
+import os
+import threading
+import time
+import zlib
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from . import perf
+from .models import Floor, Pathway, PathwayClosure, Route, ServicePoint
+
+GRAPH_VERSION_KEY = 'navigator:graph_version'
+CLOSURE_VERSION_KEY = 'navigator:closure_version'
+GEOFENCE_VERSION_KEY = 'navigator:geofence_version'
+
+# Comfortable walking pace used to turn waiting time into a distance cost
+WALKING_SPEED_M_PER_S = 1.35
+
+# Transition and profile costs; override any key in settings.NAVIGATOR_ROUTING_COSTS
+DEFAULT_ROUTING_COSTS = {
+    'ELEVATOR_WAIT_SECONDS': 30,
+    'STAIR_UP_PENALTY_METERS_PER_FLOOR': 15,
+    'STAIR_DOWN_PENALTY_METERS_PER_FLOOR': 8,
+    'ESCALATOR_PENALTY_METERS': 5,
+    # fewest_stairs: extra meters charged for every staircase edge
+    'STAIR_AVOIDANCE_METERS': 250,
+    # sheltered: outdoor meters count this many times over
+    'OUTDOOR_MULTIPLIER': 3.0,
+}
+
+# Named cost profiles; each gets its own precomputed per-edge weight array
+COST_PROFILES = [
+    ('shortest', 'Shortest'),
+    ('fastest', 'Fastest'),
+    ('fewest_stairs', 'Fewest stairs'),
+    ('sheltered', 'Indoor / sheltered'),
+]
+DEFAULT_PROFILE = 'shortest'
+OUTDOOR_TYPES = {'outdoor', 'ramp'}
+
+# Pathway types a wheelchair user cannot take, whatever is_accessible says
+INACCESSIBLE_TYPES = {'staircase', 'escalator'}
+
+PATHWAY_TYPE_CODES = [code for code, _ in Pathway.PATHWAY_TYPES]
+TRANSITION_TYPES = {'staircase', 'elevator', 'escalator'}
+
+VARIANTS = ('full', 'accessible')
+
+
+def routing_costs():
+    costs = dict(DEFAULT_ROUTING_COSTS)
+    costs.update(getattr(settings, 'NAVIGATOR_ROUTING_COSTS', {}))
+    return costs
+
+
+def transition_penalty(pathway_type, floors_up, costs):
+    """
+    Extra (cost meters, minutes) for moving floors_up floors (negative for
+    down) on a pathway of the given type.
+    """
+    if pathway_type == 'elevator':
+        wait = costs['ELEVATOR_WAIT_SECONDS']
+        return wait * WALKING_SPEED_M_PER_S, wait / 60
+    if pathway_type == 'staircase':
+        if floors_up >= 0:
+            return floors_up * costs['STAIR_UP_PENALTY_METERS_PER_FLOOR'], 0.0
+        return -floors_up * costs['STAIR_DOWN_PENALTY_METERS_PER_FLOOR'], 0.0
+    if pathway_type == 'escalator':
+        return costs['ESCALATOR_PENALTY_METERS'], 0.0
+    return 0.0, 0.0
+
+
+def profile_weight(profile, kind, cost, minutes, costs):
+    """Weight of one edge under a cost profile, from its base cost and time"""
+    if profile == 'fastest':
+        return minutes
+    if profile == 'fewest_stairs':
+        return cost + costs['STAIR_AVOIDANCE_METERS'] if kind == 'staircase' else cost
+    if profile == 'sheltered':
+        return cost * costs['OUTDOOR_MULTIPLIER'] if kind in OUTDOOR_TYPES else cost
+    return cost
+
+
+class RoutingGraph:
+    """
+    Immutable CSR adjacency for one graph variant.
+
+    Node i is nodes[i] == (point_id, floor_id); its outgoing edges are
+    offsets[i]:offsets[i + 1] into the per-edge arrays, and edge_twin[e] is
+    the same pathway traversed the other way. weights maps each
+    cost profile name to its per-edge weight array; edge_cost is the
+    'shortest' array (distance plus transition penalties). derived holds
+    tables computed from the graph on demand, so they share its lifetime.
+    
+    data_version identifies the data the graph was built from; version
+    also covers the closures applied, so caches of search results can key
+    on it.
+    """
+
+    def __init__(self, variant, version, nodes, lat, lon, offsets, targets,
+                 edge_pathway, edge_type, edge_distance, edge_time, edge_twin, weights):
+        self.variant = variant
+        self.version = version
+        self.data_version = version
+        self.nodes = nodes
+        self.lat = lat
+        self.lon = lon
+        self.offsets = offsets
+        self.targets = targets
+        self.edge_pathway = edge_pathway
+        self.edge_type = edge_type
+        self.edge_distance = edge_distance
+        self.edge_time = edge_time
+        self.edge_twin = edge_twin
+        self.weights = weights
+        self.edge_cost = weights[DEFAULT_PROFILE]
+        self.derived = {}
+        
+        self.closed_pathways = frozenset()
+        self.closure_version = None
+        self.valid_until = float('inf')
+        self.closures_changed_at = float('-inf')
+
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.point_nodes = {}
+        for i, (point_id, _) in enumerate(nodes):
+            self.point_nodes.setdefault(point_id, []).append(i)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def nodes_for_point(self, point_id):
+        return self.point_nodes.get(point_id, [])
+
+    def neighbors(self, node):
+        """Yield (edge index, target node) for the node's outgoing edges"""
+        targets = self.targets
+        for e in range(self.offsets[node], self.offsets[node + 1]):
+            yield e, targets[e]
+
+    def incoming(self, node):
+        """Yield (edge index, source node) for edges arriving at node"""
+        targets, twin = self.targets, self.edge_twin
+        for e in range(self.offsets[node], self.offsets[node + 1]):
+            yield twin[e], targets[e]
+
+    def pathway_type(self, edge):
+        return PATHWAY_TYPE_CODES[self.edge_type[edge]]
+
+    def profile_weights(self, profile):
+        """Per-edge weights for a cost profile; unknown names raise KeyError"""
+        return self.weights[profile]
+    
+    def with_closures(self, closed_pathways, closure_version, valid_until, changed_at=float('-inf')):
+        """
+        A view of this graph with the given pathways closed.
+        
+        Adjacency and coordinate arrays are shared; only the weight arrays
+        are copied, with the closed pathways' edges set to infinity so no
+        search will relax them. valid_until (epoch seconds) is when the set
+        of active closures next changes, changed_at when it last did.
+        """
+        view = copy.copy(self)
+        closed_pathways = frozenset(closed_pathways)
+        closed_edges = [e for e, pathway_id in enumerate(self.edge_pathway) if pathway_id in closed_pathways]
+        if closed_edges:
+            view.weights = {}
+            for profile, weights in self.weights.items():
+                patched = array('d', weights)
+                for e in closed_edges:
+                    patched[e] = float('inf')
+                view.weights[profile] = patched
+            view.edge_cost = view.weights[DEFAULT_PROFILE]
+            view.derived = {}
+            # Same closures give the same version in every process
+            view.version = f'{self.data_version}-{zlib.crc32(repr(sorted(closed_pathways)).encode())}'
+        view.closed_pathways = closed_pathways
+        view.closure_version = closure_version
+        view.valid_until = valid_until
+        view.closures_changed_at = changed_at
+        return view
+
+
+def _pathway_rows(accessible):
+    pathways = Pathway.objects.filter(start_point__isnull=False, end_point__isnull=False)
+    if accessible:
+        pathways = pathways.filter(is_accessible=True).exclude(pathway_type__in=INACCESSIBLE_TYPES)
+    return pathways.values_list(
+        'id', 'pathway_type', 'start_point_id', 'end_point_id', 'floor_from_id', 'floor_to_id',
+        'distance_meters', 'estimated_time_minutes',
+    ).order_by('id')
+
+
+def build_graph(variant='full', version=None):
+    """Load pathways and service points into a fresh RoutingGraph"""
+    accessible = variant == 'accessible'
+    costs = routing_costs()
+    floor_numbers = dict(Floor.objects.values_list('id', 'floor_number'))
+
+    points = {}
+    for point_id, floor_id, lat, lon in ServicePoint.objects.values_list('id', 'floor_id', 'latitude', 'longitude').order_by('id'):
+        points[point_id] = (floor_id, lat, lon)
+
+    # Every point gets a node on its own floor so it can always be routed from
+    nodes = [(point_id, floor_id) for point_id, (floor_id, _, _) in points.items()]
+    index = {node: i for i, node in enumerate(nodes)}
+
+    def node_for(point_id, floor_id):
+        key = (point_id, floor_id)
+        if key not in index:
+            index[key] = len(nodes)
+            nodes.append(key)
+        return index[key]
+
+    edges = []  # (source, target, pathway_id, type code, cost, distance, time)
+    for pathway_id, kind, start_id, end_id, floor_from, floor_to, distance, minutes in _pathway_rows(accessible):
+        if start_id not in points or end_id not in points:
+            continue
+        floor_from = floor_from or points[start_id][0]
+        floor_to = floor_to or points[end_id][0]
+        a = node_for(start_id, floor_from)
+        b = node_for(end_id, floor_to)
+
+        floors_up = 0
+        if floor_from != floor_to and floor_from in floor_numbers and floor_to in floor_numbers:
+            floors_up = floor_numbers[floor_to] - floor_numbers[floor_from]
+        is_transition = kind in TRANSITION_TYPES or floor_from != floor_to
+
+        type_code = PATHWAY_TYPE_CODES.index(kind) if kind in PATHWAY_TYPE_CODES else 0
+        for source, target, climb in ((a, b, floors_up), (b, a, -floors_up)):
+            penalty, extra_minutes = transition_penalty(kind, climb, costs) if is_transition else (0.0, 0.0)
+            edges.append((source, target, pathway_id, type_code, distance + penalty, distance, minutes + extra_minutes))
+
+    # Edges were appended in (a -> b, b -> a) pairs; remember each edge's
+    # twin across the sort so searches can walk edges backwards
+    order = sorted(range(len(edges)), key=lambda i: edges[i][0])
+    position = [0] * len(edges)
+    for new, old in enumerate(order):
+        position[old] = new
+    edge_twin = array('l', (position[old ^ 1] for old in order))
+    edges = [edges[old] for old in order]
+
+    offsets = array('l', [0] * (len(nodes) + 1))
+    for edge in edges:
+        offsets[edge[0] + 1] += 1
+    for i in range(len(nodes)):
+        offsets[i + 1] += offsets[i]
+
+    return RoutingGraph(
+        variant=variant,
+        version=version,
+        nodes=nodes,
+        lat=array('d', (points[point_id][1] for point_id, _ in nodes)),
+        lon=array('d', (points[point_id][2] for point_id, _ in nodes)),
+        offsets=offsets,
+        targets=array('l', (e[1] for e in edges)),
+        edge_pathway=array('l', (e[2] for e in edges)),
+        edge_type=array('b', (e[3] for e in edges)),
+        edge_distance=array('d', (e[5] for e in edges)),
+        edge_time=array('d', (e[6] for e in edges)),
+        edge_twin=edge_twin,
+        weights={
+            profile: array('d', (profile_weight(profile, PATHWAY_TYPE_CODES[e[3]], e[4], e[6], costs) for e in edges))
+            for profile, _ in COST_PROFILES
+        },
+    )
+
+
+# =====================================================
+# CLOSURES
+# =====================================================
+
+def active_closures(now=None):
+    """
+    Pathways closed right now.
+    Returns: (set of pathway ids, epoch seconds of the next closure start
+    or end, infinity if none is scheduled, epoch seconds of the last one,
+    minus infinity if none has happened)
+    """
+    now = now or timezone.now()
+    closed = set()
+    next_change = None
+    last_change = PathwayClosure.objects.filter(ends_at__lte=now).aggregate(last=Max('ends_at'))['last']
+    current = PathwayClosure.objects.filter(Q(ends_at__isnull=True) | Q(ends_at__gt=now))
+    for pathway_id, starts_at, ends_at in current.values_list('pathway_id', 'starts_at', 'ends_at'):
+        if starts_at <= now:
+            closed.add(pathway_id)
+            change = ends_at
+            if last_change is None or starts_at > last_change:
+                last_change = starts_at
+        else:
+            change = starts_at
+        if change is not None and (next_change is None or change < next_change):
+            next_change = change
+    return (
+        closed,
+        next_change.timestamp() if next_change else float('inf'),
+        last_change.timestamp() if last_change else float('-inf'),
+    )
+
+
+def invalidate_routes(closed=(), reopened_since=None):
+    """
+    Drop cached Route rows made stale by a closure being saved or deleted:
+    routes over a newly closed pathway (found through the Route.pathways
+    index), and routes computed since reopened_since, which may detour
+    around a pathway that is open again.
+    """
+    if closed:
+        Route.objects.filter(pathways__in=closed).delete()
+    if reopened_since is not None:
+        Route.objects.filter(updated_at__gte=reopened_since).delete()
+
+
+def route_is_stale(route, graph=None, now=None):
+    """
+    True when a closure window opened or ended after route was computed in
+    a way that can change it: one of its pathways has closed since, or a
+    closure in force at the time has ended (it may detour around a pathway
+    that is open again). Closures saved or deleted are handled when that
+    happens (see signals.py); this covers windows that simply came round,
+    whichever process is asked.
+    
+    With the served graph passed, routes computed after the last closure
+    start or end it knows of are current without a query.
+    """
+    since = route.updated_at
+    if graph is not None and since.timestamp() >= graph.closures_changed_at:
+        return False
+    now = now or timezone.now()
+    opened = (
+        Q(pathway__routes=route, starts_at__gt=since, starts_at__lte=now)
+        & (Q(ends_at__isnull=True) | Q(ends_at__gt=now))
+    )
+    ended = Q(starts_at__lte=since, ends_at__gt=since, ends_at__lte=now)
+    return PathwayClosure.objects.filter(opened | ended).exists()
+
+
+# =====================================================
+# VERSIONED CACHE
+# =====================================================
+
+_base_graphs = {}
+_graphs = {}
+_build_lock = threading.Lock()
+
+
+def _version_path(key):
+    """
+    With a shared graph directory, versions live in small files there so
+    every process on the host agrees on them even with a per-process cache
+    backend; otherwise they live in the cache.
+    """
+    directory = getattr(settings, 'NAVIGATOR_SHARED_GRAPH_DIR', '')
+    return os.path.join(directory, key.replace(':', '.')) if directory else None
+
+
+def _read_version(key):
+    path = _version_path(key)
+    if path is None:
+        return cache.get(key)
+    try:
+        with open(path) as f:
+            return int(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_version(key, version, replace=True):
+    """Store a version; with replace=False only if none is set yet. Returns the stored value"""
+    path = _version_path(key)
+    if path is None:
+        if replace:
+            cache.set(key, version, timeout=None)
+        elif not cache.add(key, version, timeout=None):
+            return cache.get(key, version)
+        return version
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        f.write(str(version))
+    try:
+        if replace:
+            os.replace(tmp_path, path)
+        else:
+            os.link(tmp_path, path)
+    except FileExistsError:
+        version = _read_version(key) or version
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return version
+
+
+def _shared_version(key):
+    version = _read_version(key)
+    if version is None:
+        # Add-if-absent so concurrent first readers agree on one value
+        version = _write_version(key, time.time_ns(), replace=False)
+    return version
+
+
+def data_version():
+    """Current routing data version, shared by every process"""
+    return _shared_version(GRAPH_VERSION_KEY)
+
+
+def closure_version():
+    """Current pathway closure version, shared by every process"""
+    return _shared_version(CLOSURE_VERSION_KEY)
+
+
+def bump_version(version=None):
+    """
+    Mark every cached graph stale; called when routing data changes.
+    A snapshot loader passes the version its prebuilt graphs were made for.
+    """
+    return _write_version(GRAPH_VERSION_KEY, version or time.time_ns())
+
+
+def bump_closure_version():
+    """Make every process re-apply closures to its graphs (no rebuild)"""
+    return _write_version(CLOSURE_VERSION_KEY, time.time_ns())
+
+
+def geofence_version():
+    """Current service area version, shared by every process"""
+    return _shared_version(GEOFENCE_VERSION_KEY)
+
+
+def bump_geofence_version():
+    """Mark every process's geofence index stale (see geofence.py)"""
+    return _write_version(GEOFENCE_VERSION_KEY, time.time_ns())
+
+
+def _load_graph(variant, version):
+    """Build the graph, or attach to the copy shared by all workers"""
+    if getattr(settings, 'NAVIGATOR_SHARED_GRAPH_DIR', ''):
+        from .sharedgraph import load_graph
+        return load_graph(variant, version)
+    return build_graph(variant, version)
+
+
+def _is_current(graph, version, closures):
+    return (
+        graph is not None
+        and graph.data_version == version
+        and graph.closure_version == closures
+        and time.time() < graph.valid_until
+    )
+
+
+def get_graph(accessible=False):
+    """
+    Cached RoutingGraph for the current data version with the active
+    closures applied; built on first use, re-derived cheaply when only the
+    closures changed.
+    """
+    variant = 'accessible' if accessible else 'full'
+    version = data_version()
+    closures = closure_version()
+    graph = _graphs.get(variant)
+    if _is_current(graph, version, closures):
+        perf.cache_hit()
+        return graph
+
+    perf.cache_miss()
+    with _build_lock:
+        graph = _graphs.get(variant)
+        if not _is_current(graph, version, closures):
+            base = _base_graphs.get(variant)
+            if base is None or base.data_version != version:
+                with perf.timer('graph_build'):
+                    base = _load_graph(variant, version)
+                _base_graphs[variant] = base
+            closed, valid_until, changed_at = active_closures()
+            graph = base.with_closures(closed, closures, valid_until, changed_at)
+            _graphs[variant] = graph
+    return graph
+
+
+def clear_graphs():
+    _base_graphs.clear()
+    _graphs.clear()
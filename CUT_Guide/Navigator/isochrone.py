@@ -0,0 +1,100 @@
+"""
+Reachability ("what can I reach in T minutes") queries.
+
+One bounded Dijkstra over the 'fastest' (minutes) edge weights finds every
+graph node within the budget. Origins are a service point or a GPS fix,
+which is snapped to the service points within walking distance. Results
+are cached per (graph version, variant, origin, budget bucket): a request
+for 2.5 minutes reuses the 3 minute search and just filters it, so overlays
+for every service type come from one search.
+"""
+
+from math import ceil
+
+from django.core.cache import cache
+
+from .geo import convex_hull
+from .graph import WALKING_SPEED_M_PER_S, get_graph
+from .routing import dijkstra, snap_to_graph
+
+# Budgets are rounded up to whole buckets for caching
+BUDGET_BUCKET_MINUTES = 1
+MAX_BUDGET_MINUTES = 30
+
+# GPS origins are rounded to about 10 m so nearby fixes share a cache entry
+LOCATION_PRECISION = 4
+
+CACHE_TIMEOUT = 600
+
+
+def budget_bucket(minutes):
+    return min(MAX_BUDGET_MINUTES, ceil(minutes / BUDGET_BUCKET_MINUTES) * BUDGET_BUCKET_MINUTES)
+
+
+def _origin_costs(graph, point_id=None, location=None):
+    """Dijkstra start costs (node -> minutes) for a service point or a GPS fix"""
+    if point_id is not None:
+        return dict.fromkeys(graph.nodes_for_point(point_id), 0.0)
+
+    meters_per_minute = WALKING_SPEED_M_PER_S * 60
+    return {node: meters / meters_per_minute for node, meters in snap_to_graph(graph, *location).items()}
+
+
+def reachable(minutes, point_id=None, location=None, accessible=False):
+    """
+    Every service point reachable from the origin within the budget's bucket.
+    Give either point_id or a (latitude, longitude) location.
+
+    Returns:
+        dict with 'bucket' (minutes searched) and 'points', a list of
+        [point_id, minutes, latitude, longitude] sorted by minutes, holding
+        each point's earliest arrival over all of its floor nodes
+    """
+    graph = get_graph(accessible)
+    bucket = budget_bucket(minutes)
+    if point_id is not None:
+        origin = f'p{point_id}'
+    else:
+        location = tuple(round(value, LOCATION_PRECISION) for value in location)
+        origin = f'g{location[0]},{location[1]}'
+    key = f'navigator:isochrone:{graph.version}:{graph.variant}:{origin}:{bucket}'
+
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    sources = _origin_costs(graph, point_id, location)
+    arrivals = {}
+    if sources:
+        costs, _, _ = dijkstra(graph, graph.profile_weights('fastest'), sources, max_cost=bucket)
+        for node, cost in costs.items():
+            point = graph.nodes[node][0]
+            if cost < arrivals.get(point, (float('inf'),))[0]:
+                arrivals[point] = (cost, graph.lat[node], graph.lon[node])
+
+    result = {
+        'bucket': bucket,
+        'points': sorted(
+            ([point, round(cost, 3), lat, lon] for point, (cost, lat, lon) in arrivals.items()),
+            key=lambda row: row[1],
+        ),
+    }
+    cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def hull_polygons(points, bands, origin=None):
+    """
+    One convex hull per time band over the points reachable within it.
+    origin (latitude, longitude) is included in every hull when given.
+    Returns: list of {'minutes', 'coordinates'}, smallest band first
+    """
+    polygons = []
+    for band in sorted(bands):
+        coordinates = [(lat, lon) for _, minutes, lat, lon in points if minutes <= band]
+        if origin is not None:
+            coordinates.append(tuple(origin))
+        hull = convex_hull(coordinates)
+        if hull:
+            polygons.append({'minutes': band, 'coordinates': [list(c) for c in hull]})
+    return polygons
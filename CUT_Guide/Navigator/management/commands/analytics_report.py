@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from Navigator.analytics import DEFAULT_DAYS, DEFAULT_TOP, latency_summary, prune, top_routes, top_searches
+from Navigator.models import ServicePoint
+
+
+class Command(BaseCommand):
+    help = 'Report the most popular searches and routes and their latency from the recorded request analytics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='Entries in each top-N list')
+        parser.add_argument(
+            '--days', type=int, default=DEFAULT_DAYS,
+            help='Only count requests from the last DAYS days (0 for all recorded)',
+        )
+        parser.add_argument('--prune', type=int, metavar='DAYS', help='First delete events older than DAYS days')
+
+    def handle(self, *args, **options):
+        if options['top'] < 1 or options['days'] < 0:
+            raise CommandError('--top must be positive and --days not negative')
+        if options['prune'] is not None:
+            if options['prune'] < 1:
+                raise CommandError('--prune needs at least 1 day')
+            deleted = prune(options['prune'])
+            self.stdout.write(self.style.SUCCESS(f'✓ Deleted {deleted} event(s) older than {options["prune"]} days'))
+
+        window = f'last {options["days"]} days' if options['days'] else 'all time'
+        summary = latency_summary(options['days'])
+        if not summary:
+            self.stdout.write(self.style.WARNING(f'⚠ No requests recorded ({window}); is NAVIGATOR_ANALYTICS_ENABLED on (env NAVIGATOR_ANALYTICS=True)?'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Request analytics, {window}'))
+        for kind, stats in summary.items():
+            self.stdout.write(
+                f'  {kind}: {stats["count"]} requests, p50 {stats["p50"]:.1f} ms, '
+                f'p95 {stats["p95"]:.1f} ms, p99 {stats["p99"]:.1f} ms'
+            )
+
+        searches = top_searches(options['top'], options['days'])
+        if searches:
+            self.stdout.write('')
+            self.stdout.write(f'Top {len(searches)} searches:')
+            for row in searches:
+                self.stdout.write(f'  {row["count"]:>6}  {row["term"]}  ({row["avg_ms"]:.1f} ms avg)')
+
+        routes = top_routes(options['top'], options['days'])
+        if routes:
+            names = dict(ServicePoint.objects.filter(
+                id__in={row['start_id'] for row in routes} | {row['end_id'] for row in routes},
+            ).values_list('id', 'name'))
+            self.stdout.write('')
+            self.stdout.write(f'Top {len(routes)} routes:')
+            for row in routes:
+                start = names.get(row['start_id'], f'#{row["start_id"]} (deleted)')
+                end = names.get(row['end_id'], f'#{row["end_id"]} (deleted)')
+                accessible = ', accessible' if row['accessible'] else ''
+                self.stdout.write(
+                    f'  {row["count"]:>6}  {start} → {end}{accessible}  '
+                    f'({row["avg_ms"]:.1f} ms avg, {row["max_ms"]:.1f} ms max)'
+                )
@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand
+from Navigator.floorplans import build_tiles, needs_tiles
+from Navigator.models import Floor
+
+
+class Command(BaseCommand):
+    help = 'Cut floorplan images into tile pyramids and thumbnails (uploads are normally processed in the background)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--floor', type=int, action='append', default=[], help='Floor id to process (repeatable; default: all)')
+        parser.add_argument('--force', action='store_true', help='Rebuild even when the tiles are up to date')
+
+    def handle(self, *args, **options):
+        floors = Floor.objects.exclude(floorplan_image='').exclude(floorplan_image__isnull=True)
+        if options['floor']:
+            floors = Floor.objects.filter(id__in=options['floor'])
+
+        built = 0
+        for floor in floors.select_related('building'):
+            if not (options['force'] or needs_tiles(floor)):
+                continue
+            start = time.perf_counter()
+            try:
+                manifest = build_tiles(floor, force=options['force'])
+            except (OSError, ValueError) as e:
+                self.stdout.write(self.style.WARNING(f'  ⚠ Skipped {floor}: {e}'))
+                continue
+            if manifest:
+                built += 1
+                self.stdout.write(
+                    f'  ✓ {floor}: {manifest["width"]}×{manifest["height"]} px → {manifest["tiles"]} tiles, '
+                    f'zoom 0-{manifest["max_zoom"]} ({time.perf_counter() - start:.1f}s)'
+                )
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Built tiles for {built} floor(s)'))
@@ -0,0 +1,23 @@
+import os
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from Navigator.snapshot import export_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Export buildings, floors, rooms, services, pathways and routing graphs to a compressed snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, help='Snapshot file (default: campus-<timestamp>.snapshot)')
+        parser.add_argument('--level', type=int, default=9, choices=range(0, 10), help='Compression level 0-9')
+
+    def handle(self, *args, **options):
+        output = options['output'] or f'campus-{timezone.now():%Y%m%d-%H%M%S}.snapshot'
+        manifest = export_snapshot(output, compresslevel=options['level'])
+
+        for table in manifest['tables']:
+            self.stdout.write(f'  {table["model"]:<28} {table["rows"]:>8} rows')
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Snapshot written to {output} ({os.path.getsize(output) / 1024:.1f} KiB, '
+            f'data version {manifest["data_version"]})'
+        ))
@@ -1,6 +1,18 @@
 import json
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from Navigator.geo import parse_utm, project, utm_zone
+from Navigator.graph import bump_geofence_version, bump_version
 from Navigator.models import ServicePoint, Building
+from Navigator.sync import record_changes
+
+# Fields the import sets on each ServicePoint, with the values derived from them
+IMPORT_FIELDS = [
+    'service_type', 'description', 'building', 'latitude', 'longitude',
+    'easting', 'northing', 'is_accessible', 'updated_at',
+]
 
 
 class Command(BaseCommand):
@@ -8,6 +20,10 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('json_file', type=str, help='Path to the JSON file')
+        parser.add_argument(
+            '--no-warmup', action='store_true',
+            help='Skip refreshing the cached routes afterwards (see warm_routes)',
+        )
 
     def handle(self, *args, **options):
         json_file = options['json_file']
@@ -20,6 +36,7 @@ class Command(BaseCommand):
             
             created_count = 0
             skipped_count = 0
+            other_zones = set()
             
             # Get or create a default building for campus locations
             building, _ = Building.objects.get_or_create(
@@ -33,6 +50,9 @@ class Command(BaseCommand):
                 }
             )
             
+            # Parse every record first, then write them all in a few bulk
+            # queries rather than one update_or_create() per point
+            points = {}
             for item in data:
                 try:
                     location_id = item.get('ID', '').strip()
@@ -44,6 +64,12 @@ class Command(BaseCommand):
                         skipped_count += 1
                         continue
                     
+                    # Points are projected from latitude/longitude;
+                    # the file's UTM column only tells us the zone
+                    utm = parse_utm(item.get('UTM'))
+                    if utm and utm[2] != utm_zone():
+                        other_zones.add(item['UTM'].split()[-1])
+                    
                     # Determine service type from location name
                     location_name = location_id.lower()
                     service_type = 'other'
@@ -67,30 +93,63 @@ class Command(BaseCommand):
                     elif 'block' in location_name or 'room' in location_name:
                         service_type = 'office'
                     
-                    # Create or update the ServicePoint
-                    service, created = ServicePoint.objects.update_or_create(
-                        name=location_id,
-                        defaults={
-                            'service_type': service_type,
-                            'description': f'GPS Point: {location_id}',
-                            'building': building,
-                            'latitude': latitude,
-                            'longitude': longitude,
-                        }
-                    )
-                    
-                    if created:
-                        created_count += 1
-                        self.stdout.write(f'  ✓ Created: {location_id} ({service_type})')
+                    # A later record with the same ID replaces an earlier one
+                    points[location_id] = (service_type, float(latitude), float(longitude))
                     
                 except Exception as e:
                     skipped_count += 1
                     self.stdout.write(self.style.WARNING(f'  ⚠ Skipped: {location_id} - {str(e)}'[:100]))
             
+            # Create or update the ServicePoints; bulk writes skip save(),
+            # so set the derived fields here
+            existing = {
+                service.name: service
+                for service in ServicePoint.objects.filter(name__in=list(points)).order_by('id')
+            }
+            now = timezone.now()
+            new, changed = [], []
+            for location_id, (service_type, latitude, longitude) in points.items():
+                service = existing.get(location_id)
+                if service is None:
+                    service = ServicePoint(name=location_id)
+                    new.append(service)
+                else:
+                    changed.append(service)
+                service.service_type = service_type
+                service.description = f'GPS Point: {location_id}'
+                service.building = building
+                service.latitude, service.longitude = latitude, longitude
+                service.easting, service.northing = project(latitude, longitude)
+                service.is_accessible = ServicePoint.accessibility_flag(service.accessibility_features)
+                service.updated_at = now
+            
+            with transaction.atomic():
+                ServicePoint.objects.bulk_create(new, batch_size=500)
+                ServicePoint.objects.bulk_update(changed, IMPORT_FIELDS, batch_size=500)
+                # Bulk writes send no signals
+                record_changes('service', [service.id for service in new + changed])
+            bump_version()
+            bump_geofence_version()
+            
+            created_count = len(new)
+            for service in new:
+                self.stdout.write(f'  ✓ Created: {service.name} ({service.service_type})')
+            
             self.stdout.write(self.style.SUCCESS(f'\n✓ Import completed!'))
             self.stdout.write(f'  Created: {created_count}')
             self.stdout.write(f'  Skipped: {skipped_count}')
             self.stdout.write(self.style.SUCCESS(f'  Total: {created_count + skipped_count}'))
+            if other_zones:
+                self.stdout.write(self.style.WARNING(
+                    f'  ⚠ Points recorded in UTM zone(s) {", ".join(sorted(other_zones))}; '
+                    f'set NAVIGATOR_UTM_ZONE to the campus zone and run reproject'
+                ))
+            
+            # Points moved, so rebuild the graphs and cached routes now rather
+            # than on the first user's request
+            if not options['no_warmup']:
+                self.stdout.write('')
+                call_command('warm_routes', stdout=self.stdout, stderr=self.stderr)
             
         except FileNotFoundError:
             self.stdout.write(self.style.ERROR(f'✗ File not found: {json_file}'))
@@ -0,0 +1,37 @@
+import time
+import zipfile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from Navigator.snapshot import SnapshotError, create_missing_tables, load_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Replace the campus data with a snapshot (fast bulk load, no fixtures)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshot', type=str, help='Snapshot file from export_snapshot')
+        parser.add_argument(
+            '--create-schema', action='store_true',
+            help='Create missing Navigator tables directly from the models instead of running migrations '
+                 '(for fresh read-only nodes)',
+        )
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            if options['create_schema']:
+                created = create_missing_tables(options['database'])
+                if created:
+                    self.stdout.write(f'  Created tables: {", ".join(created)}')
+            manifest = load_snapshot(options['snapshot'], using=options['database'])
+        except FileNotFoundError:
+            raise CommandError(f'File not found: {options["snapshot"]}')
+        except (SnapshotError, zipfile.BadZipFile) as e:
+            raise CommandError(str(e))
+
+        for table in manifest['tables']:
+            self.stdout.write(f'  {table["model"]:<28} {table["rows"]:>8} rows')
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Loaded snapshot from {manifest["created_at"]} in {time.perf_counter() - start:.2f}s'
+        ))
@@ -0,0 +1,101 @@
+import json
+import logging
+import os
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from Navigator.benchmarks.loadtest import (
+    DEFAULT_MIX, ASGITransport, HTTPTransport, LoadTest, TrafficContext, WSGITransport, parse_mix,
+)
+from Navigator.benchmarks.synthetic import CampusSpec, generate_campus
+
+
+class Command(BaseCommand):
+    help = 'Replay a weighted traffic mix against the app and report throughput and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', choices=['wsgi', 'asgi', 'http'], default='wsgi',
+            help='wsgi/asgi: call the app in-process on a synthetic database; http: drive a running server',
+        )
+        parser.add_argument('--url', type=str, default='http://127.0.0.1:8000', help='Server address for --target http')
+        parser.add_argument('--mix', type=str, default=DEFAULT_MIX, help=f'Weighted scenarios (default: {DEFAULT_MIX})')
+        parser.add_argument('--concurrency', type=str, default='1,4,8', help='Comma-separated concurrency levels')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per concurrency level')
+        parser.add_argument('--duration', type=float, help='Seconds per concurrency level (overrides --requests)')
+        parser.add_argument('--buildings', type=int, default=CampusSpec.buildings)
+        parser.add_argument('--floors', type=int, default=CampusSpec.floors)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', type=str, help='Write the full report as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+            levels = [int(level) for level in options['concurrency'].split(',') if level.strip()]
+        except ValueError as e:
+            raise CommandError(str(e))
+        if not levels or min(levels) < 1:
+            raise CommandError('Concurrency levels must be positive integers')
+
+        if options['target'] == 'http':
+            # The server owns its data; sample ids from the database it shares with us
+            ctx = TrafficContext.from_database()
+            report = self.run(HTTPTransport(options['url']), ctx, mix, levels, options)
+        else:
+            report = self.run_in_process(mix, levels, options)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'\n✓ Report written to {options["output"]}'))
+
+    def run_in_process(self, mix, levels, options):
+        # A file-backed test database so worker threads share data and the
+        # real database is never touched
+        tmpdir = tempfile.mkdtemp(prefix='cut-loadtest-')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmpdir, 'loadtest.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            spec = CampusSpec(buildings=options['buildings'], floors=options['floors'], seed=options['seed'])
+            counts = generate_campus(spec)
+            self.stdout.write(self.style.SUCCESS(f'✓ Synthetic campus: {counts}'))
+            transport = ASGITransport() if options['target'] == 'asgi' else WSGITransport()
+            # Every simulated client shares one address; measure the app, not the limiter
+            with override_settings(NAVIGATOR_RATELIMIT_ENABLED=False):
+                report = self.run(transport, TrafficContext.from_database(), mix, levels, options)
+            report['campus'] = counts
+            return report
+        finally:
+            connection.close()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, transport, ctx, mix, levels, options):
+        test = LoadTest(
+            transport, ctx, mix,
+            requests=None if options['duration'] else options['requests'],
+            duration=options['duration'],
+            seed=options['seed'],
+        )
+        self.stdout.write(f'Target: {options["target"]}   mix: {", ".join(f"{n}={w:g}" for n, w in mix)}\n')
+        # Expected 404s (e.g. no service within radius) would flood the console
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        self.stdout.write(f'{"conc":>5} {"reqs":>7} {"4xx":>5} {"5xx/exc":>7} {"rps":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+
+        results = []
+        for level in levels:
+            summary = test.run_level(level).summary()
+            results.append(summary)
+            self.stdout.write(
+                f'{summary["concurrency"]:>5} {summary["requests"]:>7} {summary["client_errors"]:>5} '
+                f'{summary["server_errors"] + summary["errors"]:>7} '
+                f'{summary["throughput_rps"]:>9.1f} {summary["p50_ms"] or 0:>9.1f} '
+                f'{summary["p95_ms"] or 0:>9.1f} {summary["p99_ms"] or 0:>9.1f}'
+            )
+            for name, stats in summary['scenarios'].items():
+                self.stdout.write(
+                    f'      {name:<12} {stats["requests"]:>6} reqs   p50 {stats["p50_ms"]:>8.1f}   '
+                    f'p95 {stats["p95_ms"]:>8.1f}   p99 {stats["p99_ms"]:>8.1f}'
+                )
+
+        return {'target': options['target'], 'mix': dict(mix), 'levels': results}
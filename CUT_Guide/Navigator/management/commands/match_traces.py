@@ -0,0 +1,77 @@
+import json
+import time
+import xml.etree.ElementTree as ET
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from Navigator.mapmatch import MIN_TRAVERSALS, match_traces, observed_times, read_traces, save_times, summarize_proposals
+
+
+class Command(BaseCommand):
+    help = 'Map-match surveyed GPS walking traces onto the pathways to measure walking times and find missing paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='+', type=str,
+            help='GPX files, JSON lines files of {"id", "points": [[lat, lon, time], ...]}, or directories of them',
+        )
+        parser.add_argument(
+            '--processes', type=int,
+            help='Worker processes (default: one per CPU; 1 matches in this process)',
+        )
+        parser.add_argument(
+            '--min-traversals', type=int, default=MIN_TRAVERSALS,
+            help='End-to-end walks of a pathway needed before its time is updated',
+        )
+        parser.add_argument('--min-support', type=int, default=2, help='Traces needed before a missing path is proposed')
+        parser.add_argument('--proposals', type=str, metavar='FILE', help='Write the proposed missing pathways to FILE as JSON')
+        parser.add_argument('--dry-run', action='store_true', help='Report observed times without saving them')
+        parser.add_argument(
+            '--no-warmup', action='store_true',
+            help='Skip refreshing the cached routes afterwards (see warm_routes)',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            totals = match_traces(read_traces(options['paths']), processes=options['processes'], progress=self.report_progress)
+        except OSError as e:
+            raise CommandError(str(e))
+        except (ET.ParseError, KeyError, TypeError, ValueError) as e:
+            raise CommandError(f'Invalid trace data: {e}')
+
+        if not totals['pathways']:
+            raise CommandError('No outdoor pathways to match against')
+        matched = totals['matched'] * 100 // max(totals['fixes'], 1)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Matched {totals["traces"]} trace(s), {totals["fixes"]} fixes ({matched}% on the network) '
+            f'in {time.perf_counter() - start:.2f}s'
+        ))
+
+        times = observed_times(totals['observations'], options['min_traversals'])
+        self.stdout.write(f'  Walked {len(totals["observations"])} pathway(s) end to end, {len(times)} often enough to time')
+        for pathway_id, (old, new, traversals) in sorted(times.items()):
+            self.stdout.write(f'  Pathway {pathway_id}: {old:.2f} → {new:.2f} min ({traversals} traversals)')
+
+        if not options['dry_run'] and times:
+            changed = save_times(times)
+            self.stdout.write(self.style.SUCCESS(f'✓ Updated walking times on {changed} pathway(s)'))
+            # Cached routes carry the old times; refresh them now
+            if changed and not options['no_warmup']:
+                self.stdout.write('')
+                call_command('warm_routes', stdout=self.stdout, stderr=self.stderr)
+
+        proposals = summarize_proposals(totals['proposals'], options['min_support'])
+        if proposals:
+            self.stdout.write(self.style.WARNING(f'⚠ {len(proposals)} possible missing pathway(s):'))
+            for proposal in proposals:
+                self.stdout.write(
+                    f'  {proposal["start_name"]} ↔ {proposal["end_name"]}: {proposal["distance_meters"]} m, '
+                    f'{proposal["estimated_time_minutes"]} min, walked in {proposal["traces"]} trace(s)'
+                )
+        if options['proposals']:
+            with open(options['proposals'], 'w') as f:
+                json.dump(proposals, f, indent=2)
+            self.stdout.write(f'  Proposals written to {options["proposals"]}')
+
+    def report_progress(self, done):
+        self.stdout.write(f'  {done} trace(s) matched')
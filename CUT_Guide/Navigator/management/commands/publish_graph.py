@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from Navigator.graph import VARIANTS, data_version
+from Navigator.sharedgraph import ensure_published, shared_dir
+
+
+class Command(BaseCommand):
+    help = 'Build the routing graphs once and publish them for all worker processes to memory-map'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--watch', type=float, metavar='SECONDS',
+            help='Keep running as the loader process, republishing whenever the data version changes',
+        )
+
+    def handle(self, *args, **options):
+        if not shared_dir():
+            raise CommandError('Set NAVIGATOR_SHARED_GRAPH_DIR to publish a shared graph')
+
+        self.publish_stale()
+        if not options['watch']:
+            return
+
+        self.stdout.write(f'Watching for data changes every {options["watch"]:g}s (Ctrl+C to stop)')
+        try:
+            while True:
+                time.sleep(options['watch'])
+                self.publish_stale()
+        except KeyboardInterrupt:
+            pass
+
+    def publish_stale(self):
+        version = data_version()
+        for variant in VARIANTS:
+            start = time.perf_counter()
+            path, built = ensure_published(variant, version)
+            if built:
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ Published {variant} graph → {path} ({(time.perf_counter() - start) * 1000:.0f} ms)'
+                ))
@@ -0,0 +1,18 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from Navigator.geo import reproject, utm_epsg
+from Navigator.models import Building, Room, ServicePoint
+
+
+class Command(BaseCommand):
+    help = 'Recompute the projected (UTM) coordinates of buildings, rooms and service points, e.g. after changing NAVIGATOR_UTM_ZONE'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            counts = {model._meta.verbose_name_plural: reproject(model.objects.all()) for model in (Building, Room, ServicePoint)}
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Projected {", ".join(f"{count} {name}" for name, count in counts.items())} '
+            f'onto EPSG:{utm_epsg()} in {time.perf_counter() - start:.2f}s'
+        ))
@@ -0,0 +1,77 @@
+import json
+from django.core.management.base import BaseCommand
+from django.db import connection
+from Navigator.benchmarks.suite import BENCHMARKS, run_suite
+from Navigator.benchmarks.synthetic import CampusSpec
+
+
+class Command(BaseCommand):
+    help = 'Run the performance benchmarks against a synthetic campus in a throwaway database'
+
+    def add_arguments(self, parser):
+        defaults = CampusSpec()
+        parser.add_argument('--buildings', type=int, default=defaults.buildings)
+        parser.add_argument('--floors', type=int, default=defaults.floors)
+        parser.add_argument('--rooms-per-floor', type=int, default=defaults.rooms_per_floor)
+        parser.add_argument('--services-per-floor', type=int, default=defaults.services_per_floor)
+        parser.add_argument('--seed', type=int, default=defaults.seed)
+        parser.add_argument('--gps-points', type=int, default=500, help='Records in the import benchmark file')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed iterations per benchmark')
+        parser.add_argument(
+            '--only', action='append', default=[],
+            help=f'Benchmark name prefix to run (repeatable). Available: {", ".join(BENCHMARKS)}',
+        )
+        parser.add_argument('--output', type=str, help='JSON results file (default: benchmark-<revision>.json)')
+        parser.add_argument('--compare', type=str, help='Earlier results file to compare medians against')
+
+    def handle(self, *args, **options):
+        spec = CampusSpec(
+            buildings=options['buildings'],
+            floors=options['floors'],
+            rooms_per_floor=options['rooms_per_floor'],
+            services_per_floor=options['services_per_floor'],
+            seed=options['seed'],
+        )
+
+        def log(name, summary):
+            self.stdout.write(
+                f'  {name:<36} median {summary["median_ms"]:>9.3f} ms   '
+                f'p95 {summary["p95_ms"]:>9.3f} ms   ({summary["runs"]} runs)'
+            )
+
+        # Never touch the real database: benchmark in a fresh test database
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(self.style.SUCCESS(f'✓ Synthetic campus: {spec.as_dict()}'))
+            report = run_suite(spec, repeat=options['repeat'], only=options['only'], gps_points=options['gps_points'], log=log)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        revision = (report['meta']['revision'] or 'unknown')[:10]
+        output = options['output'] or f'benchmark-{revision}.json'
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Results written to {output}'))
+
+        if options['compare']:
+            self.compare(options['compare'], report)
+
+    def compare(self, baseline_file, report):
+        try:
+            with open(baseline_file) as f:
+                baseline = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            self.stdout.write(self.style.ERROR(f'✗ Cannot read {baseline_file}: {e}'))
+            return
+
+        self.stdout.write(f'\nMedian vs {baseline_file} ({(baseline["meta"].get("revision") or "unknown")[:10]}):')
+        for name, summary in report['results'].items():
+            before = baseline.get('results', {}).get(name)
+            if not before or not before['median_ms']:
+                self.stdout.write(f'  {name:<36} (no baseline)')
+                continue
+            ratio = summary['median_ms'] / before['median_ms']
+            style = self.style.SUCCESS if ratio <= 0.95 else self.style.WARNING if ratio >= 1.05 else str
+            self.stdout.write(style(
+                f'  {name:<36} {before["median_ms"]:>9.3f} → {summary["median_ms"]:>9.3f} ms  ({ratio:.2f}x)'
+            ))
@@ -0,0 +1,59 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from Navigator.benchmarks.startup import startup_report
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start time (imports, app setup, URLconf, first request) in fresh interpreters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Cold starts to take the median of')
+        parser.add_argument('--path', type=str, help='Also time a first GET of this path, e.g. /')
+        parser.add_argument('--graph', action='store_true', help='Also time building the routing graphs')
+        parser.add_argument('--top', type=int, default=15, help='Slowest imports to list')
+        parser.add_argument('--output', type=str, help='Write the full report as JSON')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1')
+
+        def log(run, result):
+            self.stdout.write(f'  run {run}: {result["process_ms"]:.0f} ms')
+
+        try:
+            report = startup_report(
+                runs=options['runs'], path=options['path'], graph=options['graph'],
+                top=options['top'], cwd=settings.BASE_DIR, log=log,
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Cold start: {report["process_ms"]:.0f} ms per process (median of {report["runs"]})'
+        ))
+        for phase, ms in report['phases'].items():
+            self.stdout.write(f'  {phase:<16} {ms:>8.1f} ms')
+        if report['status']:
+            self.stdout.write(f'  ({options["path"]} → {report["status"]})')
+
+        self.stdout.write('\nImport time by origin:')
+        for package, ms in report['packages'].items():
+            self.stdout.write(f'  {package:<16} {ms:>8.1f} ms')
+
+        self.stdout.write('\nSlowest imports (self time):')
+        for row in report['slowest_imports']:
+            self.stdout.write(f'  {row["self_ms"]:>7.2f} ms  {row["module"]}  (cumulative {row["cumulative_ms"]:.1f} ms)')
+
+        self.stdout.write('\nNavigator modules loaded before the first request:')
+        self.stdout.write('  ' + ', '.join(report['navigator_modules']))
+        if report['uncompiled']:
+            self.stdout.write(self.style.WARNING(
+                f'\n⚠ Compiled from source on every start (no current .pyc): {", ".join(report["uncompiled"])}'
+                f'\n  Run `python -m compileall .` after deploying'
+            ))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'\n✓ Report written to {options["output"]}'))
@@ -0,0 +1,42 @@
+import os
+import re
+import urllib.request
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from Navigator.assets import VENDOR_ASSETS
+
+# collectstatic fails on source map references whose .map is not vendored
+SOURCE_MAP = re.compile(rb'\n?/[/*]# sourceMappingURL=\S+\s*(?:\*/)?\s*$')
+
+
+class Command(BaseCommand):
+    help = 'Download the third-party CSS/JS/images the pages use into static/vendor/ so no CDN is needed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Download again even if already vendored')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        root = str(settings.STATICFILES_DIRS[0])
+        fetched = 0
+        for name, url in VENDOR_ASSETS.items():
+            path = os.path.join(root, name)
+            if os.path.exists(path) and not options['force']:
+                continue
+            try:
+                with urllib.request.urlopen(url, timeout=options['timeout']) as response:
+                    data = response.read()
+            except OSError as e:
+                raise CommandError(f'Could not fetch {url}: {e}')
+            if name.endswith(('.css', '.js')):
+                data = SOURCE_MAP.sub(b'\n', data)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+            fetched += 1
+            self.stdout.write(f'  ✓ {name} ({len(data) / 1024:.1f} KB)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {fetched} file(s) vendored into {root}; run collectstatic to rebuild the bundles'
+        ))
@@ -0,0 +1,70 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from Navigator.analytics import DEFAULT_DAYS, top_route_pairs
+from Navigator.warmup import DEFAULT_LIMIT, mine_log, mine_routes, read_pairs, unique_pairs, warm_routes
+
+
+class Command(BaseCommand):
+    help = 'Precompute hot routes into the route cache so the first users after a deploy or data change get warm responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pairs', type=str, metavar='FILE',
+            help='File of "start,end[,accessible]" lines ("-" for stdin)',
+        )
+        parser.add_argument(
+            '--log', type=str, action='append', default=[], metavar='FILE',
+            help='Web server access log to mine for the most requested directions (repeatable)',
+        )
+        parser.add_argument(
+            '--from-routes', action='store_true',
+            help='Refresh the most recently used routes already in the cache (default when no other source is given)',
+        )
+        parser.add_argument(
+            '--from-analytics', type=int, nargs='?', const=DEFAULT_DAYS, metavar='DAYS',
+            help='Warm the most requested routes recorded by request analytics in the last DAYS days (default 7)',
+        )
+        parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help='Pairs to take from each mined source')
+        parser.add_argument(
+            '--processes', type=int,
+            help='Worker processes (default: one per CPU; 1 computes in this process)',
+        )
+
+    def handle(self, *args, **options):
+        pairs = []
+        try:
+            if options['pairs']:
+                if options['pairs'] == '-':
+                    pairs += read_pairs(sys.stdin)
+                else:
+                    with open(options['pairs']) as f:
+                        pairs += read_pairs(f)
+            for path in options['log']:
+                with open(path, errors='replace') as f:
+                    pairs += mine_log(f, options['limit'])
+        except OSError as e:
+            raise CommandError(str(e))
+        except ValueError as e:
+            raise CommandError(f'{options["pairs"]}: {e}')
+
+        if options['from_analytics'] is not None:
+            pairs += top_route_pairs(options['limit'], options['from_analytics'])
+        if options['from_routes'] or not (options['pairs'] or options['log'] or options['from_analytics'] is not None):
+            pairs += mine_routes(options['limit'])
+
+        pairs = unique_pairs(pairs)
+        self.stdout.write(f'Warming {len(pairs)} route(s)...')
+        stats = warm_routes(pairs, processes=options['processes'], progress=self.report_progress)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Warmed {stats["routed"]} of {stats["pairs"]} routes in {stats["total_seconds"]:.2f}s '
+            f'(graphs {stats["graph_seconds"] * 1000:.0f} ms)'
+        ))
+        if stats['routed']:
+            per_route = (stats['total_seconds'] - stats['graph_seconds']) / stats['routed'] * 1000
+            self.stdout.write(f'  {per_route:.2f} ms per route')
+        if stats['failed']:
+            self.stdout.write(self.style.WARNING(f'  ⚠ {stats["failed"]} pair(s) had no route or unknown points'))
+
+    def report_progress(self, done, total):
+        self.stdout.write(f'  {done}/{total} ({done * 100 // total}%)')
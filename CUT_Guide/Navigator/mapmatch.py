@@ -0,0 +1,591 @@
+"""
+Map-matching of surveyed walking traces onto the pathway network.
+
+Each trace (a time-stamped sequence of GPS fixes) is matched with a hidden
+Markov model: the hidden state at a fix is a position on an outdoor
+pathway, a state is likelier the closer it lies to the fix (Gaussian GPS
+noise), and a transition is likelier the closer the walking distance over
+the network between two states is to the straight-line distance between
+their fixes. Viterbi picks the most likely sequence of positions.
+
+Matched traces give observed walking times: every time a trace walks a
+pathway end to end, the time between crossing its two service points is
+recorded, and a pathway's estimated_time_minutes becomes the median of
+those times once it has been walked MIN_TRAVERSALS times.
+
+Where a trace leaves the network, or no network route between two fixes
+comes close to what was walked, the matcher breaks the trace. A break
+whose ends are much further apart on the network than on foot is proposed
+as a missing pathway; proposals are reported, never created.
+
+Only outdoor pathways are matched: GPS is unreliable indoors and cannot
+tell floors apart. Traces are streamed from disk and matched across a
+process pool that inherits the network by fork, as in warmup.py; only the
+parent writes to the database.
+"""
+
+import heapq
+import json
+import os
+import xml.etree.ElementTree as ET
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from math import cos, floor, hypot, inf, radians
+from multiprocessing import get_context
+from statistics import median
+
+from django.db import connections, transaction
+
+from .geo import EARTH_RADIUS_METERS, haversine_meters
+from .graph import OUTDOOR_TYPES, bump_version
+from .models import Pathway, ServicePoint
+from .sync import record_changes
+
+# GPS noise (standard deviation) and how far from a fix pathways are considered
+GPS_SIGMA_METERS = 8
+SEARCH_RADIUS_METERS = 30
+MAX_CANDIDATES = 6
+# Scale of the allowed difference between network and straight-line distance
+TRANSITION_BETA_METERS = 15
+# Network routes longer than this times the straight-line distance (plus
+# two search radii) cannot link two fixes
+ROUTE_LIMIT_FACTOR = 3
+
+# Fixes closer than this to the previous one add no information
+MIN_FIX_SPACING_METERS = 3
+# Steps slower than a pause or faster than walking say nothing about a pathway
+MAX_STEP_SECONDS = 60
+MAX_WALKING_SPEED_M_PER_S = 3.0
+
+# End-to-end walks of a pathway before its observed time is trusted
+MIN_TRAVERSALS = 2
+
+# Breaks longer than this are treated as pauses, not as shortcuts
+MAX_BREAK_SECONDS = 300
+MIN_SHORTCUT_METERS = 10
+# A break is a missing pathway when the network detour is this much longer
+DETOUR_RATIO = 1.5
+
+GRID_CELL_METERS = 50
+TRACES_PER_TASK = 20
+
+TRACE_EXTENSIONS = ('.gpx', '.jsonl', '.ndjson', '.json')
+
+_network = None
+
+
+# =====================================================
+# READING TRACES
+# =====================================================
+
+def parse_time(value):
+    """Epoch seconds from a number or an ISO 8601 string"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def read_gpx(path):
+    """Yield (trace id, fixes) for each track segment of a GPX file, parsed incrementally"""
+    name = os.path.basename(path)
+    fixes, segment = [], 0
+    for _, element in ET.iterparse(path, events=('end',)):
+        tag = _local(element.tag)
+        if tag == 'trkpt':
+            time = next((child.text for child in element if _local(child.tag) == 'time'), None)
+            if time:
+                fixes.append((float(element.get('lat')), float(element.get('lon')), parse_time(time.strip())))
+            element.clear()
+        elif tag == 'trkseg':
+            segment += 1
+            if fixes:
+                yield f'{name}#{segment}', fixes
+            fixes = []
+            element.clear()
+
+
+def _json_trace(item, default_id):
+    fixes = [(float(lat), float(lon), parse_time(t)) for lat, lon, t in item['points']]
+    return str(item.get('id', default_id)), fixes
+
+
+def read_json_traces(path):
+    """
+    Yield (trace id, fixes) from JSON lines (one {"id", "points": [[lat,
+    lon, time], ...]} object per line) or a JSON list of such objects.
+    """
+    name = os.path.basename(path)
+    with open(path) as f:
+        if path.endswith('.json'):
+            for number, item in enumerate(json.load(f), 1):
+                yield _json_trace(item, f'{name}#{number}')
+            return
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                yield _json_trace(json.loads(line), f'{name}:{number}')
+
+
+def read_traces(paths):
+    """Yield (trace id, fixes) from trace files and directories of them, one trace at a time"""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from read_traces(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith(TRACE_EXTENSIONS)
+            ))
+        elif path.endswith('.gpx'):
+            yield from read_gpx(path)
+        else:
+            yield from read_json_traces(path)
+
+
+# =====================================================
+# NETWORK
+# =====================================================
+
+class Network:
+    """Outdoor pathways as planar segments, with a grid index and an adjacency list"""
+
+    def __init__(self, points, pathways, cell_meters=GRID_CELL_METERS):
+        """
+        points: {service point id: (latitude, longitude)}
+        pathways: iterable of (pathway id, start point id, end point id)
+        """
+        self.points = points
+        lats = [lat for lat, _ in points.values()] or [0.0]
+        self.lat0 = sum(lats) / len(lats)
+        self.lon0 = sum(lon for _, lon in points.values()) / len(lats) if points else 0.0
+        self.meters_per_lat = radians(1) * EARTH_RADIUS_METERS
+        self.meters_per_lon = self.meters_per_lat * cos(radians(self.lat0))
+        self.cell = cell_meters
+
+        # segment: (pathway id, start point, end point, ax, ay, bx, by, length)
+        self.segments = []
+        self.adjacency = defaultdict(list)
+        self.cells = defaultdict(list)
+        for pathway_id, start, end in pathways:
+            if start == end or start not in points or end not in points:
+                continue
+            ax, ay = self.project(*points[start])
+            bx, by = self.project(*points[end])
+            length = hypot(bx - ax, by - ay)
+            index = len(self.segments)
+            self.segments.append((pathway_id, start, end, ax, ay, bx, by, length))
+            self.adjacency[start].append((end, length, index))
+            self.adjacency[end].append((start, length, index))
+
+            margin = SEARCH_RADIUS_METERS
+            for row in range(self._cell(min(ay, by) - margin), self._cell(max(ay, by) + margin) + 1):
+                for col in range(self._cell(min(ax, bx) - margin), self._cell(max(ax, bx) + margin) + 1):
+                    self.cells[(row, col)].append(index)
+
+    def project(self, latitude, longitude):
+        """Local planar meters (east, north); accurate to well under a meter across a campus"""
+        return (longitude - self.lon0) * self.meters_per_lon, (latitude - self.lat0) * self.meters_per_lat
+
+    def _cell(self, meters):
+        return floor(meters / self.cell)
+
+    def candidates(self, x, y):
+        """
+        Positions on segments within SEARCH_RADIUS_METERS of a projected fix.
+        Returns: up to MAX_CANDIDATES (segment index, offset from its start, distance), nearest first
+        """
+        found = []
+        for index in self.cells.get((self._cell(y), self._cell(x)), ()):
+            _, _, _, ax, ay, bx, by, length = self.segments[index]
+            dx, dy = bx - ax, by - ay
+            t = 0.0 if not length else max(0.0, min(1.0, ((x - ax) * dx + (y - ay) * dy) / (length * length)))
+            distance = hypot(ax + t * dx - x, ay + t * dy - y)
+            if distance <= SEARCH_RADIUS_METERS:
+                found.append((index, t * length, distance))
+        found.sort(key=lambda item: item[2])
+        return found[:MAX_CANDIDATES]
+
+    def shortest(self, source, limit):
+        """
+        Bounded Dijkstra over the segments from a service point.
+        Returns: {point: (meters, segment index used to arrive or None)}
+        """
+        best = {source: (0.0, None)}
+        queue = [(0.0, source)]
+        while queue:
+            distance, point = heapq.heappop(queue)
+            if distance > best[point][0]:
+                continue
+            for neighbor, length, index in self.adjacency.get(point, ()):
+                candidate = distance + length
+                if candidate <= limit and candidate < best.get(neighbor, (inf,))[0]:
+                    best[neighbor] = (candidate, index)
+                    heapq.heappush(queue, (candidate, neighbor))
+        return best
+
+
+def build_network():
+    points = {
+        point_id: (float(lat), float(lon))
+        for point_id, lat, lon in ServicePoint.objects.values_list('id', 'latitude', 'longitude')
+    }
+    pathways = Pathway.objects.filter(
+        pathway_type__in=OUTDOOR_TYPES, start_point__isnull=False, end_point__isnull=False,
+    ).values_list('id', 'start_point_id', 'end_point_id').order_by('id')
+    return Network(points, pathways)
+
+
+# =====================================================
+# MATCHING
+# =====================================================
+
+class _Routes:
+    """Network routes between matched positions, with per-source Dijkstra results reused"""
+
+    def __init__(self, network):
+        self.network = network
+        self.trees = {}
+
+    def _tree(self, source, limit):
+        tree = self.trees.get(source)
+        if tree is None or tree[0] < limit:
+            tree = (limit, self.network.shortest(source, limit))
+            self.trees[source] = tree
+        return tree[1]
+
+    def _pieces(self, tree, point):
+        pieces = []
+        while tree[point][1] is not None:
+            index = tree[point][1]
+            pieces.append((index, self.network.segments[index][7], point))
+            _, start, end = self.network.segments[index][:3]
+            point = start if point == end else end
+        return pieces[::-1]
+
+    def route(self, state_a, state_b, limit):
+        """
+        Shortest walk between two positions (segment index, offset).
+        Returns: (meters, [(segment index, meters walked on it, service point
+        reached at its end, or None for the last piece)]) or None beyond limit
+        """
+        index_a, offset_a = state_a
+        index_b, offset_b = state_b
+        if index_a == index_b:
+            return abs(offset_b - offset_a), [(index_a, abs(offset_b - offset_a), None)]
+
+        segment_a = self.network.segments[index_a]
+        segment_b = self.network.segments[index_b]
+        best = None
+        for exit_point, exit_meters in ((segment_a[1], offset_a), (segment_a[2], segment_a[7] - offset_a)):
+            tree = self._tree(exit_point, limit)
+            for entry_point, entry_meters in ((segment_b[1], offset_b), (segment_b[2], segment_b[7] - offset_b)):
+                if entry_point not in tree:
+                    continue
+                total = exit_meters + tree[entry_point][0] + entry_meters
+                if total <= limit and (best is None or total < best[0]):
+                    best = (total, exit_point, entry_point, exit_meters, entry_meters)
+        if best is None:
+            return None
+        total, exit_point, entry_point, exit_meters, entry_meters = best
+        pieces = [(index_a, exit_meters, exit_point)] + self._pieces(self.trees[exit_point][1], entry_point) + [(index_b, entry_meters, None)]
+        return total, pieces
+
+    def distance(self, point_a, point_b, limit):
+        """Network meters between two service points, or None beyond limit"""
+        meters = self._tree(point_a, limit).get(point_b, (inf,))[0]
+        return meters if meters <= limit else None
+
+
+def _thin(fixes):
+    kept = []
+    for fix in sorted(fixes, key=lambda fix: fix[2]):
+        if not kept or haversine_meters(kept[-1][0], kept[-1][1], fix[0], fix[1]) >= MIN_FIX_SPACING_METERS:
+            kept.append(fix)
+    return kept
+
+
+def viterbi(network, fixes, routes):
+    """
+    Match fixes in runs that the network can explain.
+    Returns: list of runs, each a list of (fix index, (segment index, offset))
+    """
+    runs = []
+    # Per state of the previous fix: (log probability, backpointer index)
+    previous, history = None, []
+
+    def close_run():
+        if not history:
+            return
+        last = history[-1]
+        position = max(range(len(last[1])), key=lambda i: last[1][i][0])
+        run = []
+        for fix_index, column, states in reversed(history):
+            run.append((fix_index, states[position]))
+            position = column[position][1]
+        runs.append(run[::-1])
+        history.clear()
+
+    for fix_index, (lat, lon, _) in enumerate(fixes):
+        x, y = network.project(lat, lon)
+        found = network.candidates(x, y)
+        if not found:
+            close_run()
+            previous = None
+            continue
+        states = [(index, offset) for index, offset, _ in found]
+        emission = [-0.5 * (distance / GPS_SIGMA_METERS) ** 2 for _, _, distance in found]
+
+        column = None
+        if previous is not None:
+            prev_index, prev_states, prev_column = previous
+            straight = haversine_meters(fixes[prev_index][0], fixes[prev_index][1], lat, lon)
+            limit = ROUTE_LIMIT_FACTOR * straight + 2 * SEARCH_RADIUS_METERS
+            column = []
+            for state, log_emission in zip(states, emission):
+                best = (-inf, None)
+                for j, prev_state in enumerate(prev_states):
+                    if prev_column[j][0] == -inf:
+                        continue
+                    route = routes.route(prev_state, state, limit)
+                    if route is None:
+                        continue
+                    score = prev_column[j][0] - abs(route[0] - straight) / TRANSITION_BETA_METERS
+                    if score > best[0]:
+                        best = (score, j)
+                column.append((best[0] + log_emission, best[1]))
+            if all(score == -inf for score, _ in column):
+                # The network cannot explain this step: start a new run here
+                close_run()
+                column = None
+
+        if column is None:
+            column = [(log_emission, None) for log_emission in emission]
+        history.append((fix_index, column, states))
+        previous = (fix_index, states, column)
+
+    close_run()
+    return runs
+
+
+def _endpoint(network, state):
+    """Service point at the nearer end of a matched position's segment"""
+    index, offset = state
+    segment = network.segments[index]
+    return segment[1] if offset <= segment[7] / 2 else segment[2]
+
+
+def _traversals(network, fixes, run, routes):
+    """
+    Yield (pathway id, seconds) for every pathway a run walks end to end,
+    timed between the moments it crosses the pathway's two service points.
+    Crossing times are interpolated along the network route between fixes,
+    so noise in the matched positions evens out instead of adding up.
+    """
+    entered = None  # (segment index, service point, time)
+    for (fix_a, state_a), (fix_b, state_b) in zip(run, run[1:]):
+        started, seconds = fixes[fix_a][2], fixes[fix_b][2] - fixes[fix_a][2]
+        route = routes.route(state_a, state_b, inf)
+        if route is None or not 0 < seconds <= MAX_STEP_SECONDS or route[0] / seconds > MAX_WALKING_SPEED_M_PER_S:
+            # A pause or a glitch: nothing timed across it
+            entered = None
+            continue
+        meters, pieces = route
+        walked = 0.0
+        for position, (index, piece, point) in enumerate(pieces[:-1]):
+            walked += piece
+            crossed = started + (seconds * walked / meters if meters else 0.0)
+            if entered and entered[0] == index and entered[1] != point:
+                yield network.segments[index][0], crossed - entered[2]
+            entered = (pieces[position + 1][0], point, crossed)
+
+
+def _walking_speed(fixes):
+    """Median speed between fixes that look like walking, in m/s"""
+    speeds = []
+    for a, b in zip(fixes, fixes[1:]):
+        seconds = b[2] - a[2]
+        if 0 < seconds <= MAX_STEP_SECONDS:
+            speed = haversine_meters(a[0], a[1], b[0], b[1]) / seconds
+            if speed <= MAX_WALKING_SPEED_M_PER_S:
+                speeds.append(speed)
+    return median(speeds) if speeds else None
+
+
+def match_trace(trace, network=None):
+    """
+    Match one trace and summarise what it says about the network.
+    Returns: dict with the trace id, fix counts, per-pathway traversal
+    times {pathway id: [seconds, ...]} and shortcut proposals
+    [(start point, end point, meters, seconds)]
+    """
+    network = network or _network
+    trace_id, fixes = trace
+    fixes = _thin(fixes)
+    routes = _Routes(network)
+    runs = viterbi(network, fixes, routes)
+
+    observations = defaultdict(list)
+    for run in runs:
+        for pathway_id, seconds in _traversals(network, fixes, run, routes):
+            observations[pathway_id].append(seconds)
+
+    proposals = []
+    speed = _walking_speed(fixes)
+    for run_a, run_b in zip(runs, runs[1:]):
+        (fix_a, state_a), (fix_b, state_b) = run_a[-1], run_b[0]
+        start, end = _endpoint(network, state_a), _endpoint(network, state_b)
+        if start == end or not speed or not 0 < fixes[fix_b][2] - fixes[fix_a][2] <= MAX_BREAK_SECONDS:
+            continue
+        # From the service point the trace left the network at, through the
+        # fixes off it, to the one where it came back
+        path = [network.points[start], *(fix[:2] for fix in fixes[fix_a:fix_b + 1]), network.points[end]]
+        walked = sum(haversine_meters(*a, *b) for a, b in zip(path, path[1:]))
+        if walked < MIN_SHORTCUT_METERS:
+            continue
+        if routes.distance(start, end, DETOUR_RATIO * walked) is None:
+            proposals.append((start, end, walked, walked / speed))
+
+    return {
+        'trace': trace_id,
+        'fixes': len(fixes),
+        'matched': sum(len(run) for run in runs),
+        'observations': dict(observations),
+        'proposals': proposals,
+    }
+
+
+def _match_batch(traces):
+    return [match_trace(trace) for trace in traces]
+
+
+def _batches(traces, size):
+    traces = iter(traces)
+    while True:
+        batch = list(islice(traces, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _bounded_map(pool, function, items, window):
+    """pool.map that keeps only window tasks in flight, so inputs are read as results come back"""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(function, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+# =====================================================
+# RESULTS
+# =====================================================
+
+def observed_times(observations, min_traversals=MIN_TRAVERSALS):
+    """
+    New estimated_time_minutes for pathways walked end to end often enough.
+    observations: {pathway id: [seconds per traversal, ...]}
+    Returns: {pathway id: (old minutes, new minutes, traversals)}
+    """
+    current = Pathway.objects.filter(id__in=observations).values_list('id', 'estimated_time_minutes')
+    times = {}
+    for pathway_id, minutes in current:
+        seen = observations[pathway_id]
+        if len(seen) >= min_traversals:
+            # The median shrugs off the odd traversal with a stop in it
+            times[pathway_id] = (minutes, round(median(seen) / 60, 3), len(seen))
+    return times
+
+
+def save_times(times):
+    """Write observed times; returns how many pathways changed"""
+    changed = [
+        Pathway(id=pathway_id, estimated_time_minutes=new)
+        for pathway_id, (old, new, _) in times.items() if new != old
+    ]
+    with transaction.atomic():
+        Pathway.objects.bulk_update(changed, ['estimated_time_minutes'])
+        record_changes('pathway', [pathway.id for pathway in changed])
+    if changed:
+        # bulk_update sends no signals; edge times feed the fastest profile
+        bump_version()
+    return len(changed)
+
+
+def summarize_proposals(proposals, min_support=1):
+    """
+    Group shortcut proposals by the pair of service points they join.
+    Returns: list of dicts, best supported first
+    """
+    groups = defaultdict(list)
+    for start, end, walked, seconds, trace_id in proposals:
+        groups[tuple(sorted((start, end)))].append((walked, seconds, trace_id))
+    names = dict(ServicePoint.objects.filter(
+        id__in={point for pair in groups for point in pair},
+    ).values_list('id', 'name'))
+
+    summary = []
+    for (start, end), seen in groups.items():
+        if len(seen) < min_support:
+            continue
+        summary.append({
+            'start_point': start,
+            'end_point': end,
+            'start_name': names.get(start),
+            'end_name': names.get(end),
+            'traces': len(seen),
+            'distance_meters': round(median(walked for walked, _, _ in seen), 1),
+            'estimated_time_minutes': round(median(seconds for _, seconds, _ in seen) / 60, 2),
+            'trace_ids': sorted({trace_id for _, _, trace_id in seen})[:10],
+        })
+    summary.sort(key=lambda item: (-item['traces'], item['distance_meters']))
+    return summary
+
+
+def match_traces(traces, processes=None, batch_size=TRACES_PER_TASK, progress=None):
+    """
+    Match a stream of (trace id, fixes) traces.
+
+    processes: worker processes (None = one per CPU, 0 or 1 = in this process)
+    progress: optional callback(traces done) called after each batch
+
+    Returns: dict with pathways (matched against), traces, fixes, matched,
+    observations and proposals (each tagged with its trace id)
+    """
+    global _network
+    _network = build_network()
+    totals = {
+        'pathways': len(_network.segments), 'traces': 0, 'fixes': 0, 'matched': 0,
+        'observations': defaultdict(list), 'proposals': [],
+    }
+    if not _network.segments:
+        return totals
+
+    def collect(results):
+        for result in results:
+            totals['traces'] += 1
+            totals['fixes'] += result['fixes']
+            totals['matched'] += result['matched']
+            for pathway_id, seconds in result['observations'].items():
+                totals['observations'][pathway_id] += seconds
+            totals['proposals'] += [(*proposal, result['trace']) for proposal in result['proposals']]
+        if progress:
+            progress(totals['traces'])
+
+    batches = _batches(traces, batch_size)
+    if processes is not None and processes <= 1:
+        for batch in batches:
+            collect(_match_batch(batch))
+    else:
+        # Forked children must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processes, mp_context=get_context('fork')) as pool:
+            window = 2 * (processes or os.cpu_count() or 1)
+            for results in _bounded_map(pool, _match_batch, batches, window):
+                collect(results)
+
+    totals['observations'] = dict(totals['observations'])
+    return totals
@@ -0,0 +1,133 @@
+import mimetypes
+import os
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.db import connection
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+from . import analytics, perf
+
+# Unhashed static names can change on the next deploy
+UNHASHED_MAX_AGE = 300
+
+
+class PerfMiddleware:
+    """
+    Measure each request and report it via Server-Timing and /metrics.
+    Removed from the stack entirely unless NAVIGATOR_PERF_ENABLED is set.
+    """
+
+    def __init__(self, get_response):
+        if not perf.is_enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        perf.begin_request()
+        try:
+            with connection.execute_wrapper(perf.db_execute_wrapper):
+                response = self.get_response(request)
+        finally:
+            metrics = perf.end_request()
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.view_name if match and match.view_name else 'unresolved'
+        if url_name != 'metrics':
+            perf.registry.record(url_name, metrics)
+        response['Server-Timing'] = perf.server_timing(metrics)
+        return response
+
+
+class AnalyticsMiddleware:
+    """
+    Capture search terms and route pairs with their latency for the
+    analytics reports; recording only appends to an in-memory buffer.
+    Removed from the stack entirely unless NAVIGATOR_ANALYTICS_ENABLED is set.
+    """
+
+    SEARCH_VIEWS = ('search', 'api_search')
+    ROUTE_VIEWS = ('directions', 'api_directions')
+
+    def __init__(self, get_response):
+        if not analytics.is_enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+        if match.url_name in self.SEARCH_VIEWS:
+            # Later pages of a search are not new searches
+            if 'cursor' not in request.GET:
+                analytics.record_search(request.GET.get('q', ''), duration, response.status_code)
+        elif match.url_name in self.ROUTE_VIEWS:
+            analytics.record_route(
+                match.kwargs['start_id'], match.kwargs['end_id'],
+                request.GET.get('accessibility') == 'true', duration, response.status_code,
+            )
+        return response
+
+
+class StaticAssetMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT for hosts without a
+    static file server: hashed names get immutable far-future caching, and
+    the .br/.gz sibling written by collectstatic is sent when the client
+    accepts it. Removed from the stack unless NAVIGATOR_SERVE_STATIC is set.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'NAVIGATOR_SERVE_STATIC', False) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.root = str(settings.STATIC_ROOT)
+        self.hashed = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        content_type, _ = mimetypes.guess_type(name)
+        accepted = {
+            part.split(';')[0].strip()
+            for part in request.headers.get('Accept-Encoding', '').split(',')
+            if not part.replace(' ', '').endswith(';q=0')
+        }
+        encoding = None
+        for suffix, candidate in (('.br', 'br'), ('.gz', 'gzip')):
+            if candidate in accepted and os.path.isfile(path + suffix):
+                path, encoding = path + suffix, candidate
+                break
+
+        response = FileResponse(
+            open(path, 'rb'), content_type=content_type or 'application/octet-stream', filename=os.path.basename(name),
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ['Accept-Encoding'])
+        response['Cache-Control'] = (
+            'public, max-age=31536000, immutable' if name in self.hashed else f'public, max-age={UNHASHED_MAX_AGE}'
+        )
+        return response
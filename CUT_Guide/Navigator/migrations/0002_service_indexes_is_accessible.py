@@ -0,0 +1,54 @@
+# Generated by Django 5.0.2 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+def populate_is_accessible(apps, schema_editor):
+    ServicePoint = apps.get_model('Navigator', 'ServicePoint')
+    ServicePoint.objects.exclude(accessibility_features__isnull=True).exclude(
+        accessibility_features__regex=r'^\s*$'
+    ).update(is_accessible=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Navigator', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicepoint',
+            name='is_accessible',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(populate_is_accessible, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pathway',
+            index=models.Index(fields=['is_accessible', 'pathway_type'], name='pathway_accessible_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['name'], name='room_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['room_number'], name='room_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicepoint',
+            index=models.Index(fields=['service_type', 'name'], name='service_type_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicepoint',
+            index=models.Index(fields=['building', 'service_type'], name='service_building_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicepoint',
+            index=models.Index(fields=['is_accessible', 'service_type'], name='service_accessible_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicepoint',
+            index=models.Index(fields=['latitude', 'longitude'], name='service_lat_lon_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.2 on 2026-10-19 18:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def clear_unindexed_routes(apps, schema_editor):
+    # Cached routes saved before the pathway index cannot be invalidated
+    # selectively; they are recomputed on demand
+    Route = apps.get_model('Navigator', 'Route')
+    Route.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Navigator', '0002_service_indexes_is_accessible'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='pathways',
+            field=models.ManyToManyField(blank=True, related_name='routes', to='Navigator.pathway'),
+        ),
+        migrations.RunPython(clear_unindexed_routes, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='PathwayClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(blank=True, max_length=200)),
+                ('starts_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ends_at', models.DateTimeField(blank=True, help_text='Leave empty to keep closed until removed', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('pathway', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closures', to='Navigator.pathway')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['starts_at', 'ends_at'], name='closure_window_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Navigator', '0003_pathway_closures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='floor',
+            name='floorplan_tiles',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-19 18:54
+
+from django.db import migrations, models
+
+
+def start_feed(apps, schema_editor):
+    # Data from before the feed has no entries; start at version 1 so
+    # clients do one full sync and then follow the feed
+    DataChange = apps.get_model('Navigator', 'DataChange')
+    DataChange.objects.create(model='reset', object_id=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Navigator', '0004_floorplan_tiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(choices=[('building', 'Building'), ('room', 'Room'), ('service', 'Service point'), ('pathway', 'Pathway'), ('reset', 'Full resync')], max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('model', 'object_id')},
+            },
+        ),
+        migrations.RunPython(start_feed, migrations.RunPython.noop),
+    ]
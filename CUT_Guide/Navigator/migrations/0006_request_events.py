@@ -0,0 +1,31 @@
+# Generated by Django 5.0.2 on 2026-10-19 19:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Navigator', '0005_data_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('search', 'Search'), ('route', 'Route')], max_length=10)),
+                ('term', models.CharField(blank=True, help_text='Normalized search text', max_length=100)),
+                ('start_id', models.IntegerField(blank=True, null=True)),
+                ('end_id', models.IntegerField(blank=True, null=True)),
+                ('accessible', models.BooleanField(default=False)),
+                ('status', models.PositiveSmallIntegerField(default=200)),
+                ('duration_ms', models.FloatField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'created_at'], name='request_event_kind_time_idx')],
+            },
+        ),
+    ]
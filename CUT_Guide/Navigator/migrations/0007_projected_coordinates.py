@@ -0,0 +1,96 @@
+# Generated by Django 5.0.2 on 2026-10-19 19:08
+
+import re
+from math import atan2, atanh, cos, cosh, radians, sin, sinh, sqrt
+
+from django.conf import settings
+from django.db import migrations, models
+
+# The UTM projection as of this migration (see Navigator.geo), copied so
+# later changes there cannot change what the migration does
+_A, _F, _K0 = 6378137.0, 1 / 298.257223563, 0.9996
+_N = _F / (2 - _F)
+_RECTIFYING_RADIUS = _A / (1 + _N) * (1 + _N ** 2 / 4 + _N ** 4 / 64)
+_ALPHA = (
+    _N / 2 - 2 * _N ** 2 / 3 + 5 * _N ** 3 / 16,
+    13 * _N ** 2 / 48 - 3 * _N ** 3 / 5,
+    61 * _N ** 3 / 240,
+)
+_E = 2 * sqrt(_N) / (1 + _N)
+
+
+def to_utm(latitude, longitude, number, south):
+    if not (-80 <= latitude <= 84 and -180 <= longitude <= 180):
+        return None, None
+    offset = (longitude - (number * 6 - 183) + 180) % 360 - 180
+    if abs(offset) > 9:
+        return None, None
+    phi = radians(latitude)
+    lam = radians(offset)
+    t = sinh(atanh(sin(phi)) - _E * atanh(_E * sin(phi)))
+    xi = atan2(t, cos(lam))
+    eta = atanh(sin(lam) / sqrt(1 + t * t))
+    easting, northing = eta, xi
+    for j, alpha in enumerate(_ALPHA, 1):
+        easting += alpha * cos(2 * j * xi) * sinh(2 * j * eta)
+        northing += alpha * sin(2 * j * xi) * cosh(2 * j * eta)
+    return (
+        500000.0 + _K0 * _RECTIFYING_RADIUS * easting,
+        _K0 * _RECTIFYING_RADIUS * northing + (10000000.0 if south else 0.0),
+    )
+
+
+def project_existing(apps, schema_editor):
+    zone = re.fullmatch(r'\s*(\d{1,2})\s*([A-Z])\s*', getattr(settings, 'NAVIGATOR_UTM_ZONE', '36K').upper())
+    number, south = int(zone.group(1)), zone.group(2) == 'S' or zone.group(2) < 'N'
+    for name in ('Building', 'Room', 'ServicePoint'):
+        model = apps.get_model('Navigator', name)
+        objects = list(model.objects.only('id', 'latitude', 'longitude'))
+        for obj in objects:
+            obj.easting, obj.northing = to_utm(obj.latitude, obj.longitude, number, south)
+        model.objects.bulk_update(objects, ['easting', 'northing'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Navigator', '0006_request_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='easting',
+            field=models.FloatField(blank=True, editable=False, help_text='UTM easting in meters', null=True),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='northing',
+            field=models.FloatField(blank=True, editable=False, help_text='UTM northing in meters', null=True),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='easting',
+            field=models.FloatField(blank=True, editable=False, help_text='UTM easting in meters', null=True),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='northing',
+            field=models.FloatField(blank=True, editable=False, help_text='UTM northing in meters', null=True),
+        ),
+        migrations.AddField(
+            model_name='servicepoint',
+            name='easting',
+            field=models.FloatField(blank=True, editable=False, help_text='UTM easting in meters', null=True),
+        ),
+        migrations.AddField(
+            model_name='servicepoint',
+            name='northing',
+            field=models.FloatField(blank=True, editable=False, help_text='UTM northing in meters', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='servicepoint',
+            index=models.Index(fields=['easting', 'northing'], name='service_easting_northing_idx'),
+        ),
+        migrations.RunPython(project_existing, migrations.RunPython.noop),
+    ]
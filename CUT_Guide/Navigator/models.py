@@ -1,8 +1,28 @@
 from django.db import models
+from django.db.models import Case, Q, Value, When
 from django.utils import timezone
 
+from .geo import project
 
-class Building(models.Model):
+
+class ProjectedLocation:
+    """
+    Keeps easting/northing (UTM, see geo.project) in step with
+    latitude/longitude on every save. Fixtures get them from a pre_save
+    handler (signals.py), and bulk writes that bypass save() call
+    geo.reproject() or set them directly; readers fall back to
+    latitude/longitude for rows left without (see geo.projected).
+    """
+
+    def save(self, *args, **kwargs):
+        self.easting, self.northing = project(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'easting', 'northing'}
+        super().save(*args, **kwargs)
+
+
+class Building(ProjectedLocation, models.Model):
     """Campus building"""
     name = models.CharField(max_length=100)
     code = models.CharField(max_length=10, unique=True)
@@ -11,6 +31,9 @@ class Building(models.Model):
     # Location fields
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # Projected from latitude/longitude on save, for planar distance math
+    easting = models.FloatField(null=True, blank=True, editable=False, help_text="UTM easting in meters")
+    northing = models.FloatField(null=True, blank=True, editable=False, help_text="UTM northing in meters")
     
     # Building metadata
     total_floors = models.IntegerField(default=1)
@@ -35,6 +58,8 @@ class Floor(models.Model):
     
     # Floorplan image/map
     floorplan_image = models.ImageField(upload_to='floorplans/', null=True, blank=True)
+    # Manifest of the tile pyramid cut from floorplan_image (see floorplans.py)
+    floorplan_tiles = models.JSONField(null=True, blank=True, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -46,7 +71,7 @@ class Floor(models.Model):
         return f"{self.building.name} - {self.floor_name or f'Floor {self.floor_number}'}"
 
 
-class Room(models.Model):
+class Room(ProjectedLocation, models.Model):
     """Individual room within a building"""
     building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name='rooms')
     floor = models.ForeignKey(Floor, on_delete=models.SET_NULL, null=True, blank=True, related_name='rooms')
@@ -70,6 +95,9 @@ class Room(models.Model):
     # Location fields
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # Projected from latitude/longitude on save, for planar distance math
+    easting = models.FloatField(null=True, blank=True, editable=False, help_text="UTM easting in meters")
+    northing = models.FloatField(null=True, blank=True, editable=False, help_text="UTM northing in meters")
     
     # Room metadata
     capacity = models.IntegerField(null=True, blank=True)
@@ -83,12 +111,16 @@ class Room(models.Model):
     class Meta:
         unique_together = ('building', 'room_number')
         ordering = ['building', 'floor', 'room_number']
+        indexes = [
+            models.Index(fields=['name'], name='room_name_idx'),
+            models.Index(fields=['room_number'], name='room_number_idx'),
+        ]
 
     def __str__(self):
         return f"{self.building.code}-{self.room_number} ({self.name})"
 
 
-class ServicePoint(models.Model):
+class ServicePoint(ProjectedLocation, models.Model):
     """Campus facility or service"""
     SERVICE_TYPES = [
         ('library', 'Library'),
@@ -118,21 +150,56 @@ class ServicePoint(models.Model):
     # Location fields
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # Projected from latitude/longitude on save, for planar distance math
+    easting = models.FloatField(null=True, blank=True, editable=False, help_text="UTM easting in meters")
+    northing = models.FloatField(null=True, blank=True, editable=False, help_text="UTM northing in meters")
     
     # Service metadata
     contact_phone = models.CharField(max_length=20, blank=True, null=True)
     office_hours = models.TextField(blank=True, null=True, help_text="e.g., '9AM-5PM Mon-Fri'")
     accessibility_features = models.TextField(blank=True, null=True)
+    # Denormalized from accessibility_features so filters can use an index
+    is_accessible = models.BooleanField(default=False, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['service_type', 'name']
+        indexes = [
+            models.Index(fields=['service_type', 'name'], name='service_type_name_idx'),
+            models.Index(fields=['building', 'service_type'], name='service_building_type_idx'),
+            models.Index(fields=['is_accessible', 'service_type'], name='service_accessible_type_idx'),
+            models.Index(fields=['latitude', 'longitude'], name='service_lat_lon_idx'),
+            models.Index(fields=['easting', 'northing'], name='service_easting_northing_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.get_service_type_display()})"
 
+    @staticmethod
+    def accessibility_flag(features):
+        """is_accessible for the given accessibility_features text"""
+        return bool(features and features.strip())
+
+    @classmethod
+    def update_is_accessible(cls, queryset=None):
+        """
+        Recompute is_accessible in the database, for bulk writes that bypass
+        save() (bulk_create, queryset.update(), raw inserts).
+        Returns: number of rows updated
+        """
+        queryset = cls.objects.all() if queryset is None else queryset
+        has_features = Q(accessibility_features__isnull=False) & ~Q(accessibility_features__regex=r'^\s*$')
+        return queryset.update(is_accessible=Case(When(has_features, then=Value(True)), default=Value(False)))
+
+    def save(self, *args, **kwargs):
+        self.is_accessible = self.accessibility_flag(self.accessibility_features)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'accessibility_features' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'is_accessible'}
+        super().save(*args, **kwargs)
+
 
 class Pathway(models.Model):
     """Paths and corridors for navigation (indoor/outdoor)"""
@@ -161,10 +228,37 @@ class Pathway(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_accessible', 'pathway_type'], name='pathway_accessible_type_idx'),
+        ]
+
     def __str__(self):
         return f"{self.get_pathway_type_display()} - {self.distance_meters}m"
 
 
+class PathwayClosure(models.Model):
+    """Temporary closure of a pathway, e.g. for maintenance"""
+    pathway = models.ForeignKey(Pathway, on_delete=models.CASCADE, related_name='closures')
+    reason = models.CharField(max_length=200, blank=True)
+    starts_at = models.DateTimeField(default=timezone.now)
+    ends_at = models.DateTimeField(null=True, blank=True, help_text="Leave empty to keep closed until removed")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['starts_at', 'ends_at'], name='closure_window_idx'),
+        ]
+
+    def is_active(self, at=None):
+        at = at or timezone.now()
+        return self.starts_at <= at and (self.ends_at is None or at < self.ends_at)
+
+    def __str__(self):
+        return f"{self.pathway} closed from {self.starts_at:%Y-%m-%d %H:%M}"
+
+
 class Route(models.Model):
     """Pre-calculated or user-requested route between two points"""
     start_point = models.ForeignKey(ServicePoint, on_delete=models.CASCADE, related_name='route_starts')
@@ -186,6 +280,10 @@ class Route(models.Model):
         default='mixed'
     )
     
+    # Reverse index from pathways to the cached routes using them, so a
+    # closure only invalidates the routes it affects
+    pathways = models.ManyToManyField(Pathway, blank=True, related_name='routes')
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -207,3 +305,62 @@ class ServiceArea(models.Model):
 
     def __str__(self):
         return f"Service Area: {self.service_point.name}"
+
+
+class DataChange(models.Model):
+    """
+    Change feed for offline clients (see sync.py). Each synced object keeps
+    only its latest entry, whose auto-increment id is the data version it
+    changed at; deleted objects keep theirs as a tombstone.
+    """
+    MODEL_CHOICES = [
+        ('building', 'Building'),
+        ('room', 'Room'),
+        ('service', 'Service point'),
+        ('pathway', 'Pathway'),
+        ('reset', 'Full resync'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.IntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('model', 'object_id')
+
+    def __str__(self):
+        action = 'deleted' if self.deleted else 'changed'
+        return f"v{self.id}: {self.model} {self.object_id} {action}"
+
+
+class RequestEvent(models.Model):
+    """
+    A search or route request captured for analytics (see analytics.py).
+    Point ids are plain integers so history survives deleted points.
+    """
+    KIND_CHOICES = [
+        ('search', 'Search'),
+        ('route', 'Route'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    term = models.CharField(max_length=100, blank=True, help_text="Normalized search text")
+    start_id = models.IntegerField(null=True, blank=True)
+    end_id = models.IntegerField(null=True, blank=True)
+    accessible = models.BooleanField(default=False)
+    status = models.PositiveSmallIntegerField(default=200)
+    duration_ms = models.FloatField()
+    # When the request was served, not when its batch was written
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'created_at'], name='request_event_kind_time_idx'),
+        ]
+
+    def __str__(self):
+        subject = self.term if self.kind == 'search' else f"{self.start_id} → {self.end_id}"
+        return f"{self.kind} {subject} ({self.duration_ms:.0f} ms)"
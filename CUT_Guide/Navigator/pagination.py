@@ -0,0 +1,175 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Pages are addressed by the sort key of the last row shown rather than an
+OFFSET, so fetching page N costs the same as fetching page 1 and rows
+inserted between requests never shift or duplicate results.
+"""
+
+import base64
+import heapq
+import json
+import math
+from itertools import islice
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+
+
+def encode_cursor(values):
+    """Encode a sort key tuple as an opaque URL-safe token"""
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _is_value(value, kind):
+    # bool is an int subclass, and JSON allows NaN, which never compares
+    if isinstance(value, bool) or not isinstance(value, kind):
+        return False
+    return not isinstance(value, float) or math.isfinite(value)
+
+
+def decode_cursor(token, types):
+    """
+    Decode a cursor token back into a sort key list, one value per entry
+    of types (a type or tuple of types each value must have)
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(values, list) or len(values) != len(types):
+        raise InvalidCursor('Cursor has the wrong shape')
+    if not all(_is_value(value, kind) for value, kind in zip(values, types)):
+        raise InvalidCursor('Cursor has the wrong types')
+    return values
+
+
+def field_type(model, name):
+    """Python type(s) of a cursor value for the given ordering field"""
+    internal = model._meta.get_field(name).get_internal_type()
+    if internal.endswith('AutoField') or internal.endswith('IntegerField') or internal in ('ForeignKey', 'OneToOneField'):
+        return int
+    if internal in ('FloatField', 'DecimalField'):
+        return (int, float)
+    return str
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE):
+    """Read ?page_size= from the request, clamped to 1..MAX_PAGE_SIZE"""
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_filter(queryset, fields, values):
+    """
+    Restrict queryset to rows whose (fields) tuple sorts after values.
+    Expands (a, b, c) > (x, y, z) into
+    a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z).
+    """
+    condition = Q()
+    for i, field in enumerate(fields):
+        clause = Q(**{f'{field}__gt': values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            clause &= Q(**{prev_field: prev_value})
+        condition |= clause
+    return queryset.filter(condition)
+
+
+class CursorPage:
+    """One page of results plus the cursor for the page after it"""
+
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def paginate_queryset(queryset, fields, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return a CursorPage of queryset ordered by fields (which must end in a
+    unique column such as 'id'). Only page_size + 1 rows are fetched; a
+    values() queryset pages as dicts.
+    """
+    queryset = queryset.order_by(*fields)
+    if cursor:
+        types = [field_type(queryset.model, field) for field in fields]
+        queryset = keyset_filter(queryset, fields, decode_cursor(cursor, types))
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[f] if isinstance(last, dict) else getattr(last, f) for f in fields])
+    return CursorPage(rows, next_cursor)
+
+
+def _keyed_rows(queryset, label, rank, sort_field, chunk_size):
+    """Stream (sort value, rank, id, label, obj) tuples from a queryset"""
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        yield getattr(obj, sort_field), rank, obj.id, label, obj
+
+
+def merge_querysets(sources, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    K-way merge of several querysets into one cursor-paginated stream.
+
+    sources: list of (label, queryset, sort_field); every queryset is
+    ordered by (sort_field, id) and the merged order is
+    (sort value, source position, id). Each source is keyset-filtered and
+    capped at page_size + 1 rows, then streamed through heapq.merge so at
+    most one page of rows is kept.
+
+    The merge compares sort values in Python, so it agrees with the
+    database only where the database orders strings by code point as
+    Python does: true for SQLite's default BINARY collation, but not for
+    a PostgreSQL or MySQL column with a linguistic collation. There, give
+    the sort field a binary collation ("C" on PostgreSQL, utf8mb4_bin on
+    MySQL) or rows can be skipped or repeated across pages.
+    Returns: CursorPage whose items are (label, object) pairs
+    """
+    position = None
+    if cursor:
+        _, queryset, sort_field = sources[0]
+        position = decode_cursor(cursor, (field_type(queryset.model, sort_field), int, int))
+
+    streams = []
+    for rank, (label, queryset, sort_field) in enumerate(sources):
+        queryset = queryset.order_by(sort_field, 'id')
+        if position is not None:
+            sort_value, cursor_rank, cursor_id = position
+            if rank > cursor_rank:
+                queryset = queryset.filter(**{f'{sort_field}__gte': sort_value})
+            elif rank < cursor_rank:
+                queryset = queryset.filter(**{f'{sort_field}__gt': sort_value})
+            else:
+                queryset = keyset_filter(queryset, [sort_field, 'id'], [sort_value, cursor_id])
+
+        streams.append(_keyed_rows(queryset[:page_size + 1], label, rank, sort_field, page_size + 1))
+
+    merged = list(islice(heapq.merge(*streams, key=lambda row: row[:3]), page_size + 1))
+    next_cursor = None
+    if len(merged) > page_size:
+        merged = merged[:page_size]
+        next_cursor = encode_cursor(merged[-1][:3])
+    return CursorPage([(label, obj) for _, _, _, label, obj in merged], next_cursor)
@@ -0,0 +1,237 @@
+"""
+In-process performance instrumentation.
+
+Request-scoped counters (DB queries, graph build time, search node
+expansions, cache hits) are collected in a thread-local while
+PerfMiddleware is active, emitted as a Server-Timing header and folded
+into per-URL histograms that the /metrics view renders in Prometheus text
+format.
+
+Instrumented code calls timer()/incr()/cache_hit()/cache_miss(); outside a
+measured request (or with NAVIGATOR_PERF_ENABLED off) these return after a
+single attribute lookup.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Upper bounds for each histogram family, in the metric's own unit
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000, 50000)
+
+HISTOGRAMS = {
+    # name: (help text, buckets)
+    'request_duration_seconds': ('Wall time spent handling the request', SECONDS_BUCKETS),
+    'db_query_duration_seconds': ('Time spent in database queries per request', SECONDS_BUCKETS),
+    'db_queries': ('Database queries per request', COUNT_BUCKETS),
+    'graph_build_seconds': ('Time spent building routing graphs per request', SECONDS_BUCKETS),
+    'search_nodes_expanded': ('Nodes settled by route searches per request', COUNT_BUCKETS),
+}
+
+_local = threading.local()
+
+
+def is_enabled():
+    return getattr(settings, 'NAVIGATOR_PERF_ENABLED', False)
+
+
+class RequestMetrics:
+    """Counters for the request currently being handled on this thread"""
+
+    __slots__ = ('started', 'db_queries', 'db_seconds', 'timers', 'counters', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.timers = {}
+        self.counters = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def current():
+    """Metrics for the request on this thread, or None when not measuring"""
+    return getattr(_local, 'metrics', None)
+
+
+def begin_request():
+    _local.metrics = RequestMetrics()
+    return _local.metrics
+
+
+def end_request():
+    metrics = current()
+    _local.metrics = None
+    return metrics
+
+
+@contextmanager
+def timer(name):
+    """Add the duration of the with-block to the named request timer"""
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timers[name] = metrics.timers.get(name, 0.0) + time.perf_counter() - start
+
+
+def incr(name, amount=1):
+    metrics = current()
+    if metrics is not None:
+        metrics.counters[name] = metrics.counters.get(name, 0) + amount
+
+
+def cache_hit():
+    metrics = current()
+    if metrics is not None:
+        metrics.cache_hits += 1
+
+
+def cache_miss():
+    metrics = current()
+    if metrics is not None:
+        metrics.cache_misses += 1
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper hook counting queries and their duration"""
+    metrics = current()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_seconds += time.perf_counter() - start
+
+
+def server_timing(metrics):
+    """Server-Timing header value for a finished request"""
+    parts = [
+        f'total;dur={metrics.elapsed() * 1000:.2f}',
+        f'db;dur={metrics.db_seconds * 1000:.2f};desc="{metrics.db_queries} queries"',
+    ]
+    if 'graph_build' in metrics.timers:
+        parts.append(f'graph;dur={metrics.timers["graph_build"] * 1000:.2f}')
+    if 'nodes_expanded' in metrics.counters:
+        parts.append(f'search;desc="{metrics.counters["nodes_expanded"]} nodes"')
+    lookups = metrics.cache_hits + metrics.cache_misses
+    if lookups:
+        parts.append(f'cache;desc="{metrics.cache_hits}/{lookups} hits"')
+    return ', '.join(parts)
+
+
+# =====================================================
+# AGGREGATION
+# =====================================================
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Process-wide histograms and counters keyed by URL name"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.cache_hits = {}
+        self.cache_misses = {}
+
+    def _observe(self, name, url_name, value):
+        key = (name, url_name)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+    def record(self, url_name, metrics):
+        with self._lock:
+            self._observe('request_duration_seconds', url_name, metrics.elapsed())
+            self._observe('db_query_duration_seconds', url_name, metrics.db_seconds)
+            self._observe('db_queries', url_name, metrics.db_queries)
+            if 'graph_build' in metrics.timers:
+                self._observe('graph_build_seconds', url_name, metrics.timers['graph_build'])
+            if 'nodes_expanded' in metrics.counters:
+                self._observe('search_nodes_expanded', url_name, metrics.counters['nodes_expanded'])
+            self.cache_hits[url_name] = self.cache_hits.get(url_name, 0) + metrics.cache_hits
+            self.cache_misses[url_name] = self.cache_misses.get(url_name, 0) + metrics.cache_misses
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.cache_hits.clear()
+            self.cache_misses.clear()
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in HISTOGRAMS.items():
+                series = sorted(
+                    (url_name, histogram) for (metric, url_name), histogram in self.histograms.items()
+                    if metric == name
+                )
+                if not series:
+                    continue
+                full_name = f'navigator_{name}'
+                lines.append(f'# HELP {full_name} {help_text}')
+                lines.append(f'# TYPE {full_name} histogram')
+                for url_name, histogram in series:
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{full_name}_bucket{{view="{url_name}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{full_name}_bucket{{view="{url_name}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{full_name}_sum{{view="{url_name}"}} {histogram.total:.6f}')
+                    lines.append(f'{full_name}_count{{view="{url_name}"}} {histogram.count}')
+
+            for name, values, help_text in (
+                ('navigator_cache_hits_total', self.cache_hits, 'Route/graph cache hits'),
+                ('navigator_cache_misses_total', self.cache_misses, 'Route/graph cache misses'),
+            ):
+                if not values:
+                    continue
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for url_name in sorted(values):
+                    lines.append(f'{name}{{view="{url_name}"}} {values[url_name]}')
+
+            ratios = {
+                url_name: hits / (hits + self.cache_misses.get(url_name, 0))
+                for url_name, hits in self.cache_hits.items()
+                if hits + self.cache_misses.get(url_name, 0)
+            }
+            if ratios:
+                lines.append('# HELP navigator_cache_hit_ratio Cache hits over lookups since start')
+                lines.append('# TYPE navigator_cache_hit_ratio gauge')
+                for url_name in sorted(ratios):
+                    lines.append(f'navigator_cache_hit_ratio{{view="{url_name}"}} {ratios[url_name]:.4f}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
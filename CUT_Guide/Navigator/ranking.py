@@ -0,0 +1,253 @@
+"""
+Location-aware search ranking.
+
+With the searcher's position known, results are ordered by a blend of
+text relevance and proximity rather than by name: the nearest toilets come
+first when someone searches "toilet".
+
+Every searchable Building, Room and ServicePoint sits in an in-memory grid
+of GRID_CELL_METERS cells over its projected (UTM) coordinates, rebuilt
+when the sync data version changes (see sync.py). A query visits cells in rings around the searcher, scores the
+candidates in them and keeps the best in a heap bounded to one page. Each
+ring is further away than the last, so once even a perfect text match
+there could not beat the worst result kept, the search stops: the cost
+depends on how much lies near the searcher, not on how many objects match
+the text.
+"""
+
+import heapq
+import re
+import threading
+from math import floor, hypot
+
+from . import perf
+from .geo import planar_meters, projected, to_utm, utm_scale
+from .models import Building, Room, ServicePoint
+from .pagination import CursorPage, InvalidCursor, decode_cursor, encode_cursor
+from .sync import current_version
+
+GRID_CELL_METERS = 100
+
+# Searchers further than this from everything indexed are ranked as if
+# they gave no position: distance means nothing from off campus
+MAX_SEARCH_DISTANCE_METERS = 5000
+
+# score = TEXT_WEIGHT * text score + (1 - TEXT_WEIGHT) * proximity, where
+# proximity halves at DISTANCE_SCALE_METERS
+TEXT_WEIGHT = 0.6
+DISTANCE_SCALE_METERS = 200
+
+# Text scores by how the query matches a field
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING, ALL_WORDS = 1.0, 0.85, 0.75, 0.55, 0.45
+
+# Result labels in tie-break order, as in views._search_sources
+LABELS = ['Building', 'Room', 'ServicePoint']
+
+NON_WORD = re.compile(r'[^0-9a-z]+')
+SERVICE_TYPE_NAMES = dict(ServicePoint.SERVICE_TYPES)
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def normalize(text):
+    """Lower-case words separated by single spaces, with a leading space"""
+    return ' ' + NON_WORD.sub(' ', (text or '').lower()).strip()
+
+
+def text_score(query, words, fields):
+    """
+    How well a normalized query matches an object's (normalized text,
+    weight) fields, from 0 (no match) to 1.
+    """
+    best = 0.0
+    for text, weight in fields:
+        if text == query:
+            score = EXACT
+        elif text.startswith(query):
+            score = PREFIX
+        elif query in text:
+            score = WORD_PREFIX
+        elif query[1:] in text:
+            score = SUBSTRING
+        elif len(words) > 1 and all(word in text for word in words):
+            score = ALL_WORDS
+        else:
+            continue
+        best = max(best, score * weight)
+    return best
+
+
+def proximity(meters):
+    return DISTANCE_SCALE_METERS / (DISTANCE_SCALE_METERS + meters)
+
+
+class SearchIndex:
+    """Searchable objects in a uniform grid"""
+
+    def __init__(self, entries, version=None, cell_meters=GRID_CELL_METERS):
+        """entries: iterable of (label, id, easting, northing, [(text, weight), ...])"""
+        self.version = version
+        self.entries = [
+            (LABELS.index(label), object_id, x, y, tuple((normalize(text), weight) for text, weight in fields))
+            for label, object_id, x, y, fields in entries
+        ]
+        self.cell = cell_meters
+
+        self.cells = {}
+        for position, entry in enumerate(self.entries):
+            self.cells.setdefault(self._cell(entry[2], entry[3]), []).append(position)
+        rows = [row for row, _ in self.cells] or [0]
+        cols = [col for _, col in self.cells] or [0]
+        self.bounds = (min(rows), max(rows), min(cols), max(cols))
+        xs = [entry[2] for entry in self.entries] or [0]
+        ys = [entry[3] for entry in self.entries] or [0]
+        self.extent = (min(xs), max(xs), min(ys), max(ys))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _cell(self, x, y):
+        return floor(y / self.cell), floor(x / self.cell)
+
+    def _rings(self, row, col):
+        """
+        Cell lists ring by ring around (row, col), with each ring's minimum
+        grid distance in meters. Rings are clipped to the occupied bounds
+        and start at the first one reaching them, so a searcher far off
+        the grid costs no more than one at its edge.
+        """
+        min_row, max_row, min_col, max_col = self.bounds
+        first = max(min_row - row, row - max_row, min_col - col, col - max_col, 0)
+        last = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+        for ring in range(first, last + 1):
+            cells = []
+            for r in range(max(row - ring, min_row), min(row + ring, max_row) + 1):
+                if abs(r - row) == ring:
+                    cols = range(max(col - ring, min_col), min(col + ring, max_col) + 1)
+                else:
+                    cols = [c for c in (col - ring, col + ring) if min_col <= c <= max_col]
+                cells.extend(self.cells.get((r, c), ()) for c in cols)
+            # The searcher may sit anywhere in the centre cell
+            yield max(0, ring - 1) * self.cell, cells
+
+    def near(self, x, y, meters=MAX_SEARCH_DISTANCE_METERS):
+        """True when projected point (x, y) is within meters of the indexed area"""
+        if not self.entries:
+            return False
+        min_x, max_x, min_y, max_y = self.extent
+        dx = max(min_x - x, 0, x - max_x)
+        dy = max(min_y - y, 0, y - max_y)
+        return hypot(dx, dy) <= meters * utm_scale(x)
+
+    def search(self, query, latitude, longitude, k, after=None):
+        """
+        The k best matches for query around a position, best first, that
+        rank after the given (score, label rank, id) key.
+        Returns: list of (score, label rank, id, distance meters)
+        """
+        query = normalize(query)
+        words = query.split()
+        if not words:
+            return []
+        after_key = (-after[0], after[1], after[2]) if after else None
+
+        # Min-heap on (score, -rank, -id): heap[0] is the worst result kept
+        heap = []
+        x, y = to_utm(latitude, longitude)
+        # Grid to ground meters, with room for the scale's change across campus
+        scale = utm_scale(x) * 1.001
+        row, col = self._cell(x, y)
+        for min_distance, cells in self._rings(row, col):
+            if len(heap) >= k and TEXT_WEIGHT + (1 - TEXT_WEIGHT) * proximity(min_distance / scale) < heap[0][0]:
+                break
+            for positions in cells:
+                for position in positions:
+                    rank, object_id, entry_x, entry_y, fields = self.entries[position]
+                    relevance = text_score(query, words, fields)
+                    if not relevance:
+                        continue
+                    distance = planar_meters(x, y, entry_x, entry_y)
+                    score = TEXT_WEIGHT * relevance + (1 - TEXT_WEIGHT) * proximity(distance)
+                    if after_key and (-score, rank, object_id) <= after_key:
+                        continue
+                    item = (score, -rank, -object_id, distance)
+                    if len(heap) < k:
+                        heapq.heappush(heap, item)
+                    elif item > heap[0]:
+                        heapq.heapreplace(heap, item)
+
+        return [(score, -rank, -object_id, distance) for score, rank, object_id, distance in sorted(heap, reverse=True)]
+
+
+def build_index(version=None):
+    entries = []
+    position = ('easting', 'northing', 'latitude', 'longitude')
+    for object_id, name, code, *location in Building.objects.values_list('id', 'name', 'code', *position):
+        entries.append(('Building', object_id, *projected(*location), [(name, 1.0), (code, 1.0)]))
+    for object_id, name, number, *location in Room.objects.values_list('id', 'name', 'room_number', *position):
+        entries.append(('Room', object_id, *projected(*location), [(name, 1.0), (number, 1.0)]))
+    for object_id, name, service_type, *location in ServicePoint.objects.values_list('id', 'name', 'service_type', *position):
+        fields = [(name, 1.0), (service_type, 0.9), (SERVICE_TYPE_NAMES.get(service_type), 0.9)]
+        entries.append(('ServicePoint', object_id, *projected(*location), fields))
+    # Rows without a usable position cannot be ranked by distance
+    return SearchIndex([entry for entry in entries if entry[2] is not None], version)
+
+
+def get_index():
+    """The process's SearchIndex for the current data version"""
+    global _index
+    version = current_version()
+    index = _index
+    if index is not None and index.version == version:
+        perf.cache_hit()
+        return index
+
+    perf.cache_miss()
+    with _index_lock:
+        if _index is None or _index.version != version:
+            with perf.timer('search_index_build'):
+                _index = build_index(version)
+        return _index
+
+
+def near_campus(latitude, longitude):
+    """True when a searcher's position is close enough to rank results by distance"""
+    return get_index().near(*to_utm(latitude, longitude))
+
+
+def ranked_search(query, latitude, longitude, cursor=None, page_size=20):
+    """
+    One page of search results ranked by relevance and distance.
+    Returns: CursorPage of (label, object) pairs; objects carry .distance
+    (meters) and .score
+    """
+    after = None
+    if cursor:
+        after = decode_cursor(cursor, ((int, float), int, int))
+        if not 0 <= after[1] < len(LABELS):
+            raise InvalidCursor('Cursor has the wrong shape')
+
+    hits = get_index().search(query, latitude, longitude, page_size + 1, after)
+    next_cursor = None
+    if len(hits) > page_size:
+        hits = hits[:page_size]
+        next_cursor = encode_cursor(hits[-1][:3])
+
+    querysets = {
+        'Building': Building.objects.all(),
+        'Room': Room.objects.select_related('building'),
+        'ServicePoint': ServicePoint.objects.select_related('building'),
+    }
+    objects = {
+        label: querysets[label].in_bulk([object_id for _, rank, object_id, _ in hits if LABELS[rank] == label])
+        for label in LABELS
+    }
+    items = []
+    for score, rank, object_id, distance in hits:
+        obj = objects[LABELS[rank]].get(object_id)
+        # Deleted since the index was built
+        if obj is not None:
+            obj.score, obj.distance = score, distance
+            items.append((LABELS[rank], obj))
+    return CursorPage(items, next_cursor)
@@ -0,0 +1,159 @@
+"""
+Per-client rate limiting for the JSON APIs.
+
+Each client gets a token bucket per scope for its IP address and, when
+signed in, another for its account; a request takes a token from both and
+is refused if either is empty. Registration is open, so signing up for
+fresh accounts must not buy a fresh allowance. Buckets live in the cache,
+so every worker process shares them when the cache is shared (Redis,
+Memcached); with the default local-memory cache each process limits on
+its own.
+
+A bucket is stored as a single integer, its "theoretical arrival time"
+(GCRA): the moment it would be full again, in milliseconds. Taking a token
+is one atomic cache.incr() by the refill interval; the request is allowed
+if the result is at most a full bucket's worth of intervals ahead of now.
+Rejected requests give their token back with cache.decr(), and the key
+expires once the bucket has refilled, so idle clients cost nothing.
+"""
+
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+# Scope: (requests per minute, burst)
+RATE_LIMITS = {
+    # Proximity lookups: nearest/nearby services, geofences
+    'proximity': (120, 30),
+    # Route searches: directions, route geometry, isochrones
+    'routing': (60, 20),
+    # Search and the service directory
+    'search': (120, 30),
+    # Change feed; a full copy pages through the whole dataset
+    'sync': (30, 10),
+}
+
+KEY_PREFIX = 'ratelimit'
+
+
+def is_enabled():
+    return getattr(settings, 'NAVIGATOR_RATELIMIT_ENABLED', True)
+
+
+def get_limits(scope):
+    return getattr(settings, 'NAVIGATOR_RATE_LIMITS', {}).get(scope, RATE_LIMITS[scope])
+
+
+def client_ip(request):
+    """
+    The client's address. Behind NAVIGATOR_RATELIMIT_PROXIES trusted
+    reverse proxies it is that many entries from the end of
+    X-Forwarded-For, since earlier entries are whatever the client sent.
+    """
+    proxies = getattr(settings, 'NAVIGATOR_RATELIMIT_PROXIES', 0)
+    if proxies:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_keys(request, scope):
+    """Bucket keys charged for a request: its IP address, and its account when signed in"""
+    keys = [f'{KEY_PREFIX}:{scope}:ip:{client_ip(request)}']
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        keys.append(f'{KEY_PREFIX}:{scope}:user:{user.pk}')
+    return keys
+
+
+def _interval(per_minute):
+    """Milliseconds for one token to refill"""
+    return max(1, round(60000 / per_minute))
+
+
+def take(cache, key, per_minute, burst, now=None):
+    """
+    Take one token from the bucket at key.
+    Returns: (allowed, tokens remaining, seconds until the next token when rejected)
+    """
+    now = int(time.time() * 1000) if now is None else now
+    interval = _interval(per_minute)
+    capacity = burst * interval
+
+    try:
+        arrival = cache.incr(key, interval)
+    except ValueError:
+        if cache.add(key, now + interval, math.ceil(interval / 1000)):
+            arrival = now + interval
+        else:
+            arrival = cache.incr(key, interval)
+
+    if arrival - interval < now:
+        # The bucket had refilled; count from now. Requests racing through
+        # here at the same moment can each restart it, so a burst may
+        # overshoot by the number of concurrent requests at most.
+        arrival = now + interval
+        cache.set(key, arrival, math.ceil(interval / 1000))
+    elif arrival - now > capacity:
+        cache.decr(key, interval)
+        return False, 0, (arrival - now - capacity) / 1000
+    else:
+        cache.touch(key, math.ceil((arrival - now) / 1000))
+    return True, (capacity - (arrival - now)) // interval, 0.0
+
+
+def give_back(cache, key, per_minute):
+    """Return a token taken from the bucket at key, for a request refused by another bucket"""
+    try:
+        cache.decr(key, _interval(per_minute))
+    except ValueError:
+        pass  # Expired meanwhile: the bucket is full anyway
+
+
+def take_all(cache, keys, per_minute, burst, now=None):
+    """
+    Take one token from every bucket, or from none if any is empty.
+    Returns: (allowed, fewest tokens remaining, seconds until the next token when rejected)
+    """
+    taken = []
+    remaining = burst
+    for key in keys:
+        allowed, left, retry_after = take(cache, key, per_minute, burst, now)
+        if not allowed:
+            for taken_key in taken:
+                give_back(cache, taken_key, per_minute)
+            return False, 0, retry_after
+        taken.append(key)
+        remaining = min(remaining, left)
+    return True, remaining, 0.0
+
+
+def rate_limit(scope):
+    """
+    Limit a view to the scope's rate per client; over the limit it answers
+    429 with Retry-After instead of running the view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not is_enabled():
+                return view(request, *args, **kwargs)
+            per_minute, burst = get_limits(scope)
+            cache = caches[getattr(settings, 'NAVIGATOR_RATELIMIT_CACHE', 'default')]
+            allowed, remaining, retry_after = take_all(cache, client_keys(request, scope), per_minute, burst)
+
+            if allowed:
+                response = view(request, *args, **kwargs)
+            else:
+                response = JsonResponse({'error': 'Rate limit exceeded', 'retry_after': math.ceil(retry_after)}, status=429)
+                response['Retry-After'] = str(math.ceil(retry_after))
+            response['X-RateLimit-Limit'] = str(burst)
+            response['X-RateLimit-Remaining'] = str(remaining)
+            return response
+        return wrapped
+    return decorator
@@ -1,178 +1,688 @@
 """
 Campus navigation routing module using Dijkstra's algorithm.
-Supports both indoor and outdoor navigation.
+Supports indoor, outdoor and multi-floor navigation over the layered
+graph built in graph.py.
 """
 
 import heapq
-from django.contrib.gis.geos import Point
-from django.contrib.gis.db.models.functions import Distance
+import threading
+from array import array
+from django.db import IntegrityError, transaction
+from . import perf
+from .geo import within_radius
+from .graph import COST_PROFILES, DEFAULT_PROFILE, get_graph, route_is_stale
 from .models import ServicePoint, Pathway, Route
 
+INFINITY = float('inf')
+
+PROFILE_NAMES = [name for name, _ in COST_PROFILES]
+
+# Criteria traded off against each other by default in Pareto mode
+PARETO_PROFILES = ('shortest', 'fastest', 'sheltered')
+
+# Alternative routes: longest detour accepted relative to the best route,
+# and the largest share of an alternative's distance it may have in common
+# with a route already offered
+ALTERNATIVE_MAX_STRETCH = 1.5
+ALTERNATIVE_MAX_OVERLAP = 0.8
+
+# A GPS fix joins the graph at service points within this walking distance
+SNAP_RADIUS_METERS = 150
+
+_table_lock = threading.Lock()
+
+
+def dijkstra(graph, weights, sources, targets=None, max_cost=None):
+    """
+    Dijkstra over a RoutingGraph's CSR arrays.
+    
+    Args:
+        weights: per-edge weight array (e.g. graph.edge_cost)
+        sources: node indices that start at cost 0, or a dict of node
+            index -> starting cost
+        targets: optional set of node indices; stop when the first is settled
+        max_cost: optional bound; nodes beyond it are never settled
+        
+    Returns:
+        (costs, previous, reached) where costs maps settled node -> cost,
+        previous maps node -> (previous node, edge index) and reached is the
+        settled target node or None
+    """
+    offsets, edge_targets = graph.offsets, graph.targets
+    best = {}
+    previous = {}
+    costs = {}
+    queue = []
+    start_costs = sources if isinstance(sources, dict) else dict.fromkeys(sources, 0.0)
+    for node, start_cost in start_costs.items():
+        best[node] = start_cost
+        previous[node] = None
+        queue.append((start_cost, node))
+    heapq.heapify(queue)
+    reached = None
+    
+    while queue:
+        cost, node = heapq.heappop(queue)
+        if node in costs:
+            continue
+        if max_cost is not None and cost > max_cost:
+            break
+        costs[node] = cost
+        
+        if targets is not None and node in targets:
+            reached = node
+            break
+        
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = edge_targets[e]
+            if neighbor in costs:
+                continue
+            new_cost = cost + weights[e]
+            if new_cost < best.get(neighbor, INFINITY):
+                best[neighbor] = new_cost
+                previous[neighbor] = (node, e)
+                heapq.heappush(queue, (new_cost, neighbor))
+    
+    perf.incr('nodes_expanded', len(costs))
+    return costs, previous, reached
+
+
+def trace_path(previous, node):
+    """(nodes, edges) from the search source to node, in travel order"""
+    nodes = [node]
+    edges = []
+    while previous.get(node) is not None:
+        node, edge = previous[node]
+        nodes.append(node)
+        edges.append(edge)
+    nodes.reverse()
+    edges.reverse()
+    return nodes, edges
+
+
+def reverse_shortest_path_tree(graph, weights, targets, sources, max_stretch=None):
+    """
+    Dijkstra backwards from the targets over graph.incoming().
+    
+    Settles nodes until every source is settled; with max_stretch the
+    search then keeps going until max_stretch times the best source cost,
+    so the tree covers every node a bounded detour could pass through.
+    
+    Returns:
+        (costs, following, limit) where costs maps node -> exact cost to the
+        nearest target, following maps node -> (next node, edge index) along
+        that optimal path and limit is the cost the search stopped at
+        (infinity when it ran to exhaustion)
+    """
+    offsets, edge_targets, twin = graph.offsets, graph.targets, graph.edge_twin
+    best = {}
+    following = {}
+    costs = {}
+    queue = []
+    for node in targets:
+        best[node] = 0.0
+        following[node] = None
+        queue.append((0.0, node))
+    heapq.heapify(queue)
+    pending = set(sources)
+    limit = INFINITY
+    
+    while queue:
+        cost, node = heapq.heappop(queue)
+        if node in costs:
+            continue
+        if cost > limit:
+            break
+        costs[node] = cost
+        
+        if node in pending:
+            pending.discard(node)
+            if max_stretch is None and not pending:
+                limit = cost
+                break
+            if max_stretch is not None and limit == INFINITY:
+                limit = cost * max_stretch
+        
+        # Edge e leaves node, so its twin arrives at node from edge_targets[e]
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = edge_targets[e]
+            if neighbor in costs:
+                continue
+            incoming = twin[e]
+            new_cost = cost + weights[incoming]
+            if new_cost < best.get(neighbor, INFINITY):
+                best[neighbor] = new_cost
+                following[neighbor] = (node, incoming)
+                heapq.heappush(queue, (new_cost, neighbor))
+    
+    perf.incr('nodes_expanded', len(costs))
+    return costs, following, limit
+
+
+def follow_tree(following, node):
+    """(nodes, edges) from node to the tree's target, in travel order"""
+    nodes = [node]
+    edges = []
+    while following.get(node) is not None:
+        node, edge = following[node]
+        nodes.append(node)
+        edges.append(edge)
+    return nodes, edges
+
+
+def _spur_search(graph, weights, tree, spur_node, blocked_nodes, blocked_edges, max_cost):
+    """
+    A* from spur_node to the tree's targets avoiding the blocked nodes and
+    edges, for Yen's algorithm.
+    
+    The reverse tree's exact costs are the heuristic (blocking only makes
+    paths longer, so they stay admissible and consistent), and as soon as a
+    popped node's own tree path is free of blocked nodes and edges the
+    route is completed from the tree instead of searched for.
+    """
+    tree_costs, following, limit = tree
+    offsets, edge_targets = graph.offsets, graph.targets
+    
+    def heuristic(node):
+        # Nodes the bounded reverse search never settled are at least limit away
+        return tree_costs.get(node, limit)
+    
+    def tree_path_is_clear(node):
+        while following.get(node) is not None:
+            node, edge = following[node]
+            if edge in blocked_edges or node in blocked_nodes:
+                return False
+        return True
+    
+    best = {spur_node: 0.0}
+    previous = {spur_node: None}
+    settled = set()
+    queue = [(heuristic(spur_node), 0.0, spur_node)]
+    result = None
+    
+    while queue:
+        estimate, cost, node = heapq.heappop(queue)
+        if node in settled:
+            continue
+        if estimate > max_cost:
+            break
+        settled.add(node)
+        
+        if node in tree_costs and tree_path_is_clear(node):
+            head_nodes, head_edges = trace_path(previous, node)
+            tail_nodes, tail_edges = follow_tree(following, node)
+            result = (cost + tree_costs[node], head_nodes + tail_nodes[1:], head_edges + tail_edges)
+            break
+        
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = edge_targets[e]
+            if neighbor in settled or neighbor in blocked_nodes or e in blocked_edges:
+                continue
+            new_cost = cost + weights[e]
+            if new_cost < best.get(neighbor, INFINITY):
+                best[neighbor] = new_cost
+                previous[neighbor] = (node, e)
+                heapq.heappush(queue, (new_cost + heuristic(neighbor), new_cost, neighbor))
+    
+    perf.incr('nodes_expanded', len(settled))
+    return result
+
+
+def _shared_distance(graph, edges, other_pathways):
+    return sum(graph.edge_distance[e] for e in edges if graph.edge_pathway[e] in other_pathways)
+
+
+def alternative_paths(graph, weights, sources, targets, k=3,
+                      max_stretch=ALTERNATIVE_MAX_STRETCH, max_overlap=ALTERNATIVE_MAX_OVERLAP):
+    """
+    Up to k loopless, mutually distinct routes in increasing cost order.
+    
+    Yen's k-shortest-paths, with every spur search guided by (and usually
+    finished from) a single reverse shortest-path tree, so a few
+    alternatives cost little more than the first route. Candidates costing
+    more than max_stretch times the best route are never generated, and a
+    candidate sharing more than max_overlap of its distance with a route
+    already returned is skipped, since near-copies are no real choice.
+    
+    Returns:
+        list of (cost, nodes, edges), best first
+    """
+    tree = reverse_shortest_path_tree(graph, weights, targets, sources, max_stretch)
+    tree_costs = tree[0]
+    reachable = [node for node in sources if node in tree_costs]
+    if not reachable:
+        return []
+    source = min(reachable, key=tree_costs.get)
+    best_cost = tree_costs[source]
+    max_cost = best_cost * max_stretch + 1e-9
+    
+    first_nodes, first_edges = follow_tree(tree[1], source)
+    shortest = [(best_cost, first_nodes, first_edges)]
+    accepted = [shortest[0]]
+    accepted_pathways = [{graph.edge_pathway[e] for e in first_edges}]
+    candidates = []
+    seen = {tuple(first_edges)}
+    # Yen's paths examined while looking for diverse ones; bounds the work
+    # when the graph simply has no distinct alternatives
+    max_examined = k * 5
+    
+    while len(accepted) < k and len(shortest) < max_examined:
+        _, nodes, edges = shortest[-1]
+        root_cost = 0.0
+        for i in range(len(edges)):
+            spur_node = nodes[i]
+            root_edges = edges[:i]
+            blocked_edges = {path[i] for _, _, path in shortest if len(path) > i and path[:i] == root_edges}
+            blocked_nodes = set(nodes[:i])
+            
+            spur = _spur_search(graph, weights, tree, spur_node, blocked_nodes, blocked_edges, max_cost - root_cost)
+            if spur is not None:
+                spur_cost, spur_nodes, spur_edges = spur
+                candidate_edges = root_edges + spur_edges
+                key = tuple(candidate_edges)
+                if key not in seen:
+                    seen.add(key)
+                    heapq.heappush(candidates, (root_cost + spur_cost, nodes[:i] + spur_nodes, candidate_edges))
+            root_cost += weights[edges[i]]
+        
+        if not candidates:
+            break
+        path = heapq.heappop(candidates)
+        shortest.append(path)
+        
+        distance = sum(graph.edge_distance[e] for e in path[2])
+        if distance and any(_shared_distance(graph, path[2], other) / distance > max_overlap for other in accepted_pathways):
+            continue
+        accepted.append(path)
+        accepted_pathways.append({graph.edge_pathway[e] for e in path[2]})
+    
+    return accepted
+
+
+def nearest_targets(graph, weights, sources, targets=None, k=1, max_cost=None, exclude=()):
+    """
+    Multi-target Dijkstra that stops once k distinct target points are settled.
+    
+    Args:
+        sources: as for dijkstra()
+        targets: set of service point ids to look for; None accepts any point
+        exclude: point ids never reported (e.g. the origin itself)
+        
+    Returns:
+        list of (point_id, cost), nearest first
+    """
+    offsets, edge_targets, nodes = graph.offsets, graph.targets, graph.nodes
+    start_costs = sources if isinstance(sources, dict) else dict.fromkeys(sources, 0.0)
+    best = dict(start_costs)
+    queue = [(cost, node) for node, cost in start_costs.items()]
+    heapq.heapify(queue)
+    settled = set()
+    found = {}
+    
+    while queue and len(found) < k:
+        cost, node = heapq.heappop(queue)
+        if node in settled:
+            continue
+        if max_cost is not None and cost > max_cost:
+            break
+        settled.add(node)
+        
+        point_id = nodes[node][0]
+        if point_id not in found and point_id not in exclude and (targets is None or point_id in targets):
+            found[point_id] = cost
+        
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = edge_targets[e]
+            if neighbor in settled:
+                continue
+            new_cost = cost + weights[e]
+            if new_cost < best.get(neighbor, INFINITY):
+                best[neighbor] = new_cost
+                heapq.heappush(queue, (new_cost, neighbor))
+    
+    perf.incr('nodes_expanded', len(settled))
+    return list(found.items())
+
+
+def nearest_facility_table(graph, weights, facility_points):
+    """
+    For every node, the cost to and id of its nearest facility point.
+    
+    One reverse Dijkstra seeded at every facility node labels the whole
+    graph; nodes are settled nearest-first, so each node inherits the label
+    of the next node on its (already settled) optimal path.
+    
+    Returns:
+        (costs, points) arrays indexed by node; unreachable nodes hold
+        infinity and -1
+    """
+    facility_nodes = [node for point_id in facility_points for node in graph.nodes_for_point(point_id)]
+    tree_costs, following, _ = reverse_shortest_path_tree(graph, weights, facility_nodes, ())
+    
+    costs = array('d', [INFINITY]) * len(graph)
+    points = array('l', [-1]) * len(graph)
+    for node, cost in tree_costs.items():
+        costs[node] = cost
+        step = following[node]
+        points[node] = graph.nodes[node][0] if step is None else points[step[0]]
+    return costs, points
+
+
+def snap_to_graph(graph, latitude, longitude, radius_meters=SNAP_RADIUS_METERS):
+    """Start costs (node -> straight-line meters) for the points around a GPS fix"""
+    nearby = ServicePoint.objects.only('id', 'latitude', 'longitude', 'easting', 'northing')
+    costs = {}
+    for point, distance in within_radius(nearby, latitude, longitude, radius_meters):
+        for node in graph.nodes_for_point(point.id):
+            costs[node] = distance
+    return costs
+
+
+def dominates(a, b):
+    """True when cost vector a is no worse than b in every criterion"""
+    return all(x <= y for x, y in zip(a, b))
+
+
+def pareto_search(graph, weight_arrays, sources, targets, max_labels_per_node=None):
+    """
+    Multi-criteria label-setting search.
+    
+    Labels (one cost vector per criterion array) are settled in
+    lexicographic order, so a settled label is never dominated by one
+    settled later. A node keeps only its non-dominated labels, and labels
+    dominated by a label already at a target are pruned, so a single
+    search returns every non-dominated route.
+    
+    max_labels_per_node is an optional heuristic bound on the work: once a
+    node has settled that many labels later ones are dropped, dominated or
+    not, so some non-dominated routes may be missing from the result.
+    
+    Returns:
+        list of (cost vector, nodes, edges) for the Pareto-optimal routes
+    """
+    offsets, edge_targets = graph.offsets, graph.targets
+    criteria = range(len(weight_arrays))
+    zero = tuple(0.0 for _ in criteria)
+    
+    # label: (cost vector, node, parent label index, edge index)
+    labels = [(zero, node, None, None) for node in sources]
+    queue = [(zero, i) for i in range(len(labels))]
+    heapq.heapify(queue)
+    settled = {}
+    found = []
+    
+    while queue:
+        vector, label_index = heapq.heappop(queue)
+        node = labels[label_index][1]
+        if any(dominates(labels[t][0], vector) for t in found):
+            continue
+        node_labels = settled.setdefault(node, [])
+        if len(node_labels) == max_labels_per_node or any(dominates(labels[o][0], vector) for o in node_labels):
+            continue
+        node_labels.append(label_index)
+        
+        if node in targets:
+            found.append(label_index)
+            continue
+        
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = edge_targets[e]
+            new_vector = tuple(vector[i] + weight_arrays[i][e] for i in criteria)
+            if new_vector[0] == INFINITY:
+                continue  # closed pathway
+            if any(dominates(labels[o][0], new_vector) for o in settled.get(neighbor, ())):
+                continue
+            labels.append((new_vector, neighbor, label_index, e))
+            heapq.heappush(queue, (new_vector, len(labels) - 1))
+    
+    perf.incr('nodes_expanded', sum(len(v) for v in settled.values()))
+    
+    routes = []
+    for label_index in found:
+        vector = labels[label_index][0]
+        nodes, edges = [], []
+        while label_index is not None:
+            _, node, parent, edge = labels[label_index]
+            nodes.append(node)
+            if edge is not None:
+                edges.append(edge)
+            label_index = parent
+        nodes.reverse()
+        edges.reverse()
+        routes.append((vector, nodes, edges))
+    return routes
+
 
 class PathFinder:
     """
     Implements Dijkstra's shortest path algorithm for campus navigation.
-    Supports accessibility filtering and multi-floor navigation.
+    Searches the cached layered (point, floor) graph; accessible routing
+    uses a graph variant with stairs and inaccessible pathways pruned.
     """
     
-    def __init__(self, accessibility_required=False):
+    def __init__(self, accessibility_required=False, profile=DEFAULT_PROFILE):
+        if profile not in PROFILE_NAMES:
+            raise ValueError(f'Unknown cost profile: {profile}')
         self.accessibility_required = accessibility_required
-        self.graph = {}
-        self.distances = {}
-        self.previous = {}
+        self.profile = profile
+        self.graph = None
         
     def build_graph(self):
-        """Build graph from pathways and service points"""
-        # Get all service points (nodes)
-        service_points = ServicePoint.objects.all()
-        
-        for sp in service_points:
-            self.graph[sp.id] = []
-            self.distances[sp.id] = float('inf')
-            
-        # Get all pathways (edges)
-        pathways = Pathway.objects.all()
-        if self.accessibility_required:
-            pathways = pathways.filter(is_accessible=True)
-            
-        for pathway in pathways:
-            if pathway.start_point and pathway.end_point:
-                # Add bidirectional edges
-                self.graph[pathway.start_point.id].append({
-                    'to': pathway.end_point.id,
-                    'distance': pathway.distance_meters,
-                    'time': pathway.estimated_time_minutes,
-                    'pathway': pathway
-                })
-                self.graph[pathway.end_point.id].append({
-                    'to': pathway.start_point.id,
-                    'distance': pathway.distance_meters,
-                    'time': pathway.estimated_time_minutes,
-                    'pathway': pathway
-                })
+        """Attach the cached routing graph for this accessibility variant"""
+        self.graph = get_graph(self.accessibility_required)
+        return self.graph
     
     def find_shortest_path(self, start_id, end_id):
         """
-        Find shortest path between two service points using Dijkstra's algorithm.
-        Returns: (distance_meters, estimated_time_minutes, path_ids, pathways)
+        Find shortest path between two service points using Dijkstra's algorithm,
+        minimizing the PathFinder's cost profile. The start may be on any
+        floor the point has a node on, and the route ends on the first
+        floor-node of the end point reached.
+        Returns: dict with path_ids, distance_meters, estimated_time_minutes,
+        pathways and floor_changes, or None if unreachable
         """
-        self.build_graph()
-        
-        # Initialize
-        self.distances[start_id] = 0
-        self.previous[start_id] = None
-        priority_queue = [(0, start_id)]
-        visited = set()
+        graph = self.build_graph()
+        sources = graph.nodes_for_point(start_id)
+        targets = set(graph.nodes_for_point(end_id))
+        if not sources or not targets:
+            return None
         
-        # Dijkstra's algorithm
-        while priority_queue:
-            current_distance, current_id = heapq.heappop(priority_queue)
-            
-            if current_id in visited:
-                continue
-                
-            visited.add(current_id)
-            
-            if current_id == end_id:
-                break
-            
-            # Check neighbors
-            for neighbor in self.graph.get(current_id, []):
-                neighbor_id = neighbor['to']
-                distance = neighbor['distance']
-                
-                if neighbor_id not in visited:
-                    new_distance = self.distances[current_id] + distance
-                    
-                    if new_distance < self.distances[neighbor_id]:
-                        self.distances[neighbor_id] = new_distance
-                        self.previous[neighbor_id] = (current_id, neighbor)
-                        heapq.heappush(priority_queue, (new_distance, neighbor_id))
-        
-        # Reconstruct path
-        if self.distances[end_id] == float('inf'):
+        costs, previous, reached = dijkstra(graph, graph.profile_weights(self.profile), sources, targets)
+        if reached is None:
             return None  # No path found
         
-        path = []
-        pathways = []
-        current_id = end_id
-        total_time = 0
+        return self.describe_route(graph, *trace_path(previous, reached))
+    
+    def find_pareto_routes(self, start_id, end_id, profiles=PARETO_PROFILES):
+        """
+        All non-dominated routes between two service points under several
+        cost profiles at once, found by one multi-label search.
+        Returns: list of route dicts (as find_shortest_path) each with a
+        'criteria' dict of profile -> cost, ordered by the first profile
+        """
+        graph = self.build_graph()
+        sources = graph.nodes_for_point(start_id)
+        targets = set(graph.nodes_for_point(end_id))
+        if not sources or not targets:
+            return []
+        
+        weight_arrays = [graph.profile_weights(profile) for profile in profiles]
+        routes = []
+        for vector, nodes, edges in pareto_search(graph, weight_arrays, sources, targets):
+            route = self.describe_route(graph, nodes, edges)
+            route['criteria'] = dict(zip(profiles, vector))
+            routes.append(route)
+        routes.sort(key=lambda route: route['criteria'][profiles[0]])
+        return routes
+    
+    def find_alternative_routes(self, start_id, end_id, k=3,
+                                max_stretch=ALTERNATIVE_MAX_STRETCH, max_overlap=ALTERNATIVE_MAX_OVERLAP):
+        """
+        Up to k distinct routes between two service points under the
+        PathFinder's cost profile, best first.
+        Returns: list of route dicts (as find_shortest_path); empty if unreachable
+        """
+        graph = self.build_graph()
+        sources = graph.nodes_for_point(start_id)
+        targets = set(graph.nodes_for_point(end_id))
+        if not sources or not targets:
+            return []
+        
+        weights = graph.profile_weights(self.profile)
+        paths = alternative_paths(graph, weights, sources, targets, k, max_stretch, max_overlap)
+        return [self.describe_route(graph, nodes, edges) for _, nodes, edges in paths]
+    
+    def nearest_facilities(self, graph, service_type):
+        """
+        Nearest-facility table for one service type on this graph, built on
+        first use and kept until the graph's data version changes.
+        """
+        key = ('nearest', service_type)
+        table = graph.derived.get(key)
+        if table is None:
+            with _table_lock:
+                table = graph.derived.get(key)
+                if table is None:
+                    facilities = self._services_query(service_type).values_list('id', flat=True)
+                    table = nearest_facility_table(graph, graph.edge_cost, facilities)
+                    graph.derived[key] = table
+        return table
+    
+    def find_services_by_walking(self, point_id=None, location=None, service_type=None,
+                                 limit=5, max_distance=None):
+        """
+        Services ranked by network walking distance rather than straight line.
+        The origin is a service point id or a (latitude, longitude) fix snapped
+        to the graph; a single nearest service of a type comes straight from
+        the precomputed per-type table.
         
-        while current_id is not None:
-            path.append(current_id)
-            if self.previous[current_id]:
-                prev_id, edge_data = self.previous[current_id]
-                pathways.append(edge_data['pathway'])
-                total_time += edge_data['time']
-            current_id = self.previous[current_id][0] if self.previous[current_id] else None
+        Returns:
+            list of ServicePoint, nearest first, each with .distance set to
+            the network distance in meters (including floor-change costs)
+        """
+        graph = self.build_graph()
+        if point_id is not None:
+            sources = dict.fromkeys(graph.nodes_for_point(point_id), 0.0)
+        else:
+            sources = snap_to_graph(graph, *location)
+        if not sources:
+            return []
+        exclude = {point_id} if point_id is not None else set()
         
-        path.reverse()
+        if limit == 1 and service_type and point_id is None:
+            table_costs, table_points = self.nearest_facilities(graph, service_type)
+            cost, nearest = min(((start + table_costs[node], table_points[node]) for node, start in sources.items()))
+            found = [(nearest, cost)] if nearest != -1 else []
+        else:
+            targets = None
+            if service_type or self.accessibility_required:
+                targets = set(self._services_query(service_type).values_list('id', flat=True))
+            found = nearest_targets(graph, graph.edge_cost, sources, targets, limit, max_distance, exclude)
+        
+        found = [(found_id, cost) for found_id, cost in found if max_distance is None or cost <= max_distance]
+        services = ServicePoint.objects.in_bulk([found_id for found_id, _ in found])
+        results = []
+        for found_id, cost in found:
+            if found_id in services:
+                service = services[found_id]
+                service.distance = cost
+                results.append(service)
+        return results
+    
+    def describe_route(self, graph, nodes, edges):
+        """Totals, visited point ids and Pathway objects for a node/edge path"""
+        path_ids = []
+        for point_id, _ in (graph.nodes[n] for n in nodes):
+            if not path_ids or path_ids[-1] != point_id:
+                path_ids.append(point_id)
         
+        pathway_objects = Pathway.objects.in_bulk([graph.edge_pathway[e] for e in edges])
         return {
-            'path_ids': path,
-            'distance_meters': self.distances[end_id],
-            'estimated_time_minutes': total_time,
-            'pathways': pathways
+            'path_ids': path_ids,
+            'floors': [graph.nodes[n][1] for n in nodes],
+            'distance_meters': sum(graph.edge_distance[e] for e in edges),
+            'estimated_time_minutes': sum(graph.edge_time[e] for e in edges),
+            'profile': self.profile,
+            'cost': sum(graph.profile_weights(self.profile)[e] for e in edges),
+            'coordinates': [[graph.lat[n], graph.lon[n]] for n in nodes],
+            'floor_changes': sum(1 for a, b in zip(nodes, nodes[1:]) if graph.nodes[a][1] != graph.nodes[b][1]),
+            'edges': edges,
+            'pathways': [pathway_objects[graph.edge_pathway[e]] for e in edges if graph.edge_pathway[e] in pathway_objects],
         }
     
-    def find_nearest_service(self, user_location, service_type=None, radius_meters=100):
+    def _services_query(self, service_type=None):
+        """Service point queryset narrowed by the indexed type/accessibility columns"""
+        query = ServicePoint.objects.all()
+        
+        if service_type:
+            query = query.filter(service_type=service_type)
+        
+        if self.accessibility_required:
+            query = query.filter(is_accessible=True)
+        
+        return query
+    
+    def find_nearest_service(self, user_location, service_type=None, radius_meters=100, network=False):
         """
         Find nearest service point to user location.
         
         Args:
-            user_location: Point object with user's coordinates
+            user_location: (latitude, longitude) tuple with user's coordinates
             service_type: Optional service type filter
             radius_meters: Search radius
+            network: rank by walking distance over the routing graph
             
         Returns:
             ServicePoint or None
         """
-        query = ServicePoint.objects.annotate(
-            distance=Distance('location', user_location)
-        ).filter(
-            distance__lte=radius_meters
-        ).order_by('distance')
+        if network:
+            matches = self.find_services_by_walking(
+                location=user_location, service_type=service_type, limit=1, max_distance=radius_meters,
+            )
+            return matches[0] if matches else None
         
-        if service_type:
-            query = query.filter(service_type=service_type)
+        latitude, longitude = user_location
+        matches = within_radius(self._services_query(service_type), latitude, longitude, radius_meters)
         
-        if self.accessibility_required:
-            query = query.filter(accessibility_features__isnull=False)
+        if not matches:
+            return None
         
-        return query.first()
+        nearest, distance = matches[0]
+        nearest.distance = distance
+        return nearest
     
-    def find_nearby_services(self, user_location, service_type=None, radius_meters=200, limit=5):
+    def find_nearby_services(self, user_location, service_type=None, radius_meters=200, limit=5, network=False):
         """
         Find multiple nearby service points.
         """
-        query = ServicePoint.objects.annotate(
-            distance=Distance('location', user_location)
-        ).filter(
-            distance__lte=radius_meters
-        ).order_by('distance')[:limit]
-        
-        if service_type:
-            query = query.filter(service_type=service_type)
+        if network:
+            return self.find_services_by_walking(
+                location=user_location, service_type=service_type, limit=limit, max_distance=radius_meters,
+            )
         
-        if self.accessibility_required:
-            query = query.filter(accessibility_features__isnull=False)
+        latitude, longitude = user_location
+        matches = within_radius(self._services_query(service_type), latitude, longitude, radius_meters)
         
-        return list(query)
+        services = []
+        for service, distance in matches[:limit]:
+            service.distance = distance
+            services.append(service)
+        return services
 
 
 def get_or_create_route(start_point_id, end_point_id, accessibility_required=False):
     """
     Get cached route or create new one using pathfinding.
     """
-    try:
-        # Try to get cached route
-        route = Route.objects.get(
-            start_point_id=start_point_id,
-            end_point_id=end_point_id
-        )
+    graph = get_graph(accessibility_required)
+    
+    # Try to get cached route, unless a closure window has opened or ended
+    # across it since it was computed
+    route = Route.objects.filter(start_point_id=start_point_id, end_point_id=end_point_id).first()
+    if route is not None and not route_is_stale(route, graph):
+        perf.cache_hit()
         return route
-    except Route.DoesNotExist:
-        pass
+    perf.cache_miss()
     
     # Calculate new route
     try:
@@ -185,15 +695,24 @@ def get_or_create_route(start_point_id, end_point_id, accessibility_required=Fal
     result = pathfinder.find_shortest_path(start_point_id, end_point_id)
     
     if not result:
+        if route is not None:
+            # Unreachable since the closure; the cached route is wrong
+            route.delete()
         return None
     
-    # Create and save route
-    route = Route.objects.create(
-        start_point=start_point,
-        end_point=end_point,
-        distance_meters=result['distance_meters'],
-        estimated_time_minutes=result['estimated_time_minutes'],
-        is_accessible=accessibility_required
-    )
+    # Create or refresh the route together with its pathway index, so a
+    # failed write never leaves a route that closures cannot find
+    try:
+        with transaction.atomic():
+            if route is None:
+                route = Route(start_point=start_point, end_point=end_point)
+            route.distance_meters = result['distance_meters']
+            route.estimated_time_minutes = result['estimated_time_minutes']
+            route.is_accessible = accessibility_required
+            route.save()
+            route.pathways.set(result['pathways'])
+    except IntegrityError:
+        # Another request cached this pair first
+        route = Route.objects.get(start_point_id=start_point_id, end_point_id=end_point_id)
     
     return route
@@ -0,0 +1,95 @@
+"""
+API response serialization.
+
+API views build plain dicts and lists, fetching rows with values() rather
+than model instances and looking display labels up in the tables below
+instead of calling get_FOO_display() per row, and return api_response().
+That encodes with orjson when it is installed (several times faster than
+the standard library encoder JsonResponse uses, and it writes bytes
+directly) and falls back to the standard library otherwise.
+
+Clients that send Accept: application/msgpack get MessagePack instead when
+the optional msgpack package is installed: smaller bodies and cheaper
+decoding for mobile apps. Everyone else gets JSON as before.
+"""
+
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .models import Pathway, ServicePoint
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_CONTENT_TYPE = 'application/json'
+MSGPACK_CONTENT_TYPE = 'application/msgpack'
+MSGPACK_MEDIA_TYPES = (MSGPACK_CONTENT_TYPE, 'application/x-msgpack', 'application/vnd.msgpack')
+
+# Display labels by stored value, rendered once rather than per row
+SERVICE_TYPE_LABELS = {value: str(label) for value, label in ServicePoint.SERVICE_TYPES}
+PATHWAY_TYPE_LABELS = {value: str(label) for value, label in Pathway.PATHWAY_TYPES}
+
+
+def _default(value):
+    """Types the fast encoders do not handle natively"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not serializable')
+
+
+class _Encoder(DjangoJSONEncoder):
+    """Standard library fallback that encodes like orjson with _default"""
+
+    def default(self, o):
+        try:
+            return _default(o)
+        except TypeError:
+            return super().default(o)
+
+
+def dumps_json(data):
+    if orjson is not None:
+        # Integer keys (e.g. services by id) become strings, as with json.dumps
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, cls=_Encoder, separators=(',', ':')).encode()
+
+
+def dumps_msgpack(data):
+    return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+def wants_msgpack(request):
+    """True when the client lists a MessagePack type it accepts and msgpack is installed"""
+    if msgpack is None:
+        return False
+    for part in request.headers.get('Accept', '').split(','):
+        media_type, _, params = part.partition(';')
+        if media_type.strip().lower() in MSGPACK_MEDIA_TYPES:
+            return params.replace(' ', '') not in ('q=0', 'q=0.0')
+    return False
+
+
+def api_response(request, data, status=200):
+    """Response with data as MessagePack when negotiated, JSON otherwise"""
+    if wants_msgpack(request):
+        response = HttpResponse(dumps_msgpack(data), content_type=MSGPACK_CONTENT_TYPE, status=status)
+    else:
+        response = HttpResponse(dumps_json(data), content_type=JSON_CONTENT_TYPE, status=status)
+    patch_vary_headers(response, ['Accept'])
+    return response
@@ -0,0 +1,253 @@
+"""
+Routing graph shared between worker processes through an mmap'd file.
+
+With settings.NAVIGATOR_SHARED_GRAPH_DIR set (ideally on tmpfs such as
+/dev/shm), a graph is built once, written as one flat binary file and
+memory-mapped read-only by every worker: the CSR arrays, coordinates and
+profile weights live in the page cache once instead of once per process,
+and nothing is ever copied on write.
+
+Layout of graph-<variant>-<version>.bin:
+
+    MAGIC | header length (uint32) | JSON header | arrays, 8-byte aligned
+
+The header records the variant, data version and each array's typecode,
+offset and length. A small pointer file, graph-<variant>.current, names the
+file to use and is swapped atomically with os.replace(), so readers see
+either the old graph or the new one, never a partial write. Rebuilds take
+an exclusive file lock, so after a data change one process builds while
+the others wait and then attach to its result. The data and closure
+version tokens are kept as files in the same directory (see graph.py), so
+all processes on the host agree on them without a shared cache backend.
+"""
+
+import fcntl
+import json
+import mmap
+import os
+import struct
+from array import array
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .graph import RoutingGraph, build_graph
+
+MAGIC = b'CUTGRAPH'
+HEADER_LENGTH = struct.Struct('<I')
+ALIGNMENT = 8
+
+# Superseded graph files kept for workers that still have them mapped
+KEEP_PREVIOUS = 1
+
+
+def shared_dir():
+    return getattr(settings, 'NAVIGATOR_SHARED_GRAPH_DIR', '') or ''
+
+
+def _pointer_path(directory, variant):
+    return os.path.join(directory, f'graph-{variant}.current')
+
+
+def _graph_arrays(graph):
+    """Named flat arrays that fully describe a RoutingGraph"""
+    arrays = {
+        'node_point': array('l', (point_id for point_id, _ in graph.nodes)),
+        'node_floor': array('l', (-1 if floor_id is None else floor_id for _, floor_id in graph.nodes)),
+        'lat': graph.lat,
+        'lon': graph.lon,
+        'offsets': graph.offsets,
+        'targets': graph.targets,
+        'edge_pathway': graph.edge_pathway,
+        'edge_type': graph.edge_type,
+        'edge_distance': graph.edge_distance,
+        'edge_time': graph.edge_time,
+        'edge_twin': graph.edge_twin,
+    }
+    for profile, weights in graph.weights.items():
+        arrays[f'weights:{profile}'] = weights
+    return arrays
+
+
+def write_graph(graph, f):
+    """Serialize graph to a binary file object"""
+    arrays = _graph_arrays(graph)
+    layout = {}
+    position = 0
+    for name, values in arrays.items():
+        layout[name] = [values.typecode, position, len(values)]
+        position += len(values) * values.itemsize
+        position += -position % ALIGNMENT
+    header = json.dumps({
+        'variant': graph.variant,
+        'version': graph.data_version,
+        'arrays': layout,
+    }).encode()
+    data_start = len(MAGIC) + HEADER_LENGTH.size + len(header)
+    padding = -data_start % ALIGNMENT
+
+    f.write(MAGIC)
+    f.write(HEADER_LENGTH.pack(len(header) + padding))
+    f.write(header + b' ' * padding)
+    for name, values in arrays.items():
+        data = values.tobytes()
+        f.write(data)
+        f.write(b'\0' * (-len(data) % ALIGNMENT))
+
+
+def parse_header(data):
+    """(header dict, offset of the array data) from the start of a graph file"""
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('Not a routing graph file')
+    (length,) = HEADER_LENGTH.unpack(data[len(MAGIC):len(MAGIC) + HEADER_LENGTH.size])
+    start = len(MAGIC) + HEADER_LENGTH.size
+    return json.loads(data[start:start + length]), start + length
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        prefix = f.read(len(MAGIC) + HEADER_LENGTH.size)
+        if len(prefix) < len(MAGIC) + HEADER_LENGTH.size or prefix[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a routing graph file')
+        (length,) = HEADER_LENGTH.unpack(prefix[len(MAGIC):])
+        return parse_header(prefix + f.read(length))
+
+
+def attach_graph(path):
+    """RoutingGraph whose arrays are read-only views into the mapped file"""
+    header, data_start = read_header(path)
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = memoryview(mapped)
+
+    def view(name):
+        typecode, offset, length = header['arrays'][name]
+        start = data_start + offset
+        return buffer[start:start + length * array(typecode).itemsize].cast(typecode)
+
+    node_floor = view('node_floor')
+    nodes = [
+        (point_id, None if floor_id == -1 else floor_id)
+        for point_id, floor_id in zip(view('node_point'), node_floor)
+    ]
+    return RoutingGraph(
+        variant=header['variant'],
+        version=header['version'],
+        nodes=nodes,
+        lat=view('lat'),
+        lon=view('lon'),
+        offsets=view('offsets'),
+        targets=view('targets'),
+        edge_pathway=view('edge_pathway'),
+        edge_type=view('edge_type'),
+        edge_distance=view('edge_distance'),
+        edge_time=view('edge_time'),
+        edge_twin=view('edge_twin'),
+        weights={
+            name.split(':', 1)[1]: view(name)
+            for name in header['arrays'] if name.startswith('weights:')
+        },
+    )
+
+
+def current_path(directory, variant):
+    """Graph file the pointer currently names, or None"""
+    try:
+        with open(_pointer_path(directory, variant)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(directory, name)
+    return path if name and os.path.exists(path) else None
+
+
+def _install(directory, variant, version, write):
+    """
+    Write a graph file through write(f) under a temporary name, rename it
+    into place and atomically point readers at it; returns its path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = f'graph-{variant}-{version}.bin'
+    path = os.path.join(directory, name)
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+    pointer = _pointer_path(directory, variant)
+    tmp_pointer = f'{pointer}.tmp{os.getpid()}'
+    with open(tmp_pointer, 'w') as f:
+        f.write(name)
+    os.replace(tmp_pointer, pointer)
+    _remove_superseded(directory, variant, name)
+    return path
+
+
+def publish(graph, directory):
+    """Write graph and atomically point readers at it; returns its path"""
+    return _install(directory, graph.variant, graph.data_version, lambda f: write_graph(graph, f))
+
+
+def publish_bytes(data, directory):
+    """Install an already serialized graph (e.g. from a snapshot); returns its path"""
+    header, _ = parse_header(data)
+    return _install(directory, header['variant'], header['version'], lambda f: f.write(data))
+
+
+def _remove_superseded(directory, variant, current):
+    # Unlinking a mapped file is safe on POSIX; mappings outlive the name
+    prefix = f'graph-{variant}-'
+    old = sorted(
+        (entry for entry in os.scandir(directory)
+         if entry.name.startswith(prefix) and entry.name.endswith('.bin') and entry.name != current),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in old[KEEP_PREVIOUS:]:
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+@contextmanager
+def _exclusive(directory, variant):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f'graph-{variant}.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _current_for(directory, variant, version):
+    path = current_path(directory, variant)
+    if path is not None and read_header(path)[0]['version'] == version:
+        return path
+    return None
+
+
+def ensure_published(variant, version):
+    """
+    Path of the shared graph file for this data version, building and
+    publishing it first if no process has yet.
+    Returns: (path, whether this call built it)
+    """
+    directory = shared_dir()
+    path = _current_for(directory, variant, version)
+    if path is not None:
+        return path, False
+
+    with _exclusive(directory, variant):
+        # Whoever held the lock before us may have just published it
+        path = _current_for(directory, variant, version)
+        if path is not None:
+            return path, False
+        return publish(build_graph(variant, version), directory), True
+
+
+def load_graph(variant, version):
+    """Attach to the shared graph for this data version"""
+    path, _ = ensure_published(variant, version)
+    return attach_graph(path)
@@ -0,0 +1,97 @@
+"""
+Model signal handlers keeping derived state (routing graphs, cached routes,
+geofence index, floorplan tiles, the sync change feed) in step with the
+data.
+
+Handlers import their modules on first use rather than when the app
+registry loads, so worker startup does not pay for them.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Building, Floor, Pathway, PathwayClosure, Room, ServiceArea, ServicePoint
+
+
+@receiver(pre_save, sender=Building)
+@receiver(pre_save, sender=Room)
+@receiver(pre_save, sender=ServicePoint)
+def derive_fixture_fields(sender, instance, raw=False, **kwargs):
+    """Fixtures (loaddata) save raw, bypassing the models' save()"""
+    if raw:
+        from .geo import project
+        instance.easting, instance.northing = project(instance.latitude, instance.longitude)
+        if sender is ServicePoint:
+            instance.is_accessible = ServicePoint.accessibility_flag(instance.accessibility_features)
+
+
+@receiver([post_save, post_delete], sender=Pathway)
+@receiver([post_save, post_delete], sender=ServicePoint)
+@receiver([post_save, post_delete], sender=Floor)
+def invalidate_routing_graph(sender, **kwargs):
+    """Any change to nodes, edges or floor numbering makes cached graphs stale"""
+    from .graph import bump_version
+    bump_version()
+
+
+@receiver([post_save, post_delete], sender=ServiceArea)
+@receiver([post_save, post_delete], sender=ServicePoint)
+def invalidate_geofence_index(sender, **kwargs):
+    """Buffers move with their service point and filter on its type"""
+    from .graph import bump_geofence_version
+    bump_geofence_version()
+
+
+@receiver(post_save, sender=PathwayClosure)
+def apply_pathway_closure(sender, instance, **kwargs):
+    """Closures patch the cached graphs rather than rebuilding them"""
+    from .graph import bump_closure_version, invalidate_routes
+    bump_closure_version()
+    if instance.is_active():
+        invalidate_routes(closed=[instance.pathway_id])
+    elif instance.ends_at is not None and instance.ends_at <= timezone.now():
+        # Edited to end already: routes computed meanwhile may detour
+        invalidate_routes(reopened_since=instance.starts_at)
+
+
+@receiver(post_delete, sender=PathwayClosure)
+def remove_pathway_closure(sender, instance, **kwargs):
+    from .graph import bump_closure_version, invalidate_routes
+    bump_closure_version()
+    if instance.is_active():
+        invalidate_routes(reopened_since=instance.starts_at)
+
+
+@receiver(post_save, sender=Floor)
+def queue_floorplan_tiles(sender, instance, raw=False, **kwargs):
+    """Cut a new or changed floorplan into tiles once the upload is committed"""
+    from .floorplans import needs_tiles, schedule_tiles
+    if not raw and needs_tiles(instance):
+        floor_id = instance.pk
+        transaction.on_commit(lambda: schedule_tiles(floor_id))
+
+
+@receiver(post_delete, sender=Floor)
+def remove_floorplan_tiles(sender, instance, **kwargs):
+    from .floorplans import remove_tiles
+    remove_tiles(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Building)
+@receiver([post_save, post_delete], sender=Room)
+@receiver([post_save, post_delete], sender=ServicePoint)
+@receiver([post_save, post_delete], sender=Pathway)
+def record_data_change(sender, instance, signal, **kwargs):
+    """New version (or tombstone) in the change feed served by /api/sync/"""
+    from .sync import FEED_NAMES, record_changes
+    record_changes(FEED_NAMES[sender], [instance.pk], deleted=signal is post_delete)
+
+
+@receiver(pre_delete, sender=Building)
+@receiver(pre_delete, sender=Room)
+@receiver(pre_delete, sender=Floor)
+def record_cleared_references(sender, instance, **kwargs):
+    from .sync import record_dependents
+    record_dependents(instance)
@@ -0,0 +1,222 @@
+"""
+Offline snapshots of the campus dataset for replicas and kiosks.
+
+A snapshot is one zip archive (deflate-compressed) holding:
+
+- manifest.json: format version, data version, byte order and, per table,
+  its row count and column list
+- <model>/<column>.bin: numeric and boolean columns as packed arrays, with
+  a <column>.null byte mask when the column has nulls
+- <model>/<column>.json: text and date columns as a JSON list
+- graph/<variant>.bin: the routing graphs, serialized as in sharedgraph.py
+
+Storing columns rather than rows keeps similar values together, which
+compresses well, and lets the loader insert each table with one
+executemany() instead of instantiating and saving models row by row.
+"""
+
+import io
+import json
+import sys
+import time
+import zipfile
+from array import array
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .geo import reproject
+from .graph import VARIANTS, build_graph, bump_closure_version, bump_geofence_version, bump_version
+from .models import Building, Floor, Pathway, PathwayClosure, Room, Route, ServiceArea, ServicePoint
+from .sharedgraph import publish_bytes, shared_dir, write_graph
+from .sync import record_reset
+
+FORMAT_VERSION = 1
+
+# Tables in dependency order; loading clears them in reverse
+SNAPSHOT_MODELS = [Building, Floor, Room, ServicePoint, Pathway, PathwayClosure, ServiceArea]
+
+INTEGER_TYPES = {
+    'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField',
+    'SmallIntegerField', 'PositiveIntegerField', 'PositiveSmallIntegerField',
+    'ForeignKey', 'OneToOneField',
+}
+DATE_TYPES = {'DateTimeField', 'DateField', 'TimeField'}
+TYPECODES = {'int': 'q', 'float': 'd', 'bool': 'b'}
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _column_kind(field):
+    internal = field.get_internal_type()
+    if internal in INTEGER_TYPES:
+        return 'int'
+    if internal == 'FloatField':
+        return 'float'
+    if internal == 'BooleanField':
+        return 'bool'
+    return 'text'
+
+
+def _text(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def export_snapshot(output, compresslevel=9):
+    """
+    Write the campus tables and routing graphs to one snapshot file.
+    Returns: the manifest
+    """
+    version = time.time_ns()
+    manifest = {
+        'format': FORMAT_VERSION,
+        'created_at': timezone.now().isoformat(),
+        'data_version': version,
+        'byteorder': sys.byteorder,
+        'tables': [],
+        'graphs': list(VARIANTS),
+    }
+
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as zf:
+        # One transaction so every table (and the graphs) see the same data
+        with transaction.atomic():
+            for model in SNAPSHOT_MODELS:
+                fields = model._meta.concrete_fields
+                rows = list(model.objects.order_by('pk').values_list(*[f.attname for f in fields]))
+                columns = list(zip(*rows)) if rows else [()] * len(fields)
+                prefix = model._meta.model_name
+
+                table = {'model': model._meta.label, 'rows': len(rows), 'columns': []}
+                for field, values in zip(fields, columns):
+                    kind = _column_kind(field)
+                    nulls = any(v is None for v in values)
+                    name = f'{prefix}/{field.attname}'
+                    if kind == 'text':
+                        zf.writestr(f'{name}.json', json.dumps([_text(v) for v in values], separators=(',', ':')))
+                    else:
+                        packed = array(TYPECODES[kind], (0 if v is None else v for v in values))
+                        zf.writestr(f'{name}.bin', packed.tobytes())
+                        if nulls:
+                            zf.writestr(f'{name}.null', bytes(v is None for v in values))
+                    table['columns'].append({'name': field.attname, 'kind': kind, 'nulls': nulls})
+                manifest['tables'].append(table)
+
+            for variant in VARIANTS:
+                buffer = io.BytesIO()
+                write_graph(build_graph(variant, version), buffer)
+                zf.writestr(f'graph/{variant}.bin', buffer.getvalue())
+
+        zf.writestr('manifest.json', json.dumps(manifest, indent=2))
+    return manifest
+
+
+def read_manifest(zf):
+    try:
+        manifest = json.loads(zf.read('manifest.json'))
+    except KeyError:
+        raise SnapshotError('Not a campus snapshot (no manifest.json)')
+    if manifest.get('format') != FORMAT_VERSION:
+        raise SnapshotError(f'Unsupported snapshot format {manifest.get("format")!r}; expected {FORMAT_VERSION}')
+    return manifest
+
+
+def _read_column(zf, model, column, swap, connection):
+    name = f'{model._meta.model_name}/{column["name"]}'
+    if column['kind'] == 'text':
+        values = json.loads(zf.read(f'{name}.json'))
+        field = next(f for f in model._meta.concrete_fields if f.attname == column['name'])
+        if field.get_internal_type() in DATE_TYPES:
+            values = [field.get_db_prep_value(field.to_python(v), connection) for v in values]
+        return values
+
+    packed = array(TYPECODES[column['kind']])
+    packed.frombytes(zf.read(f'{name}.bin'))
+    if swap:
+        packed.byteswap()
+    values = packed.tolist()
+    if column['kind'] == 'bool':
+        values = [bool(v) for v in values]
+    if column['nulls']:
+        mask = zf.read(f'{name}.null')
+        values = [None if null else v for v, null in zip(values, mask)]
+    return values
+
+
+def create_missing_tables(using=DEFAULT_DB_ALIAS):
+    """Create any missing Navigator table straight from the models, without migrations"""
+    connection = connections[using]
+    existing = set(connection.introspection.table_names())
+    created = []
+    with connection.schema_editor() as editor:
+        for model in apps.get_app_config('Navigator').get_models():
+            if model._meta.db_table not in existing:
+                editor.create_model(model)
+                created.append(model._meta.db_table)
+    return created
+
+
+def load_snapshot(path, using=DEFAULT_DB_ALIAS):
+    """
+    Replace the campus tables with a snapshot's contents in one transaction,
+    drop cached routes and install the prebuilt routing graphs.
+    Returns: the manifest
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+
+    with zipfile.ZipFile(path) as zf:
+        manifest = read_manifest(zf)
+        swap = manifest['byteorder'] != sys.byteorder
+        models = {model._meta.label: model for model in SNAPSHOT_MODELS}
+
+        with connection.constraint_checks_disabled(), transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                # Cached routes point at ids that are about to change
+                for table in (Route.pathways.through._meta.db_table, Route._meta.db_table):
+                    cursor.execute(f'DELETE FROM {quote(table)}')
+                for model in reversed(SNAPSHOT_MODELS):
+                    cursor.execute(f'DELETE FROM {quote(model._meta.db_table)}')
+
+                for table in manifest['tables']:
+                    model = models.get(table['model'])
+                    if model is None:
+                        raise SnapshotError(f'Unknown table {table["model"]} in snapshot')
+                    if not table['rows']:
+                        continue
+                    db_columns = {f.attname: f.column for f in model._meta.concrete_fields}
+                    unknown = [c['name'] for c in table['columns'] if c['name'] not in db_columns]
+                    if unknown:
+                        raise SnapshotError(f'{table["model"]} has no column(s) {", ".join(unknown)}; schema differs from the snapshot')
+                    columns = [_read_column(zf, model, column, swap, connection) for column in table['columns']]
+                    names = ', '.join(quote(db_columns[c['name']]) for c in table['columns'])
+                    placeholders = ', '.join(['%s'] * len(columns))
+                    cursor.executemany(
+                        f'INSERT INTO {quote(model._meta.db_table)} ({names}) VALUES ({placeholders})',
+                        list(zip(*columns)),
+                    )
+
+                for sql in connection.ops.sequence_reset_sql(no_style(), SNAPSHOT_MODELS):
+                    cursor.execute(sql)
+
+            # Older snapshots have no projected coordinates, and the
+            # exporter may have used another UTM zone
+            for model in (Building, Room, ServicePoint):
+                reproject(model.objects.using(using))
+            # Raw inserts bypass ServicePoint.save()
+            ServicePoint.update_is_accessible(ServicePoint.objects.using(using))
+
+        # The snapshot's graphs were built for its data version; adopt it
+        bump_version(manifest['data_version'])
+        bump_closure_version()
+        bump_geofence_version()
+        record_reset()
+        directory = shared_dir()
+        if directory and not swap:
+            for variant in manifest['graphs']:
+                publish_bytes(zf.read(f'graph/{variant}.bin'), directory)
+
+    return manifest
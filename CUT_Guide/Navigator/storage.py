@@ -0,0 +1,42 @@
+"""
+Static files storage that builds the asset bundles during collectstatic,
+content-hashes everything and precompresses the results (see assets.py).
+"""
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+from .assets import BUNDLES, build_bundle, compress_file
+
+
+class AssetManifestStorage(ManifestStaticFilesStorage):
+    # Unknown names fall back to their unhashed URL rather than failing the
+    # whole page (e.g. before the first collectstatic on a new server)
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+
+        for name in BUNDLES:
+            content, _, _ = build_bundle(name)
+            if self.exists(name):
+                self.delete(name)
+            self.save(name, ContentFile(content.encode('utf-8')))
+            paths[name] = (self, name)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        for name in set(self.hashed_files.values()) | set(BUNDLES):
+            for written in compress_file(self.path(name)):
+                yield name, written[len(self.location) + 1:], True
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force)
+        except ValueError:
+            if settings.DEBUG:
+                raise
+            return FileSystemStorage.url(self, name)
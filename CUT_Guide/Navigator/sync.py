@@ -0,0 +1,177 @@
+"""
+Delta sync for offline-capable clients (mobile apps, kiosks).
+
+Signal handlers record every saved or deleted Building, Room, ServicePoint
+and Pathway in DataChange. An object keeps only its latest entry, and entry
+ids only grow, so "everything changed since version v" is one indexed
+range scan and the table never holds more than one row per object.
+
+A client starts with a full sync (since=0), keeps the version it was
+given, and from then on fetches only what changed after it. Both are
+paged: change pages by version, full copy pages by a cursor holding the
+type and id to continue after. A full copy read across several pages
+can mix rows from slightly different moments, but every change made
+while it was read has a newer version than the one the copy reports, so
+the next delta sync sends it. Bulk writes
+that bypass signals call record_changes() themselves; replacing the whole
+dataset (loading a snapshot) records a reset, which sends every client
+back to a full sync.
+
+Payloads are columnar: for each type, the field names once and then one
+list of values per object.
+"""
+
+from django.db import models, transaction
+from django.db.models import Max
+
+from .models import Building, DataChange, Pathway, Room, ServicePoint
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+
+# Feed name -> (model, fields sent to clients)
+SYNC_MODELS = {
+    'building': (Building, [
+        'id', 'name', 'code', 'description', 'latitude', 'longitude', 'total_floors', 'accessibility_features',
+    ]),
+    'room': (Room, [
+        'id', 'building_id', 'floor_id', 'name', 'room_number', 'room_type', 'latitude', 'longitude', 'capacity',
+    ]),
+    'service': (ServicePoint, [
+        'id', 'name', 'service_type', 'building_id', 'room_id', 'floor_id', 'latitude', 'longitude',
+        'contact_phone', 'office_hours', 'is_accessible',
+    ]),
+    'pathway': (Pathway, [
+        'id', 'pathway_type', 'start_point_id', 'end_point_id', 'floor_from_id', 'floor_to_id',
+        'distance_meters', 'estimated_time_minutes', 'is_accessible',
+    ]),
+}
+FEED_NAMES = {model: name for name, (model, _) in SYNC_MODELS.items()}
+# Response keys, plural as in the rest of the API
+SECTIONS = {'building': 'buildings', 'room': 'rooms', 'service': 'services', 'pathway': 'pathways'}
+
+# Changes (or rows of a full copy) sent per response; clients with more to
+# catch up page through them
+DEFAULT_LIMIT = 2000
+MAX_LIMIT = 10000
+
+
+def record_changes(name, object_ids, deleted=False):
+    """Give objects a new data version, replacing their previous feed entries"""
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+    with transaction.atomic():
+        DataChange.objects.filter(model=name, object_id__in=object_ids).delete()
+        DataChange.objects.bulk_create([
+            DataChange(model=name, object_id=object_id, deleted=deleted) for object_id in object_ids
+        ])
+
+
+def record_dependents(instance):
+    """
+    Record the synced objects whose reference to instance its deletion will
+    clear (on_delete=SET_NULL), since that update sends no signals.
+    """
+    for relation in instance._meta.related_objects:
+        name = FEED_NAMES.get(relation.related_model)
+        if name and relation.on_delete is models.SET_NULL:
+            object_ids = relation.related_model.objects.filter(**{relation.field.name: instance}).values_list('id', flat=True)
+            record_changes(name, object_ids)
+
+
+def record_reset():
+    """Make every client resync from scratch, e.g. after the dataset was replaced"""
+    with transaction.atomic():
+        DataChange.objects.all().delete()
+        DataChange.objects.create(model='reset', object_id=0)
+
+
+def current_version():
+    return DataChange.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def _reset_version():
+    return DataChange.objects.filter(model='reset').values_list('id', flat=True).first() or 0
+
+
+def _rows(name, object_ids=None):
+    model, fields = SYNC_MODELS[name]
+    objects = model.objects.order_by('id')
+    if object_ids is not None:
+        objects = objects.filter(id__in=object_ids)
+    return fields, [list(row) for row in objects.values_list(*fields)]
+
+
+def _full_page(version, limit, position=0, after_id=0):
+    """
+    Up to limit rows of the full copy, types in SYNC_MODELS order and ids
+    ascending, starting after id after_id of the type at position.
+    """
+    names = list(SYNC_MODELS)
+    payload = {'version': version, 'full': position == 0 and after_id == 0, 'more': False}
+    remaining = limit
+    for index in range(position, len(names)):
+        if not remaining:
+            payload.update(more=True, cursor=encode_cursor([version, index, 0]))
+            break
+        name = names[index]
+        model, fields = SYNC_MODELS[name]
+        objects = model.objects.order_by('id')
+        if index == position:
+            objects = objects.filter(id__gt=after_id)
+        rows = [list(row) for row in objects.values_list(*fields)[:remaining + 1]]
+        if len(rows) > remaining:
+            rows = rows[:remaining]
+            # id is the first field of every type
+            payload.update(more=True, cursor=encode_cursor([version, index, rows[-1][0]]))
+        if rows:
+            payload[SECTIONS[name]] = {'fields': fields, 'rows': rows}
+        if payload['more']:
+            break
+        remaining -= len(rows)
+    return payload
+
+
+def changes_since(since=0, limit=DEFAULT_LIMIT, cursor=None):
+    """
+    Everything a client at version since needs to be current, or the next
+    page of a full copy when given the cursor from the previous one.
+    Returns: dict with version (to send as since next time), full (the
+    client must drop its copy first), more (call again for the rest, with
+    cursor when one is given), a {fields, rows} table per changed type and
+    deleted ids per type
+    Raises: InvalidCursor for a malformed cursor
+    """
+    version = current_version()
+    if cursor:
+        copy_version, position, after_id = decode_cursor(cursor, (int, int, int))
+        if not 0 <= position < len(SYNC_MODELS):
+            raise InvalidCursor('Cursor has the wrong shape')
+        if _reset_version() <= copy_version <= version:
+            return _full_page(copy_version, limit, position, after_id)
+        # Dataset replaced (or another database) since the copy began
+        return _full_page(version, limit)
+
+    if since <= 0 or since < _reset_version() or since > version:
+        # New client, dataset replaced, or a version from another database
+        return _full_page(version, limit)
+
+    entries = list(
+        DataChange.objects.filter(id__gt=since).exclude(model='reset')
+        .order_by('id').values_list('id', 'model', 'object_id', 'deleted')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+    payload = {'version': entries[-1][0] if more else version, 'full': False, 'more': more}
+
+    changed, deleted = {}, {}
+    for _, name, object_id, is_deleted in entries:
+        (deleted if is_deleted else changed).setdefault(name, []).append(object_id)
+    # An object deleted after its entry was read is simply missing here;
+    # its tombstone has a newer version, so it comes next time
+    for name, object_ids in changed.items():
+        fields, rows = _rows(name, object_ids)
+        if rows:
+            payload[SECTIONS[name]] = {'fields': fields, 'rows': rows}
+    if deleted:
+        payload['deleted'] = {SECTIONS[name]: sorted(ids) for name, ids in deleted.items()}
+    return payload
@@ -0,0 +1,34 @@
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+from ..assets import BUNDLES, VENDOR_ASSETS, find_source, source_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    <link>/<script> tags for a bundle from assets.BUNDLES: the collected,
+    hashed bundle in production, one tag per source under DEBUG or before
+    collectstatic has built it.
+    """
+    if not settings.DEBUG and name in getattr(staticfiles_storage, 'hashed_files', {}):
+        # Vendored files missing at build time were left out of the bundle
+        urls = [VENDOR_ASSETS[s] for s in BUNDLES[name] if s in VENDOR_ASSETS and not find_source(s)]
+        urls.append(static(name))
+    else:
+        urls = [source_url(source) for source in BUNDLES[name]]
+
+    if name.endswith('.css'):
+        return format_html_join('\n', '<link rel="stylesheet" href="{}">', ((url,) for url in urls))
+    return format_html_join('\n', '<script src="{}"></script>', ((url,) for url in urls))
+
+
+@register.simple_tag
+def vendor_url(path):
+    """URL of a vendored file, falling back to its CDN copy"""
+    return source_url(path)
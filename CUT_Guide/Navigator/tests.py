@@ -1,3 +1,863 @@
-from django.test import TestCase
+import io
+import json
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import serializers
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import geofence, perf, serialization
+from .geo import to_utm, within_radius
+from .graph import PATHWAY_TYPE_CODES, build_graph, clear_graphs
+from .mapmatch import _Routes, _thin, build_network, match_trace, match_traces, observed_times, save_times, viterbi
+from .models import Building, Floor, Pathway, PathwayClosure, Room, Route, ServiceArea, ServicePoint
+from .pagination import encode_cursor
+from .ratelimit import take
+from .routing import PARETO_PROFILES, PathFinder, alternative_paths, dominates, get_or_create_route, pareto_search
+from .snapshot import SNAPSHOT_MODELS, export_snapshot, load_snapshot
+from .sync import record_reset
+
+
+def make_building(code='ENG', latitude=-17.2833, longitude=30.2167):
+    return Building.objects.create(name=f'{code} Building', code=code, latitude=latitude, longitude=longitude)
+
+
+def make_service(name, service_type='office', latitude=-17.2833, longitude=30.2167, **fields):
+    return ServicePoint.objects.create(
+        name=name, service_type=service_type, latitude=latitude, longitude=longitude, **fields,
+    )
+
+
+def make_grid(rows=3, cols=3):
+    """
+    rows x cols service points joined to their right and lower neighbours.
+    Lengths, walking times and indoor/outdoor types vary by edge so the cost
+    profiles disagree about which route is best.
+    Returns: grid of ServicePoints as a list of rows
+    """
+    grid = [
+        [make_service(f'Node {r}-{c}', latitude=-17.2833 - r * 0.0005, longitude=30.2167 + c * 0.0005) for c in range(cols)]
+        for r in range(rows)
+    ]
+    n = 0
+    for r in range(rows):
+        for c in range(cols):
+            for dr, dc in ((0, 1), (1, 0)):
+                if r + dr < rows and c + dc < cols:
+                    n += 1
+                    Pathway.objects.create(
+                        start_point=grid[r][c], end_point=grid[r + dr][c + dc],
+                        pathway_type='outdoor' if n % 3 else 'indoor_corridor',
+                        distance_meters=40 + (n * 37) % 50,
+                        estimated_time_minutes=0.5 + (n * 13) % 7 / 4,
+                    )
+    return grid
+
+
+def simple_paths(graph, source, target):
+    """Every loopless (nodes, edges) path from source to target, by brute force"""
+    stack = [(source, [source], [])]
+    while stack:
+        node, nodes, edges = stack.pop()
+        if node == target:
+            yield nodes, edges
+            continue
+        for e, neighbor in graph.neighbors(node):
+            if neighbor not in nodes:
+                stack.append((neighbor, nodes + [neighbor], edges + [e]))
+
+
+def path_cost(weight_arrays, edges):
+    return tuple(sum(weights[e] for e in edges) for weights in weight_arrays)
+
+
+class LayeredGraphTests(TestCase):
+    """
+    A two-floor building with a stair core and a lift. Up two floors the
+    stairs cost 20 + 2 * 15 m against the lift's 3 m plus a 30 s wait (43.5 m);
+    down they cost only 20 + 2 * 8 m, so the best route depends on direction.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        building = make_building()
+        ground = Floor.objects.create(building=building, floor_number=0)
+        second = Floor.objects.create(building=building, floor_number=2)
+        cls.lobby = make_service('Lobby', building=building, floor=ground)
+        cls.office = make_service('Office', building=building, floor=second)
+        stairs = make_service('Stair core', building=building, floor=ground)
+        lift = make_service('Lift', building=building, floor=ground)
+        for core, kind, length in ((stairs, 'staircase', 20), (lift, 'elevator', 3)):
+            Pathway.objects.create(start_point=cls.lobby, end_point=core, pathway_type='indoor_corridor',
+                                   distance_meters=10, estimated_time_minutes=0.1)
+            Pathway.objects.create(start_point=core, end_point=core, pathway_type=kind, floor_from=ground, floor_to=second,
+                                   distance_meters=length, estimated_time_minutes=0.2)
+            Pathway.objects.create(start_point=core, end_point=cls.office, pathway_type='indoor_corridor',
+                                   floor_from=second, floor_to=second, distance_meters=10, estimated_time_minutes=0.1)
+
+    def setUp(self):
+        clear_graphs()
+
+    def pathway_types(self, route):
+        return [pathway.pathway_type for pathway in route['pathways']]
+
+    def test_transition_costs_depend_on_mode_and_direction(self):
+        up = PathFinder().find_shortest_path(self.lobby.id, self.office.id)
+        self.assertEqual(self.pathway_types(up), ['indoor_corridor', 'elevator', 'indoor_corridor'])
+        self.assertAlmostEqual(up['cost'], 10 + 3 + 30 * 1.35 + 10)
+        # The lift wait is part of the time estimate, not just the cost
+        self.assertAlmostEqual(up['estimated_time_minutes'], 0.1 + 0.2 + 0.5 + 0.1)
+        self.assertEqual(up['floor_changes'], 1)
+
+        down = PathFinder().find_shortest_path(self.office.id, self.lobby.id)
+        self.assertEqual(self.pathway_types(down), ['indoor_corridor', 'staircase', 'indoor_corridor'])
+        self.assertAlmostEqual(down['cost'], 10 + 20 + 2 * 8 + 10)
+
+    def test_accessible_profile_prunes_stairs_and_inaccessible_pathways(self):
+        Pathway.objects.create(start_point=self.lobby, end_point=self.office, pathway_type='ramp',
+                               distance_meters=5, estimated_time_minutes=0.1, is_accessible=False)
+        self.assertEqual(self.pathway_types(PathFinder().find_shortest_path(self.office.id, self.lobby.id)), ['ramp'])
+
+        finder = PathFinder(accessibility_required=True)
+        route = finder.find_shortest_path(self.office.id, self.lobby.id)
+        self.assertEqual(self.pathway_types(route), ['indoor_corridor', 'elevator', 'indoor_corridor'])
+        self.assertNotIn(PATHWAY_TYPE_CODES.index('staircase'), finder.graph.edge_type)
+        self.assertTrue(all(pathway.is_accessible for pathway in route['pathways']))
+
+
+@override_settings(NAVIGATOR_RATELIMIT_ENABLED=False, NAVIGATOR_PERF_ENABLED=True)
+class MetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.grid = make_grid()
+
+    def setUp(self):
+        perf.registry.reset()
+        clear_graphs()
+
+    def test_requests_are_exposed_in_prometheus_format(self):
+        url = reverse('api_directions', args=[self.grid[0][0].id, self.grid[-1][-1].id])
+        first = self.client.get(url)
+        self.assertRegex(first['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('graph;dur=', first['Server-Timing'])
+        self.client.get(url)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        text = response.content.decode()
+        self.assertIn('# TYPE navigator_request_duration_seconds histogram', text)
+        self.assertIn('navigator_request_duration_seconds_count{view="api_directions"} 2', text)
+        self.assertIn('navigator_graph_build_seconds_count{view="api_directions"} 1', text)
+        self.assertRegex(text, r'navigator_cache_hit_ratio\{view="api_directions"\} [\d.]+')
+        # Buckets are cumulative and end at the count; /metrics is not measured
+        buckets = [
+            int(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+            if line.startswith('navigator_db_queries_bucket{view="api_directions"')
+        ]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], 2)
+        self.assertNotIn('view="metrics"', text)
+
+    @override_settings(NAVIGATOR_PERF_ENABLED=False)
+    def test_disabled_metrics_are_not_found(self):
+        response = self.client.get(reverse('api_service_points'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+class AnalyticsReportTests(TestCase):
+
+    def test_empty_report_names_the_setting_to_check(self):
+        output = io.StringIO()
+        call_command('analytics_report', stdout=output)
+        self.assertIn('NAVIGATOR_ANALYTICS_ENABLED', output.getvalue())
+
+
+class ParetoRoutingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.grid = make_grid()
+
+    def test_routes_are_exactly_the_non_dominated_paths(self):
+        graph = build_graph()
+        weight_arrays = [graph.profile_weights(profile) for profile in PARETO_PROFILES]
+        source = graph.nodes_for_point(self.grid[0][0].id)[0]
+        target = graph.nodes_for_point(self.grid[-1][-1].id)[0]
+
+        routes = pareto_search(graph, weight_arrays, [source], {target})
+        vectors = [vector for vector, _, _ in routes]
+        self.assertTrue(routes)
+        for vector, nodes, edges in routes:
+            self.assertEqual((nodes[0], nodes[-1]), (source, target))
+            self.assertEqual(len(nodes), len(set(nodes)))
+            for expected, actual in zip(path_cost(weight_arrays, edges), vector):
+                self.assertAlmostEqual(expected, actual)
+        # No returned route dominates another
+        for i, a in enumerate(vectors):
+            for j, b in enumerate(vectors):
+                if i != j:
+                    self.assertFalse(dominates(a, b) and a != b)
+
+        # Every path is matched or beaten by a returned route, and no path
+        # strictly beats one
+        for _, edges in simple_paths(graph, source, target):
+            cost = path_cost(weight_arrays, edges)
+            self.assertTrue(any(dominates(vector, [c + 1e-9 for c in cost]) for vector in vectors))
+            for vector in vectors:
+                self.assertFalse(dominates(cost, vector) and any(c < v - 1e-9 for c, v in zip(cost, vector)))
+
+    def test_every_trade_off_survives_at_a_busy_node(self):
+        # A chain of 10 diamonds, each crossed short-and-slow or
+        # long-and-fast: 11 non-dominated routes reach the last point
+        chain = [make_service(f'Chain {i}', latitude=-17.29 - i * 0.0005) for i in range(11)]
+        for a, b in zip(chain, chain[1:]):
+            Pathway.objects.create(start_point=a, end_point=b, pathway_type='outdoor', distance_meters=10, estimated_time_minutes=2)
+            Pathway.objects.create(start_point=a, end_point=b, pathway_type='outdoor', distance_meters=20, estimated_time_minutes=1)
+        graph = build_graph()
+        weight_arrays = [graph.edge_distance, graph.edge_time]
+        source = graph.nodes_for_point(chain[0].id)[0]
+        target = graph.nodes_for_point(chain[-1].id)[0]
+
+        routes = pareto_search(graph, weight_arrays, [source], {target})
+        self.assertEqual(
+            sorted(vector for vector, _, _ in routes),
+            [(100.0 + 10 * i, 20.0 - i) for i in range(11)],
+        )
+        # The optional cap is a heuristic that trades routes for work
+        self.assertLess(len(pareto_search(graph, weight_arrays, [source], {target}, max_labels_per_node=8)), 11)
+
+    def test_pathfinder_orders_routes_by_first_profile(self):
+        routes = PathFinder().find_pareto_routes(self.grid[0][0].id, self.grid[-1][-1].id)
+        costs = [route['criteria'][PARETO_PROFILES[0]] for route in routes]
+        self.assertEqual(costs, sorted(costs))
+
+
+class AlternativeRoutingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.grid = make_grid()
+
+    def test_yen_returns_the_k_cheapest_loopless_paths_in_order(self):
+        graph = build_graph()
+        weights = graph.profile_weights('shortest')
+        source = graph.nodes_for_point(self.grid[0][0].id)[0]
+        target = graph.nodes_for_point(self.grid[-1][-1].id)[0]
+        k = 6
+
+        # No stretch or overlap limit: plain k shortest paths
+        paths = alternative_paths(graph, weights, [source], {target}, k, max_stretch=100, max_overlap=1.0)
+        self.assertEqual(len(paths), k)
+        self.assertEqual(len({tuple(edges) for _, _, edges in paths}), k)
+        for cost, nodes, edges in paths:
+            self.assertEqual((nodes[0], nodes[-1]), (source, target))
+            self.assertEqual(len(nodes), len(set(nodes)))
+            self.assertAlmostEqual(cost, path_cost([weights], edges)[0])
+        costs = [cost for cost, _, _ in paths]
+        self.assertEqual(costs, sorted(costs))
+
+        brute_force = sorted(path_cost([weights], edges)[0] for _, edges in simple_paths(graph, source, target))
+        for expected, actual in zip(brute_force[:k], costs):
+            self.assertAlmostEqual(expected, actual)
+
+    def test_alternatives_respect_the_stretch_limit(self):
+        start, end = self.grid[0][0].id, self.grid[-1][-1].id
+        best = PathFinder().find_shortest_path(start, end)
+        routes = PathFinder().find_alternative_routes(start, end, k=4, max_stretch=1.2)
+        self.assertEqual(routes[0]['distance_meters'], best['distance_meters'])
+        self.assertLessEqual(len(routes), 4)
+        for route in routes:
+            self.assertLessEqual(route['cost'], routes[0]['cost'] * 1.2 + 1e-9)
+
+
+@override_settings(NAVIGATOR_RATELIMIT_ENABLED=False)
+class WalkingDistanceTests(TestCase):
+    """
+    From the gate, the north toilet is ~170 m away as the crow flies but
+    610 m on foot round a wall; the south one is ~300 m away and 310 m on foot.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gate = make_service('Gate', 'office')
+        cls.north = make_service('North Toilet', 'toilet', latitude=-17.2833 + 0.00153)
+        cls.south = make_service('South Toilet', 'toilet', latitude=-17.2833 - 0.0027)
+        detour = make_service('Wall End', 'office', longitude=30.2167 + 0.004)
+        for start, end, length in ((cls.gate, cls.south, 310), (cls.gate, detour, 400), (detour, cls.north, 210)):
+            Pathway.objects.create(start_point=start, end_point=end, pathway_type='outdoor',
+                                   distance_meters=length, estimated_time_minutes=length / 80)
+
+    def setUp(self):
+        clear_graphs()
+
+    def nearest(self, **params):
+        return self.client.get(reverse('api_nearest_service'), {
+            'lat': -17.2833, 'lon': 30.2167, 'type': 'toilet', 'radius': 1000, **params,
+        }).json()
+
+    def test_walking_mode_ranks_by_network_distance(self):
+        straight = self.nearest()
+        self.assertEqual((straight['id'], straight['mode']), (self.north.id, 'straight'))
+        self.assertAlmostEqual(straight['distance_meters'], 170, delta=1)
+
+        walking = self.nearest(mode='walking')
+        self.assertEqual((walking['id'], walking['mode']), (self.south.id, 'walking'))
+        self.assertEqual(walking['distance_meters'], 310)
+
+    def test_nearby_services_by_walking_are_ordered_and_bounded(self):
+        params = {'lat': -17.2833, 'lon': 30.2167, 'type': 'toilet', 'radius': 1000, 'mode': 'walking'}
+        data = self.client.get(reverse('api_nearby_services'), params).json()
+        self.assertEqual([(s['id'], s['distance_meters']) for s in data['services']],
+                         [(self.south.id, 310), (self.north.id, 610)])
+        data = self.client.get(reverse('api_nearby_services'), {**params, 'radius': 500}).json()
+        self.assertEqual([s['id'] for s in data['services']], [self.south.id])
+
+
+    def test_non_positive_radius_and_bands_are_rejected(self):
+        position = {'lat': -17.2833, 'lon': 30.2167}
+        for name in ('api_nearest_service', 'api_nearby_services'):
+            for radius in (0, -50):
+                with self.subTest(endpoint=name, radius=radius):
+                    response = self.client.get(reverse(name), {**position, 'radius': radius})
+                    self.assertEqual(response.status_code, 400)
+        for bands in ('0', '-1,3', 'nan'):
+            with self.subTest(bands=bands):
+                response = self.client.get(reverse('api_isochrone'), {**position, 'bands': bands})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_isochrone'), {**position, 'bands': '1,3'}).status_code, 200)
+
+
+class PathwayClosureTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.grid = make_grid()
+
+    def setUp(self):
+        clear_graphs()
+        self.start, self.end = self.grid[0][0].id, self.grid[-1][-1].id
+
+    def pathway_ids(self, route):
+        return set(route.pathways.values_list('id', flat=True))
+
+    def test_closed_pathway_is_avoided_and_its_cached_route_dropped(self):
+        route = get_or_create_route(self.start, self.end)
+        closed = route.pathways.first()
+        PathwayClosure.objects.create(pathway=closed, reason='Resurfacing')
+
+        self.assertFalse(Route.objects.filter(id=route.id).exists())
+        result = PathFinder().find_shortest_path(self.start, self.end)
+        self.assertNotIn(closed, result['pathways'])
+        self.assertNotIn(closed.id, self.pathway_ids(get_or_create_route(self.start, self.end)))
+
+    def test_scheduled_closure_applies_without_a_save(self):
+        route = get_or_create_route(self.start, self.end)
+        closed = route.pathways.first()
+        now = timezone.now()
+        closure = PathwayClosure.objects.create(pathway=closed, starts_at=now + timedelta(hours=1))
+        self.assertEqual(get_or_create_route(self.start, self.end).id, route.id)
+
+        # An hour on, in a process that never saw the closure saved
+        Route.objects.filter(id=route.id).update(updated_at=now - timedelta(hours=2))
+        PathwayClosure.objects.filter(id=closure.id).update(starts_at=now - timedelta(hours=1))
+        clear_graphs()
+
+        refreshed = get_or_create_route(self.start, self.end)
+        self.assertEqual(refreshed.id, route.id)
+        self.assertNotIn(closed.id, self.pathway_ids(refreshed))
+
+    def test_routes_detouring_around_an_ended_closure_are_refreshed(self):
+        best = get_or_create_route(self.start, self.end)
+        closed = best.pathways.first()
+        best_pathways = self.pathway_ids(best)
+        now = timezone.now()
+        closure = PathwayClosure.objects.create(pathway=closed)
+        detour = get_or_create_route(self.start, self.end)
+        self.assertNotIn(closed.id, self.pathway_ids(detour))
+
+        # The closure ends without anyone editing it
+        Route.objects.filter(id=detour.id).update(updated_at=now - timedelta(minutes=90))
+        PathwayClosure.objects.filter(id=closure.id).update(
+            starts_at=now - timedelta(hours=2), ends_at=now - timedelta(hours=1),
+        )
+        clear_graphs()
+
+        self.assertEqual(self.pathway_ids(get_or_create_route(self.start, self.end)), best_pathways)
+
+    def test_current_routes_are_served_from_the_cache(self):
+        route = get_or_create_route(self.start, self.end)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_or_create_route(self.start, self.end).id, route.id)
+
+
+@override_settings(NAVIGATOR_RATELIMIT_ENABLED=False)
+class GeofenceTests(TestCase):
+    """A 50 m library area inside a 200 m cafeteria area, and a campus-wide one"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.library = make_service('Library', 'library')
+        cls.cafeteria = make_service('Cafeteria', 'canteen', latitude=-17.2833 + 0.0009)
+        cls.security = make_service('Security', 'security', latitude=-17.29)
+        for service, radius in ((cls.library, 50), (cls.cafeteria, 200), (cls.security, 5000)):
+            ServiceArea.objects.create(service_point=service, buffer_radius_meters=radius)
+
+    def setUp(self):
+        geofence.clear_index()
+
+    def areas(self, latitude, longitude, **params):
+        response = self.client.get(reverse('api_geofence'), {'lat': latitude, 'lon': longitude, **params})
+        self.assertEqual(response.status_code, 200)
+        return [area['service_id'] for area in response.json()['areas']]
+
+    def test_fix_is_matched_to_containing_areas_nearest_first(self):
+        # ~22 m from the library, ~78 m from the cafeteria
+        self.assertEqual(self.areas(-17.2831, 30.2167), [self.library.id, self.cafeteria.id, self.security.id])
+        # ~250 m north of the library and its 50 m circle
+        self.assertEqual(self.areas(-17.2810, 30.2167), [self.cafeteria.id, self.security.id])
+        self.assertEqual(self.areas(-17.2831, 30.2167, type='canteen'), [self.cafeteria.id])
+        self.assertEqual(self.areas(-17.40, 30.2167), [])
+
+    def test_index_follows_area_changes(self):
+        self.assertEqual(self.areas(-17.2810, 30.2167), [self.cafeteria.id, self.security.id])
+        area = self.library.service_area
+        area.buffer_radius_meters = 300
+        area.save()
+        self.assertEqual(self.areas(-17.2810, 30.2167), [self.cafeteria.id, self.library.id, self.security.id])
+
+    def test_batch_lists_each_service_once(self):
+        response = self.client.post(
+            reverse('api_geofence'), {'fixes': [[-17.2831, 30.2167], [-17.2810, 30.2167], [-17.40, 30.2167]]},
+            content_type='application/json',
+        )
+        data = response.json()
+        self.assertEqual(
+            [[match['service_id'] for match in fix] for fix in data['fixes']],
+            [[self.library.id, self.cafeteria.id, self.security.id], [self.cafeteria.id, self.security.id], []],
+        )
+        self.assertEqual(sorted(map(int, data['services'])), sorted([self.library.id, self.cafeteria.id, self.security.id]))
+
+    def test_bad_fixes_are_rejected(self):
+        url = reverse('api_geofence')
+        for params in ({'lat': 'nan', 'lon': 30.2}, {'lat': -17.28, 'lon': 'inf'}, {'lat': -17.28}, {'lat': 'x', 'lon': 30.2}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+        bodies = (
+            'not json', '{}', '{"fixes": [[-17.28]]}', '{"fixes": [[-17.28, "east"]]}',
+            '{"fixes": [[-17.28, 30.2], [NaN, 30.2]]}', '{"fixes": [[-17.28, 30.2, 5]]}',
+            '{"fixes": %s}' % ([[-17.28, 30.2]] * (geofence.MAX_BATCH_FIXES + 1)),
+        )
+        for body in bodies:
+            with self.subTest(body=body[:40]):
+                self.assertEqual(self.client.post(url, body, content_type='application/json').status_code, 400)
+
+
+def offset_position(east, north, latitude=-17.2833, longitude=30.2167):
+    """(latitude, longitude) a given number of meters east and north of a position"""
+    return latitude + north / 111195, longitude + east / 106180
+
+
+class MapMatchingTests(TestCase):
+    """
+    Outdoor paths W-A-B-C-Z (east 150 m, then north 150 m) and a dead-end
+    path D-E running 18 m south of A-B, close enough to catch noisy fixes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        layout = {'W': (0, 0), 'A': (50, 0), 'B': (150, 0), 'C': (150, 100), 'Z': (150, 150), 'D': (50, -18), 'E': (130, -18)}
+        points = {}
+        for name, (east, north) in layout.items():
+            latitude, longitude = offset_position(east, north)
+            points[name] = make_service(f'Post {name}', latitude=latitude, longitude=longitude)
+        cls.pathways = {}
+        for a, b in ('WA', 'AB', 'BC', 'CZ', 'WD', 'DE'):
+            cls.pathways[a + b] = Pathway.objects.create(
+                start_point=points[a], end_point=points[b], pathway_type='outdoor',
+                distance_meters=100, estimated_time_minutes=5,
+            )
+
+    def walk(self, seed, speed=1.25):
+        """A fix every 10 m along W-A-B-C-Z with GPS noise, every 4th pulled 10 m south"""
+        rng = random.Random(seed)
+        fixes, step = [], 10.0
+        for i in range(1, 30):
+            travelled = i * step
+            east, north = (travelled, 0.0) if travelled <= 150 else (150.0, travelled - 150)
+            east, north = east + rng.gauss(0, 3), north + rng.gauss(0, 3)
+            if i % 4 == 0 and travelled < 150:
+                north -= 10
+            fixes.append((*offset_position(east, north), 1000.0 + travelled / speed))
+        return f'walk-{seed}', fixes
+
+    def test_noisy_trace_stays_on_the_walked_paths(self):
+        network = build_network()
+        _, fixes = self.walk(1)
+        fixes = _thin(fixes)
+        # Matching each fix on its own would put some of them on D-E
+        nearest = [network.segments[network.candidates(*network.project(lat, lon))[0][0]][0] for lat, lon, _ in fixes]
+        self.assertIn(self.pathways['DE'].id, nearest)
+
+        runs = viterbi(network, fixes, _Routes(network))
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(len(runs[0]), len(fixes))
+
+        walked = {self.pathways[name].id for name in ('WA', 'AB', 'BC', 'CZ')}
+        matched = [network.segments[index][0] for _, (index, _) in runs[0]]
+        self.assertTrue(set(matched) <= walked)
+        # In order, with no jumps back
+        order = [self.pathways[name].id for name in ('WA', 'AB', 'BC', 'CZ')]
+        positions = [order.index(pathway_id) for pathway_id in matched]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_traversal_times_are_measured_and_saved(self):
+        result = match_trace(self.walk(2), build_network())
+        # 100 m at 1.25 m/s end to end, only for the paths walked fully
+        self.assertEqual(set(result['observations']), {self.pathways['AB'].id, self.pathways['BC'].id})
+        for seconds in result['observations'].values():
+            self.assertAlmostEqual(seconds[0], 80, delta=8)
+
+        totals = match_traces([self.walk(3), self.walk(4, speed=1.0)], processes=1)
+        times = observed_times(totals['observations'])
+        self.assertEqual(set(times), {self.pathways['AB'].id, self.pathways['BC'].id})
+        self.assertEqual(save_times(times), 2)
+        self.pathways['AB'].refresh_from_db()
+        # Median of 80 s and 100 s
+        self.assertAlmostEqual(self.pathways['AB'].estimated_time_minutes, 1.5, delta=0.15)
+
+
+@override_settings(NAVIGATOR_SHARED_GRAPH_DIR='')
+class SnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.grid = make_grid()
+        building = make_building()
+        Floor.objects.create(building=building, floor_number=1)
+        Room.objects.create(building=building, name='Lab', room_number='101', latitude=-17.2833, longitude=30.2167)
+        ServiceArea.objects.create(service_point=cls.grid[1][1], buffer_radius_meters=60)
+        PathwayClosure.objects.create(pathway=Pathway.objects.first(), reason='Works')
+
+    def routes(self):
+        clear_graphs()
+        finders = (PathFinder(), PathFinder(accessibility_required=True))
+        return [
+            (route['path_ids'], route['distance_meters']) if route else None
+            for finder in finders
+            for route in (finder.find_shortest_path(self.grid[0][0].id, self.grid[-1][-1].id),
+                          finder.find_shortest_path(self.grid[-1][0].id, self.grid[0][-1].id))
+        ]
+
+    def test_export_then_load_restores_tables_and_routes(self):
+        counts = {model: model.objects.count() for model in SNAPSHOT_MODELS}
+        projections = sorted(ServicePoint.objects.values_list('id', 'easting', 'northing', 'is_accessible'))
+        routes = self.routes()
+        self.assertTrue(all(routes))
+        get_or_create_route(self.grid[0][0].id, self.grid[-1][-1].id)
+
+        snapshot = io.BytesIO()
+        manifest = export_snapshot(snapshot)
+        self.assertEqual({table['model']: table['rows'] for table in manifest['tables']},
+                         {model._meta.label: count for model, count in counts.items()})
+        for model in reversed(SNAPSHOT_MODELS):
+            model.objects.all().delete()
+
+        snapshot.seek(0)
+        load_snapshot(snapshot)
+        self.assertEqual({model: model.objects.count() for model in SNAPSHOT_MODELS}, counts)
+        self.assertEqual(sorted(ServicePoint.objects.values_list('id', 'easting', 'northing', 'is_accessible')), projections)
+        # Cached routes refer to the replaced rows
+        self.assertFalse(Route.objects.exists())
+        self.assertEqual(self.routes(), routes)
+
+
+@override_settings(NAVIGATOR_RATELIMIT_ENABLED=False)
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        building = make_building()
+        for i in range(7):
+            make_service(f'Office {i}', 'office', building=building)
+            make_service(f'Toilet {i}', 'toilet', building=building)
+
+    def test_cursor_round_trip_visits_every_service_once_in_order(self):
+        expected = list(ServicePoint.objects.order_by('service_type', 'name', 'id').values_list('id', flat=True))
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 3, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get(reverse('api_service_points'), params).json()
+            self.assertLessEqual(len(data['services']), 3)
+            seen += [s['id'] for s in data['services']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_merged_search_pages_do_not_repeat_or_skip(self):
+        expected = sorted(
+            (s.name, s.id) for s in ServicePoint.objects.filter(name__icontains='o')
+        )
+        seen, cursor = [], None
+        while True:
+            params = {'q': 'o', 'page_size': 4, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get(reverse('api_search'), params).json()
+            seen += [(r['name'], r['id']) for r in data['results'] if r['type'] == 'ServicePoint']
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_bad_cursors_are_rejected(self):
+        for cursor in ('not-a-cursor', encode_cursor(['a', 'b', None]), encode_cursor(['a', 'b']), encode_cursor(['a', 'b', True])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('api_service_points'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                response = self.client.get(reverse('api_search'), {'q': 'o', 'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+
+    def test_search_ignores_off_campus_positions_and_rejects_invalid_ones(self):
+        near = self.client.get(reverse('api_search'), {'q': 'office', 'lat': -17.2834, 'lon': 30.2168}).json()
+        self.assertIn('distance_meters', near['results'][0])
+        far = self.client.get(reverse('api_search'), {'q': 'office', 'lat': 0, 'lon': 0}).json()
+        self.assertNotIn('distance_meters', far['results'][0])
+        self.assertEqual([r['name'] for r in far['results']], sorted(r['name'] for r in far['results']))
+        for lat in ('nan', 'inf', '91'):
+            response = self.client.get(reverse('api_search'), {'q': 'office', 'lat': lat, 'lon': 30.2})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(reverse('search'), {'q': 'office', 'lat': 'nan', 'lon': 0}).status_code, 200)
+
+    def test_html_directory_restarts_on_a_bad_cursor(self):
+        response = self.client.get(reverse('service_points'), {'cursor': encode_cursor(['a', 'b', None])})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(NAVIGATOR_RATELIMIT_ENABLED=False)
+class SyncFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = make_building()
+        cls.rooms = [
+            Room.objects.create(building=cls.building, name=f'Room {i}', room_number=str(i), latitude=-17.2833, longitude=30.2167)
+            for i in range(4)
+        ]
+        cls.services = [make_service(f'Service {i}', building=cls.building) for i in range(5)]
+
+    def sync(self, **params):
+        response = self.client.get(reverse('api_sync'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, payload, section):
+        return [row[0] for row in payload.get(section, {'rows': []})['rows']]
+
+    def test_full_copy_is_paged_by_cursor(self):
+        pages = [self.sync(limit=3)]
+        while pages[-1]['more']:
+            self.assertLessEqual(sum(len(pages[-1].get(s, {'rows': []})['rows']) for s in ('buildings', 'rooms', 'services')), 3)
+            pages.append(self.sync(limit=3, cursor=pages[-1]['cursor']))
+
+        self.assertEqual([page['full'] for page in pages], [True] + [False] * (len(pages) - 1))
+        self.assertEqual({page['version'] for page in pages}, {pages[0]['version']})
+        self.assertEqual([i for page in pages for i in self.ids(page, 'buildings')], [self.building.id])
+        self.assertEqual([i for page in pages for i in self.ids(page, 'rooms')], [r.id for r in self.rooms])
+        self.assertEqual([i for page in pages for i in self.ids(page, 'services')], [s.id for s in self.services])
+
+    def test_incremental_pages_and_tombstones(self):
+        version = self.sync()['version']
+        self.assertEqual(self.sync(since=version), {'version': version, 'full': False, 'more': False})
+
+        moved = self.services[0]
+        moved.latitude = -17.2840
+        moved.save()
+        added = make_service('New kiosk', building=self.building)
+        removed_id = self.rooms[1].id
+        self.rooms[1].delete()
+
+        changed, deleted, since = [], [], version
+        while True:
+            page = self.sync(since=since, limit=1)
+            self.assertFalse(page['full'])
+            changed += self.ids(page, 'services')
+            deleted += page.get('deleted', {}).get('rooms', [])
+            since = page['version']
+            if not page['more']:
+                break
+        self.assertEqual(sorted(changed), sorted([moved.id, added.id]))
+        self.assertEqual(deleted, [removed_id])
+        self.assertEqual(self.sync(since=since), {'version': since, 'full': False, 'more': False})
+
+    def test_reset_sends_clients_back_to_a_full_copy(self):
+        version = self.sync()['version']
+        record_reset()
+        self.assertTrue(self.sync(since=version)['full'])
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.client.get(reverse('api_sync'), {'cursor': encode_cursor([1, 9, 0])})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(NAVIGATOR_RATELIMIT_ENABLED=True, NAVIGATOR_RATE_LIMITS={'search': (60, 3)})
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_allows_a_burst_then_refills_at_the_rate(self):
+        now = 1_000_000
+        results = [take(cache, 'test-bucket', 60, 3, now) for _ in range(4)]
+        self.assertEqual([allowed for allowed, _, _ in results], [True, True, True, False])
+        self.assertEqual([remaining for _, remaining, _ in results], [2, 1, 0, 0])
+        self.assertAlmostEqual(results[-1][2], 1.0)
+        # One token back per second (60/min), and the refused request cost nothing
+        self.assertTrue(take(cache, 'test-bucket', 60, 3, now + 1000)[0])
+        self.assertFalse(take(cache, 'test-bucket', 60, 3, now + 1000)[0])
+
+    def test_burst_then_429_with_retry_after(self):
+        url = reverse('api_service_points')
+        responses = [self.client.get(url) for _ in range(4)]
+        self.assertEqual([r.status_code for r in responses], [200, 200, 200, 429])
+        self.assertEqual([r['X-RateLimit-Remaining'] for r in responses], ['2', '1', '0', '0'])
+        self.assertEqual(responses[-1]['X-RateLimit-Limit'], '3')
+        self.assertGreaterEqual(int(responses[-1]['Retry-After']), 1)
+        self.assertEqual(responses[-1].json()['error'], 'Rate limit exceeded')
+
+    def test_signed_in_requests_charge_both_address_and_account(self):
+        url = reverse('api_service_points')
+        User.objects.create_user('walker', password='pw')
+        for _ in range(3):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.1').status_code, 200)
+        # A fresh account does not buy a fresh allowance on the same address
+        self.client.login(username='walker', password='pw')
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.1').status_code, 429)
+
+        # Nor does a fresh address for the same account
+        for _ in range(3):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.3').status_code, 429)
+        # ... and the refused request did not use up the new address's tokens
+        self.client.logout()
+        for _ in range(3):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.3').status_code, 200)
+
+
+@override_settings(NAVIGATOR_RATELIMIT_ENABLED=False, NAVIGATOR_UTM_ZONE='36S')
+class ProjectionTests(TestCase):
+
+    def test_known_point_projects_to_the_surveyed_utm_fix(self):
+        # Admin block fix from converted_file_1.json: 203230.625E 8079086.754N 36K
+        easting, northing = to_utm(-17.3543429, 30.20756)
+        self.assertAlmostEqual(easting, 203230.625, delta=0.01)
+        self.assertAlmostEqual(northing, 8079086.754, delta=0.01)
+
+    def test_positions_outside_the_utm_band_are_rejected(self):
+        for latitude, longitude in ((90, 30.2), (-90, 30.2), (float('inf'), 30.2), (-17.3, 181), (0, 123), (0, -150)):
+            with self.subTest(latitude=latitude, longitude=longitude):
+                with self.assertRaises(ValueError):
+                    to_utm(latitude, longitude)
+
+    def test_endpoints_answer_400_for_polar_positions(self):
+        make_service('Library', 'library')
+        params = {'lat': 90, 'lon': 30.2}
+        for name in ('api_nearest_service', 'api_nearby_services', 'api_isochrone', 'api_geofence'):
+            with self.subTest(endpoint=name):
+                self.assertEqual(self.client.get(reverse(name), params).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_nearby_services'), {**params, 'mode': 'walking'}).status_code, 400)
+        response = self.client.post(
+            reverse('api_geofence'), '{"fixes": [[-17.28, 30.21], [90, 30.2]]}', content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_endpoints_answer_400_for_positions_far_from_the_zone(self):
+        make_service('Library', 'library')
+        for latitude, longitude in ((0, 123), (-17.3, -150), (-17.3, 20)):
+            params = {'lat': latitude, 'lon': longitude}
+            for name in ('api_nearest_service', 'api_nearby_services', 'api_isochrone', 'api_geofence'):
+                with self.subTest(endpoint=name, longitude=longitude):
+                    self.assertEqual(self.client.get(reverse(name), params).status_code, 400)
+                    self.assertEqual(self.client.get(reverse(name), {**params, 'mode': 'walking'}).status_code, 400)
+        response = self.client.post(
+            reverse('api_geofence'), '{"fixes": [[-17.28, 30.21], [0, 123]]}', content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        # Search treats a valid fix outside the zone as off campus
+        results = self.client.get(reverse('api_search'), {'q': 'library', 'lat': 0, 'lon': 123}).json()['results']
+        self.assertNotIn('distance_meters', results[0])
+
+    def test_bulk_created_rows_are_still_found_by_radius(self):
+        ServicePoint.objects.bulk_create([
+            ServicePoint(name='Bulk Kiosk', service_type='office', latitude=-17.2833, longitude=30.2167),
+            ServicePoint(name='Far Kiosk', service_type='office', latitude=-17.2933, longitude=30.2167),
+        ])
+        self.assertIsNone(ServicePoint.objects.get(name='Bulk Kiosk').easting)
+        found = within_radius(ServicePoint.objects.all(), -17.2834, 30.2167, 50)
+        self.assertEqual([service.name for service, _ in found], ['Bulk Kiosk'])
+        self.assertAlmostEqual(found[0][1], 11.1, delta=0.5)
+
+    def test_fixture_loads_are_projected(self):
+        service = make_service('Clinic', 'clinic', latitude=-17.3, longitude=30.2)
+        ServicePoint.objects.filter(id=service.id).update(easting=None, northing=None)
+        payload = serializers.serialize('json', ServicePoint.objects.filter(id=service.id))
+        service.delete()
+        for obj in serializers.deserialize('json', payload):
+            obj.save()
+        loaded = ServicePoint.objects.get(name='Clinic')
+        self.assertEqual((loaded.easting, loaded.northing), to_utm(-17.3, 30.2))
+
+
+@override_settings(NAVIGATOR_RATELIMIT_ENABLED=False)
+class SerializationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        building = make_building()
+        for i in range(3):
+            make_service(f'Office {i}', 'office', building=building)
+
+    def get(self, accept=None):
+        headers = {'HTTP_ACCEPT': accept} if accept else {}
+        return self.client.get(reverse('api_service_points'), **headers)
+
+    def test_json_by_default(self):
+        response = self.get()
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('Accept', response['Vary'])
+        self.assertEqual([s['type'] for s in response.json()['services']], ['Office'] * 3)
+
+    @skipUnless(serialization.msgpack, 'msgpack is not installed')
+    def test_msgpack_when_accepted(self):
+        expected = self.get().json()
+        for accept in ('application/msgpack', 'application/x-msgpack, application/json;q=0.5'):
+            with self.subTest(accept=accept):
+                response = self.get(accept)
+                self.assertEqual(response['Content-Type'], 'application/msgpack')
+                self.assertIn('Accept', response['Vary'])
+                self.assertEqual(serialization.msgpack.unpackb(response.content), expected)
+        self.assertEqual(self.get('application/msgpack;q=0')['Content-Type'], 'application/json')
+
+    def test_msgpack_request_falls_back_to_json_without_the_package(self):
+        with mock.patch.object(serialization, 'msgpack', None):
+            response = self.get('application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(len(response.json()['services']), 3)
+
+    def test_encoders_agree_on_non_json_types(self):
+        data = {
+            'when': datetime(2026, 1, 2, 3, 4, 5), 'at': datetime.fromisoformat('2026-01-02T03:04:05.250+00:00'),
+            'cost': Decimal('1.5'), 7: ['a'],
+        }
+        expected = {'when': '2026-01-02T03:04:05', 'at': '2026-01-02T03:04:05.250000+00:00', 'cost': 1.5, '7': ['a']}
+        self.assertEqual(json.loads(serialization.dumps_json(data)), expected)
+        with mock.patch.object(serialization, 'orjson', None):
+            self.assertEqual(json.loads(serialization.dumps_json(data)), expected)
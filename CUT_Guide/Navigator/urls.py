@@ -15,6 +15,7 @@ urlpatterns = [
     # Building navigation
     path('building/<int:building_id>/', views.building_detail, name='building_detail'),
     path('building/<int:building_id>/floor/<int:floor_id>/', views.floor_detail, name='floor_detail'),
+    path('floor/<int:floor_id>/tiles/<str:version>/<path:name>', views.floor_tile, name='floor_tile'),
     path('building/<int:building_id>/room/<int:room_id>/', views.room_detail, name='room_detail'),
     
     # Services
@@ -28,5 +29,14 @@ urlpatterns = [
     # API endpoints
     path('api/nearest-service/', views.api_find_nearest_service, name='api_nearest_service'),
     path('api/nearby-services/', views.api_nearby_services, name='api_nearby_services'),
+    path('api/services/', views.api_service_points, name='api_service_points'),
+    path('api/search/', views.api_search, name='api_search'),
+    path('api/directions/<int:start_id>/<int:end_id>/', views.api_directions, name='api_directions'),
+    path('api/isochrone/', views.api_isochrone, name='api_isochrone'),
+    path('api/geofence/', views.api_geofence, name='api_geofence'),
+    path('api/sync/', views.api_sync, name='api_sync'),
     path('api/route-geometry/<int:start_id>/<int:end_id>/', views.api_route_geometry, name='api_route_geometry'),
+    
+    # Monitoring
+    path('metrics', views.metrics, name='metrics'),
 ]
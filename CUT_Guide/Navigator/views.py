@@ -1,13 +1,27 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse, HttpResponse, Http404
 from django.db.models import Q
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from django.urls import reverse
 from .models import Building, Room, ServicePoint, Floor, Pathway, Route
+from . import perf
+from .pagination import InvalidCursor, get_page_size, paginate_queryset, merge_querysets
+from .ratelimit import rate_limit
+from .serialization import PATHWAY_TYPE_LABELS, SERVICE_TYPE_LABELS, api_response
 import json
+import re
+
+# Largest radius (meters) and result count the proximity APIs accept;
+# larger requests are clamped rather than refused; radii of 0 or less are
+# refused
+NEAREST_MAX_RADIUS = 1000
+NEARBY_MAX_RADIUS = 1000
+NEARBY_MAX_LIMIT = 50
 
 
 def home(request):
@@ -48,6 +62,7 @@ def home(request):
         'campus_lon': 30.21668,
         'campus_zoom': 16,
         'model_type': 'Building',
+        'service_types': ServicePoint.SERVICE_TYPES,
     }
     return render(request, 'home.html', context)
 
@@ -67,7 +82,7 @@ def building_detail(request, building_id):
     building = get_object_or_404(Building, id=building_id)
     floors = building.floors.all().order_by('floor_number')
     rooms = building.rooms.all().order_by('floor__floor_number', 'room_number')
-    services = ServicePoint.objects.filter(building=building)
+    services = ServicePoint.objects.filter(building=building).order_by('service_type', 'name')
     
     context = {
         'building': building,
@@ -84,6 +99,7 @@ def floor_detail(request, building_id, floor_id):
     floor = get_object_or_404(Floor, id=floor_id, building=building)
     rooms = floor.rooms.all().order_by('room_number')
     services = floor.services.all()
+    tiles = _floorplan_tiles(floor)
     
     context = {
         'building': building,
@@ -91,10 +107,52 @@ def floor_detail(request, building_id, floor_id):
         'rooms': rooms,
         'services': services,
         'floorplan_url': floor.floorplan_image.url if floor.floorplan_image else None,
+        'floorplan_tiles': tiles,
+        'floorplan_tiles_json': json.dumps(tiles),
     }
     return render(request, 'floor_detail.html', context)
 
 
+# Floorplan tiles: <zoom>/<x>_<y>.<ext> or thumb.<ext> under a hex version
+TILE_VERSION = re.compile(r'[0-9a-f]{8,40}')
+TILE_NAME = re.compile(r'(\d+/\d+_\d+|thumb)\.(webp|jpg)')
+TILE_TYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+TILE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def _floorplan_tiles(floor):
+    """Tile layer settings for the floor page, or None until tiles are built"""
+    tiles = floor.floorplan_tiles
+    if not tiles:
+        return None
+    base = reverse('floor_tile', args=[floor.id, tiles['version'], 'thumb.jpg'])[:-len('thumb.jpg')]
+    return {
+        'url': base + '{z}/{x}_{y}.' + tiles['format'],
+        'width': tiles['width'],
+        'height': tiles['height'],
+        'tile_size': tiles['tile_size'],
+        'max_zoom': tiles['max_zoom'],
+        'thumbnails': {kind: base + name for kind, name in tiles['thumbnails'].items()},
+    }
+
+
+def floor_tile(request, floor_id, version, name):
+    """
+    Floorplan tile or thumbnail. The version in the URL is a hash of the
+    source image, so responses never change and may be cached forever.
+    """
+    from .floorplans import tile_path
+    
+    if not TILE_VERSION.fullmatch(version) or not TILE_NAME.fullmatch(name):
+        raise Http404('Unknown tile')
+    try:
+        response = FileResponse(open(tile_path(floor_id, version, name), 'rb'), content_type=TILE_TYPES[name.rsplit('.', 1)[1]])
+    except FileNotFoundError:
+        raise Http404('Unknown tile')
+    response['Cache-Control'] = TILE_CACHE_CONTROL
+    return response
+
+
 def room_detail(request, building_id, room_id):
     """View room details"""
     building = get_object_or_404(Building, id=building_id)
@@ -109,63 +167,89 @@ def room_detail(request, building_id, room_id):
     return render(request, 'room_detail.html', context)
 
 
-def service_points(request):
-    """List all service points with filtering"""
-    services = ServicePoint.objects.all().order_by('service_type', 'name')
+SERVICE_PAGE_ORDERING = ['service_type', 'name', 'id']
+
+
+def _filtered_services(request):
+    """Service point queryset filtered by the ?type= and ?accessibility= params"""
+    services = ServicePoint.objects.select_related('building', 'room')
     
     # Filter by service type if provided
     service_type = request.GET.get('type', None)
     if service_type:
         services = services.filter(service_type=service_type)
     
-    # Filter by accessibility
+    # Filter by accessibility (indexed flag rather than a text null check)
     if request.GET.get('accessibility') == 'true':
-        services = services.exclude(accessibility_features__isnull=True)
+        services = services.filter(is_accessible=True)
+    
+    return services, service_type
+
+
+def _next_page_query(request, page):
+    """Query string for the page after this one, keeping the other filters"""
+    if not page.has_next:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = page.next_cursor
+    return params.urlencode()
+
+
+def service_points(request):
+    """List service points with filtering, one keyset page at a time"""
+    services, service_type = _filtered_services(request)
+    
+    try:
+        page = paginate_queryset(
+            services, SERVICE_PAGE_ORDERING,
+            cursor=request.GET.get('cursor'), page_size=get_page_size(request),
+        )
+    except InvalidCursor:
+        page = paginate_queryset(services, SERVICE_PAGE_ORDERING, page_size=get_page_size(request))
     
     # Group by type for display
     service_types = ServicePoint.SERVICE_TYPES
     
     context = {
-        'services': services,
+        'services': page.items,
+        'total_count': services.count(),
+        'next_page_query': _next_page_query(request, page),
+        'is_first_page': not request.GET.get('cursor'),
         'service_types': service_types,
         'selected_type': service_type,
     }
     return render(request, 'service_points.html', context)
 
 
+NEARBY_SERVICES_COUNT = 5
+
+
 def service_detail(request, service_id):
     """View service point details"""
-    service = get_object_or_404(ServicePoint, id=service_id)
+    from .geo import distance_between
+    from .routing import PathFinder
     
-    # Find nearby services using basic distance calculation
-    from math import radians, sin, cos, sqrt, atan2
+    service = get_object_or_404(ServicePoint, id=service_id)
     
-    def haversine_distance(lat1, lon1, lat2, lon2):
-        """Calculate distance between two points in kilometers"""
-        R = 6371  # Earth's radius in km
-        
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        return R * c
-    
-    # Calculate distances to all other services
-    all_services = ServicePoint.objects.exclude(id=service.id)
-    services_with_distance = []
-    
-    for s in all_services:
-        distance = haversine_distance(
-            service.latitude, service.longitude,
-            s.latitude, s.longitude
+    # Nearby services by walking distance over the routing graph; services
+    # the graph cannot reach are topped up by straight-line distance
+    nearby_services = [
+        (s, round(s.distance / 1000, 3), True)
+        for s in PathFinder().find_services_by_walking(point_id=service.id, limit=NEARBY_SERVICES_COUNT)
+    ]
+    if len(nearby_services) < NEARBY_SERVICES_COUNT:
+        found_ids = {s.id for s, _, _ in nearby_services} | {service.id}
+        by_straight_line = sorted(
+            (
+                (s, distance_between(service, s))
+                for s in ServicePoint.objects.exclude(id__in=found_ids)
+            ),
+            key=lambda item: item[1],
         )
-        services_with_distance.append((s, distance))
-    
-    # Sort by distance and get top 5
-    services_with_distance.sort(key=lambda x: x[1])
-    nearby_services = [(s, round(dist, 3)) for s, dist in services_with_distance[:5]]
+        nearby_services += [
+            (s, round(meters / 1000, 3), False)
+            for s, meters in by_straight_line[:NEARBY_SERVICES_COUNT - len(nearby_services)]
+        ]
     
     # Google Maps directions URL for current service
     google_maps_url = f"https://www.google.com/maps/dir/?api=1&destination={service.latitude},{service.longitude}&travelmode=walking"
@@ -178,145 +262,546 @@ def service_detail(request, service_id):
     return render(request, 'service_detail.html', context)
 
 
+def _search_sources(query):
+    """Querysets for each searchable model, merged by name in search results"""
+    return [
+        ('Building', Building.objects.filter(Q(name__icontains=query) | Q(code__icontains=query)), 'name'),
+        ('Room', Room.objects.select_related('building').filter(Q(name__icontains=query) | Q(room_number__icontains=query)), 'name'),
+        ('ServicePoint', ServicePoint.objects.select_related('building').filter(Q(name__icontains=query) | Q(service_type__icontains=query)), 'name'),
+    ]
+
+
+def _search_location(request):
+    """
+    Searcher's (lat, lon) from the query string; None without one, or when
+    it is too far from campus for distance to mean anything. Raises
+    ValueError (or TypeError) for a position that is not a finite fix.
+    """
+    from .geo import check_position, parse_fix
+    from .ranking import near_campus
+    if 'lat' not in request.GET and 'lon' not in request.GET:
+        return None
+    location = parse_fix(request.GET.get('lat'), request.GET.get('lon'))
+    try:
+        check_position(*location)
+    except ValueError:
+        return None
+    return location if near_campus(*location) else None
+
+
+def _search_page(request, query, location):
+    """Results ranked by relevance and distance with a location, by name without"""
+    cursor, page_size = request.GET.get('cursor'), get_page_size(request)
+    if location:
+        from .ranking import ranked_search
+        return ranked_search(query, *location, cursor=cursor, page_size=page_size)
+    return merge_querysets(_search_sources(query), cursor, page_size)
+
+
 def search(request):
-    """Search buildings, rooms, and service points"""
+    """Search buildings, rooms, and service points; nearest first when ?lat=&lon= are given"""
     query = request.GET.get('q', '')
+    try:
+        location = _search_location(request)
+    except (TypeError, ValueError):
+        location = None
     results = []
+    next_page_query = None
 
     if query:
-        buildings = Building.objects.filter(Q(name__icontains=query) | Q(code__icontains=query))
-        rooms = Room.objects.filter(Q(name__icontains=query) | Q(room_number__icontains=query))
-        services = ServicePoint.objects.filter(Q(name__icontains=query) | Q(service_type__icontains=query))
+        try:
+            page = _search_page(request, query, location)
+        except InvalidCursor:
+            request.GET = request.GET.copy()
+            request.GET.pop('cursor')
+            page = _search_page(request, query, location)
         
         # Add model type info to each result for template display
-        for building in buildings:
-            building.model_type = 'Building'
-        for room in rooms:
-            room.model_type = 'Room'
-        for service in services:
-            service.model_type = 'ServicePoint'
-        
-        results = list(buildings) + list(rooms) + list(services)
+        for model_type, obj in page:
+            obj.model_type = model_type
+            results.append(obj)
+        next_page_query = _next_page_query(request, page)
 
     context = {
         'query': query,
         'results': results,
+        'next_page_query': next_page_query,
+        'is_first_page': not request.GET.get('cursor'),
+        'ranked_by_distance': location is not None,
     }
     return render(request, 'search_results.html', context)
 
 
+def _route_steps(path_result):
+    """Step-by-step directions; floors[i] is where step i arrives"""
+    floors = path_result['floors']
+    floor_objects = Floor.objects.in_bulk([f for f in floors if f])
+    steps = []
+    for idx, pathway in enumerate(path_result['pathways'], 1):
+        instruction = f"Take the {PATHWAY_TYPE_LABELS[pathway.pathway_type].lower()}"
+        departure, arrival = floor_objects.get(floors[idx - 1]), floor_objects.get(floors[idx])
+        if departure and arrival and departure.floor_number != arrival.floor_number:
+            instruction += f" to {arrival.floor_name or f'Floor {arrival.floor_number}'}"
+        steps.append({
+            'number': idx,
+            'instruction': instruction,
+            'pathway_type': pathway.pathway_type,
+            'distance': pathway.distance_meters,
+            'time': pathway.estimated_time_minutes,
+        })
+    return steps
+
+
+# Alternative routes shown on the directions page, and the most ?k= may ask for
+DIRECTIONS_ALTERNATIVES = 3
+MAX_ALTERNATIVES = 5
+ALTERNATIVE_COLORS = ['#fd7e14', '#6f42c1', '#20c997', '#d63384']
+
+
+def _alternatives_count(request, param, default):
+    """Clamped route count from the query string"""
+    try:
+        k = int(request.GET.get(param, default))
+    except ValueError:
+        k = default
+    return max(1, min(k, MAX_ALTERNATIVES))
+
+
+def _route_options(request):
+    """(accessibility_required, profile) from the query string"""
+    from .graph import DEFAULT_PROFILE
+    from .routing import PROFILE_NAMES
+    
+    accessibility_required = request.GET.get('accessibility') == 'true'
+    profile = request.GET.get('profile', DEFAULT_PROFILE)
+    if profile not in PROFILE_NAMES:
+        profile = DEFAULT_PROFILE
+    return accessibility_required, profile
+
+
 def directions(request, start_id, end_id):
     """Get directions between two service points"""
+    from .graph import COST_PROFILES
+    from .routing import PathFinder, get_or_create_route
+    
     start_service = get_object_or_404(ServicePoint, id=start_id)
     end_service = get_object_or_404(ServicePoint, id=end_id)
     
-    # Check for accessibility requirement
-    accessibility_required = request.GET.get('accessibility') == 'true'
+    # Check for accessibility requirement and preferred cost profile
+    accessibility_required, profile = _route_options(request)
     
     # Get or calculate route
     route = get_or_create_route(start_id, end_id, accessibility_required)
     
-    # Get pathways for detailed directions
-    pathfinder = PathFinder(accessibility_required=accessibility_required)
-    path_result = pathfinder.find_shortest_path(start_id, end_id)
+    # Best route plus distinct alternatives, each with detailed pathways
+    pathfinder = PathFinder(accessibility_required=accessibility_required, profile=profile)
+    k = _alternatives_count(request, 'alternatives', DIRECTIONS_ALTERNATIVES)
+    routes = pathfinder.find_alternative_routes(start_id, end_id, k=k)
     
-    if not path_result:
+    if not routes:
         context = {'error': 'No accessible route found.'}
         return render(request, 'directions.html', context)
     
-    # Build step-by-step directions
-    steps = []
-    for idx, pathway in enumerate(path_result['pathways'], 1):
-        steps.append({
+    path_result = routes[0]
+    alternatives = [
+        {
             'number': idx,
-            'instruction': f"Take the {pathway.get_pathway_type_display().lower()}",
-            'distance': pathway.distance_meters,
-            'time': pathway.estimated_time_minutes,
-        })
+            'color': ALTERNATIVE_COLORS[(idx - 2) % len(ALTERNATIVE_COLORS)],
+            'distance': alt['distance_meters'],
+            'time': alt['estimated_time_minutes'],
+            'floor_changes': alt['floor_changes'],
+            'extra_distance': alt['distance_meters'] - path_result['distance_meters'],
+        }
+        for idx, alt in enumerate(routes[1:], 2)
+    ]
     
     context = {
         'start_service': start_service,
         'end_service': end_service,
         'route': route,
-        'steps': steps,
+        'steps': _route_steps(path_result),
         'total_distance': path_result['distance_meters'],
         'total_time': path_result['estimated_time_minutes'],
+        'route_coordinates_json': json.dumps(path_result['coordinates']),
+        'alternatives': alternatives,
+        'alternative_routes_json': json.dumps([
+            {'color': alt['color'], 'coordinates': route['coordinates']}
+            for alt, route in zip(alternatives, routes[1:])
+        ]),
         'accessibility_required': accessibility_required,
+        'profile': profile,
+        'profiles': COST_PROFILES,
     }
     return render(request, 'directions.html', context)
 
 
+def _route_json(path_result):
+    return {
+        'path': path_result['path_ids'],
+        'distance_meters': round(path_result['distance_meters'], 2),
+        'estimated_time_minutes': round(path_result['estimated_time_minutes'], 2),
+        'floor_changes': path_result['floor_changes'],
+        'coordinates': path_result['coordinates'],
+        'steps': _route_steps(path_result),
+    }
+
+
+@rate_limit('routing')
+def api_directions(request, start_id, end_id):
+    """
+    API endpoint for routes between two service points.
+    ?profile= picks the cost profile; ?k= returns up to k distinct
+    alternatives (best first); ?pareto=true returns every non-dominated
+    route across the shortest/fastest/sheltered profiles.
+    """
+    from .routing import PathFinder
+    
+    if ServicePoint.objects.filter(id__in=[start_id, end_id]).count() != len({start_id, end_id}):
+        return JsonResponse({'error': 'Service point not found'}, status=404)
+    
+    accessibility_required, profile = _route_options(request)
+    pathfinder = PathFinder(accessibility_required=accessibility_required, profile=profile)
+    
+    if request.GET.get('pareto') == 'true':
+        routes = []
+        for path_result in pathfinder.find_pareto_routes(start_id, end_id):
+            item = _route_json(path_result)
+            item['criteria'] = {name: round(value, 2) for name, value in path_result['criteria'].items()}
+            routes.append(item)
+    elif 'k' in request.GET:
+        k = _alternatives_count(request, 'k', 1)
+        routes = [_route_json(path_result) for path_result in pathfinder.find_alternative_routes(start_id, end_id, k=k)]
+    else:
+        path_result = pathfinder.find_shortest_path(start_id, end_id)
+        routes = [_route_json(path_result)] if path_result else []
+    
+    if not routes:
+        return JsonResponse({'error': 'No route found'}, status=404)
+    
+    return api_response(request, {
+        'start': start_id,
+        'end': end_id,
+        'profile': profile,
+        'accessible': accessibility_required,
+        'routes': routes,
+    })
+
+
+@rate_limit('proximity')
 def api_find_nearest_service(request):
     """API endpoint to find nearest service point"""
+    from .geo import parse_position
+    from .routing import PathFinder
+    
     try:
-        latitude = float(request.GET.get('lat'))
-        longitude = float(request.GET.get('lon'))
+        latitude, longitude = parse_position(request.GET.get('lat'), request.GET.get('lon'))
         service_type = request.GET.get('type', None)
-        radius = int(request.GET.get('radius', 200))
+        radius = min(int(request.GET.get('radius', 200)), NEAREST_MAX_RADIUS)
         accessibility = request.GET.get('accessibility') == 'true'
     except (TypeError, ValueError):
         return JsonResponse({'error': 'Invalid parameters'}, status=400)
+    if radius <= 0:
+        return JsonResponse({'error': 'radius must be a positive number of meters'}, status=400)
+    network = request.GET.get('mode') == 'walking'
     
-    # Create point from coordinates
-    user_location = Point(longitude, latitude, srid=4326)
+    user_location = (latitude, longitude)
     
     # Use pathfinder to find nearest service
     pathfinder = PathFinder(accessibility_required=accessibility)
-    nearest = pathfinder.find_nearest_service(user_location, service_type, radius)
+    nearest = pathfinder.find_nearest_service(user_location, service_type, radius, network=network)
     
     if not nearest:
         return JsonResponse({'error': 'No services found'}, status=404)
     
-    return JsonResponse({
+    return api_response(request, {
         'id': nearest.id,
         'name': nearest.name,
-        'type': nearest.get_service_type_display(),
-        'latitude': float(nearest.latitude),
-        'longitude': float(nearest.longitude),
+        'type': SERVICE_TYPE_LABELS[nearest.service_type],
+        'latitude': nearest.latitude,
+        'longitude': nearest.longitude,
         'description': nearest.description,
         'contact': nearest.contact_phone,
         'office_hours': nearest.office_hours,
+        'distance_meters': round(nearest.distance, 1),
+        'mode': 'walking' if network else 'straight',
     })
 
 
+@rate_limit('proximity')
 def api_nearby_services(request):
     """API endpoint for nearby services"""
+    from .geo import parse_position
+    from .routing import PathFinder
+    
     try:
-        latitude = float(request.GET.get('lat'))
-        longitude = float(request.GET.get('lon'))
+        latitude, longitude = parse_position(request.GET.get('lat'), request.GET.get('lon'))
         service_type = request.GET.get('type', None)
-        radius = int(request.GET.get('radius', 500))
-        limit = int(request.GET.get('limit', 5))
+        radius = min(int(request.GET.get('radius', 500)), NEARBY_MAX_RADIUS)
+        limit = max(1, min(int(request.GET.get('limit', 5)), NEARBY_MAX_LIMIT))
         accessibility = request.GET.get('accessibility') == 'true'
     except (TypeError, ValueError):
         return JsonResponse({'error': 'Invalid parameters'}, status=400)
+    if radius <= 0:
+        return JsonResponse({'error': 'radius must be a positive number of meters'}, status=400)
+    network = request.GET.get('mode') == 'walking'
     
-    user_location = Point(longitude, latitude, srid=4326)
+    user_location = (latitude, longitude)
     
     pathfinder = PathFinder(accessibility_required=accessibility)
-    services = pathfinder.find_nearby_services(user_location, service_type, radius, limit)
+    services = pathfinder.find_nearby_services(user_location, service_type, radius, limit, network=network)
     
-    return JsonResponse({
+    return api_response(request, {
         'services': [
             {
                 'id': s.id,
                 'name': s.name,
-                'type': s.get_service_type_display(),
-                'latitude': float(s.latitude),
-                'longitude': float(s.longitude),
+                'type': SERVICE_TYPE_LABELS[s.service_type],
+                'latitude': s.latitude,
+                'longitude': s.longitude,
+                'distance_meters': round(s.distance, 1),
             }
             for s in services
-        ]
+        ],
+        'mode': 'walking' if network else 'straight',
+    })
+
+
+@rate_limit('routing')
+def api_isochrone(request):
+    """
+    API endpoint for everything reachable within a walking-time budget.
+    Origin is ?from=<service id> or ?lat=&lon=; ?minutes= is the budget,
+    ?type= narrows the services listed and ?bands=1,3,5 adds hulls.
+    """
+    from . import isochrone
+    from .geo import parse_position
+    
+    try:
+        minutes = float(request.GET.get('minutes', 5))
+        bands = [float(b) for b in request.GET.get('bands', '').split(',') if b.strip()]
+        if request.GET.get('from'):
+            point_id, location = int(request.GET['from']), None
+        else:
+            point_id, location = None, parse_position(request.GET.get('lat'), request.GET.get('lon'))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Invalid parameters'}, status=400)
+    if not 0 < minutes <= isochrone.MAX_BUDGET_MINUTES:
+        return JsonResponse({'error': f'minutes must be between 0 and {isochrone.MAX_BUDGET_MINUTES}'}, status=400)
+    if not all(band > 0 for band in bands):
+        return JsonResponse({'error': 'bands must be positive numbers of minutes'}, status=400)
+    if point_id is not None and not ServicePoint.objects.filter(id=point_id).exists():
+        return JsonResponse({'error': 'Service point not found'}, status=404)
+    
+    service_type = request.GET.get('type')
+    accessibility = request.GET.get('accessibility') == 'true'
+    result = isochrone.reachable(minutes, point_id, location, accessibility)
+    points = [row for row in result['points'] if row[1] <= minutes]
+    arrivals = {row[0]: row[1] for row in points}
+    
+    services = ServicePoint.objects.filter(id__in=arrivals)
+    if service_type:
+        services = services.filter(service_type=service_type)
+    
+    return api_response(request, {
+        'origin': {'service_id': point_id} if point_id is not None else {'latitude': location[0], 'longitude': location[1]},
+        'minutes': minutes,
+        'accessible': accessibility,
+        'services': sorted(
+            (
+                {
+                    'id': s['id'],
+                    'name': s['name'],
+                    'type': SERVICE_TYPE_LABELS[s['service_type']],
+                    'service_type': s['service_type'],
+                    'latitude': s['latitude'],
+                    'longitude': s['longitude'],
+                    'minutes': round(arrivals[s['id']], 2),
+                }
+                for s in services.values('id', 'name', 'service_type', 'latitude', 'longitude')
+            ),
+            key=lambda item: item['minutes'],
+        ),
+        'polygons': isochrone.hull_polygons(points, [b for b in bands if b < minutes] + [minutes], location),
+    })
+
+
+def _geofence_fixes(request):
+    """
+    (latitude, longitude) fixes from ?lat=&lon= or a POSTed {"fixes": [[lat, lon], ...]};
+    raises ValueError for any fix that is not a finite position
+    """
+    from .geo import parse_position
+    if request.method == 'POST':
+        fixes = json.loads(request.body)['fixes']
+        return [parse_position(lat, lon) for lat, lon in fixes]
+    return [parse_position(request.GET.get('lat'), request.GET.get('lon'))]
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@rate_limit('proximity')
+def api_geofence(request):
+    """
+    API endpoint for the service areas containing a GPS fix (?lat=&lon=),
+    or each fix of a POSTed batch, e.g. a recorded trace.
+    """
+    from . import geofence
+    
+    try:
+        fixes = _geofence_fixes(request)
+    except (TypeError, ValueError, KeyError):
+        return JsonResponse({'error': 'Invalid parameters'}, status=400)
+    if len(fixes) > geofence.MAX_BATCH_FIXES:
+        return JsonResponse({'error': f'At most {geofence.MAX_BATCH_FIXES} fixes per request'}, status=400)
+    
+    results = geofence.locate(fixes, request.GET.get('type'))
+    services = {
+        row['id']: row
+        for row in ServicePoint.objects.filter(id__in={area[1] for matches in results for area, _ in matches})
+        .values('id', 'name', 'service_type', 'latitude', 'longitude')
+    }
+    
+    def area_json(area, distance):
+        service = services[area[1]]
+        return {
+            'service_id': service['id'],
+            'name': service['name'],
+            'type': SERVICE_TYPE_LABELS[service['service_type']],
+            'service_type': service['service_type'],
+            'radius_meters': area[5],
+            'distance_meters': round(distance, 1),
+        }
+    
+    if request.method == 'GET':
+        return api_response(request, {'areas': [area_json(area, distance) for area, distance in results[0] if area[1] in services]})
+    
+    # Batches list each service once and refer to it by id from every fix
+    return api_response(request, {
+        'fixes': [
+            [
+                {'service_id': area[1], 'distance_meters': round(distance, 1)}
+                for area, distance in matches if area[1] in services
+            ]
+            for matches in results
+        ],
+        'services': {
+            service['id']: {
+                'name': service['name'],
+                'type': SERVICE_TYPE_LABELS[service['service_type']],
+                'service_type': service['service_type'],
+                'latitude': service['latitude'],
+                'longitude': service['longitude'],
+            }
+            for service in services.values()
+        },
     })
 
 
+@rate_limit('search')
+def api_service_points(request):
+    """API endpoint for the filtered service directory, keyset paginated"""
+    services, _ = _filtered_services(request)
+    rows = services.values('id', 'name', 'service_type', 'latitude', 'longitude', 'building__name', 'is_accessible')
+    
+    try:
+        page = paginate_queryset(
+            rows, SERVICE_PAGE_ORDERING,
+            cursor=request.GET.get('cursor'), page_size=get_page_size(request),
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    return api_response(request, {
+        'services': [
+            {
+                'id': s['id'],
+                'name': s['name'],
+                'type': SERVICE_TYPE_LABELS[s['service_type']],
+                'latitude': s['latitude'],
+                'longitude': s['longitude'],
+                'building': s['building__name'],
+                'is_accessible': s['is_accessible'],
+            }
+            for s in page
+        ],
+        'next_cursor': page.next_cursor,
+    })
+
+
+@rate_limit('search')
+def api_search(request):
+    """
+    API endpoint for search, keyset paginated across all result types;
+    ranked by relevance and distance when ?lat=&lon= are given.
+    """
+    query = request.GET.get('q', '')
+    if not query:
+        return JsonResponse({'error': 'Missing q parameter'}, status=400)
+    try:
+        location = _search_location(request)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Invalid parameters'}, status=400)
+    
+    try:
+        page = _search_page(request, query, location)
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    results = []
+    for model_type, obj in page:
+        item = {
+            'type': model_type,
+            'id': obj.id,
+            'name': obj.name,
+            'latitude': obj.latitude,
+            'longitude': obj.longitude,
+        }
+        if model_type == 'Building':
+            item['code'] = obj.code
+        elif model_type == 'Room':
+            item['room_number'] = obj.room_number
+            item['building_id'] = obj.building_id
+        else:
+            item['service_type'] = SERVICE_TYPE_LABELS[obj.service_type]
+        if location:
+            item['distance_meters'] = round(obj.distance, 1)
+            item['score'] = round(obj.score, 4)
+        results.append(item)
+    
+    return api_response(request, {'results': results, 'next_cursor': page.next_cursor})
+
+
+@rate_limit('sync')
+def api_sync(request):
+    """
+    API endpoint for the change feed: everything changed since ?since=
+    (a version from an earlier response; 0 or absent for a full copy), or
+    the next page of a full copy with ?cursor=.
+    """
+    from . import sync
+    
+    try:
+        since = int(request.GET.get('since', 0))
+        limit = int(request.GET.get('limit', sync.DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid parameters'}, status=400)
+    limit = max(1, min(limit, sync.MAX_LIMIT))
+    
+    try:
+        changes = sync.changes_since(since, limit, request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    return api_response(request, changes)
+
+
+@rate_limit('routing')
 def api_route_geometry(request, start_id, end_id):
     """API endpoint to get route geometry (for map display)"""
     route = get_object_or_404(Route, start_point_id=start_id, end_point_id=end_id)
     
     if route.route_geometry:
         coords = list(route.route_geometry.coords)
-        return JsonResponse({
+        return api_response(request, {
             'coordinates': coords,
             'distance': route.distance_meters,
             'time': route.estimated_time_minutes,
@@ -324,6 +809,13 @@ def api_route_geometry(request, start_id, end_id):
     return JsonResponse({'error': 'Route not found'}, status=404)
 
 
+def metrics(request):
+    """Prometheus text endpoint for the in-process performance histograms"""
+    if not perf.is_enabled():
+        raise Http404('Performance instrumentation is disabled')
+    return HttpResponse(perf.registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 # =====================================================
 # AUTHENTICATION VIEWS
 # =====================================================
@@ -0,0 +1,243 @@
+"""
+Route cache warmup.
+
+After a deploy or a data change the first user to ask for a route pays for
+building the routing graph and searching it. Warming does that work ahead
+of time for the pairs people actually ask for ("hot pairs"), which come
+from a list, from web server request logs or from the Route table itself.
+
+Searches run across a process pool: each worker builds (or, with a shared
+graph directory, attaches to) the graph once and returns plain results for
+a chunk of pairs. Only the parent writes to the database, so SQLite never
+sees concurrent writers.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .graph import get_graph
+from .models import Route, ServicePoint
+from .routing import PathFinder
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 50
+DEFAULT_LIMIT = 200
+
+# /directions/<start>/<end>/ and /api/directions/<start>/<end>/, with query string
+DIRECTIONS_URL = re.compile(r'(/(?:api/)?directions/(\d+)/(\d+)/\S*)')
+
+
+def read_pairs(lines):
+    """
+    Hot pairs from lines of "start,end" or "start end", optionally followed
+    by "accessible". Blank lines and # comments are ignored.
+    Returns: list of (start_id, end_id, accessible)
+    """
+    pairs = []
+    for number, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        fields = line.replace(',', ' ').split()
+        try:
+            start, end = int(fields[0]), int(fields[1])
+        except (IndexError, ValueError):
+            raise ValueError(f'Line {number}: expected "start,end[,accessible]", got {line!r}')
+        accessible = len(fields) > 2 and fields[2].lower() in ('1', 'true', 'yes', 'accessible')
+        pairs.append((start, end, accessible))
+    return pairs
+
+
+def mine_log(lines, limit=DEFAULT_LIMIT):
+    """
+    The most requested pairs in web server access log lines (any format
+    that contains the request path).
+    Returns: list of (start_id, end_id, accessible), most requested first
+    """
+    counts = Counter()
+    for line in lines:
+        for url, start, end in DIRECTIONS_URL.findall(line):
+            accessible = parse_qs(urlsplit(url).query).get('accessibility') == ['true']
+            counts[(int(start), int(end), accessible)] += 1
+    return [pair for pair, _ in counts.most_common(limit)]
+
+
+def mine_routes(limit=DEFAULT_LIMIT):
+    """
+    Pairs already in the route cache, most recently used first; warming
+    them refreshes their metrics after a data change.
+    Returns: list of (start_id, end_id, accessible)
+    """
+    rows = Route.objects.order_by('-updated_at').values_list('start_point_id', 'end_point_id', 'is_accessible')
+    return list(rows[:limit])
+
+
+def unique_pairs(pairs):
+    # Route rows are unique per (start, end); the first mention wins
+    seen = set()
+    unique = []
+    for start, end, accessible in pairs:
+        if start != end and (start, end) not in seen:
+            seen.add((start, end))
+            unique.append((start, end, accessible))
+    return unique
+
+
+def compute_routes(pairs):
+    """
+    Search each pair on this process's graph; no database writes.
+    Returns: list of (start_id, end_id, accessible, result or None)
+    """
+    pathfinders = {}
+    results = []
+    for start, end, accessible in pairs:
+        if accessible not in pathfinders:
+            pathfinders[accessible] = PathFinder(accessibility_required=accessible)
+        result = pathfinders[accessible].find_shortest_path(start, end)
+        if result:
+            result = {
+                'distance_meters': result['distance_meters'],
+                'estimated_time_minutes': result['estimated_time_minutes'],
+                'pathways': [pathway.id for pathway in result['pathways']],
+            }
+        results.append((start, end, accessible, result))
+    return results
+
+
+def save_routes(results):
+    """
+    Create or refresh the Route rows for computed pairs in a few bulk
+    queries; returns how many were saved.
+    """
+    results = [row for row in results if row[3]]
+    existing_points = set(ServicePoint.objects.filter(
+        id__in={point for start, end, _, _ in results for point in (start, end)}
+    ).values_list('id', flat=True))
+    results = [row for row in results if row[0] in existing_points and row[1] in existing_points]
+    if not results:
+        return 0
+
+    Through = Route.pathways.through
+    with transaction.atomic():
+        routes = {
+            (route.start_point_id, route.end_point_id): route
+            for route in Route.objects.filter(
+                start_point_id__in={start for start, _, _, _ in results},
+                end_point_id__in={end for _, end, _, _ in results},
+            )
+        }
+        new, changed = [], []
+        for start, end, accessible, result in results:
+            route = routes.get((start, end))
+            if route is None:
+                route = Route(start_point_id=start, end_point_id=end)
+                routes[(start, end)] = route
+                new.append(route)
+            else:
+                changed.append(route)
+            route.distance_meters = result['distance_meters']
+            route.estimated_time_minutes = result['estimated_time_minutes']
+            route.is_accessible = accessible
+
+        Route.objects.bulk_create(new)
+        # bulk_update skips auto_now, so stamp the refresh explicitly
+        now = timezone.now()
+        for route in changed:
+            route.updated_at = now
+        Route.objects.bulk_update(
+            changed, ['distance_meters', 'estimated_time_minutes', 'is_accessible', 'updated_at'],
+        )
+
+        Through.objects.filter(route_id__in=[route.id for route in changed]).delete()
+        Through.objects.bulk_create([
+            Through(route_id=routes[(start, end)].id, pathway_id=pathway_id)
+            for start, end, _, result in results
+            for pathway_id in dict.fromkeys(result['pathways'])
+        ])
+    return len(results)
+
+
+def _chunks(pairs, size):
+    for i in range(0, len(pairs), size):
+        yield pairs[i:i + size]
+
+
+def warm_routes(pairs, processes=None, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Precompute routes for pairs into the route cache.
+
+    processes: worker processes (None = one per CPU, 0 or 1 = in this process)
+    progress: optional callback(done, total) called after each chunk
+
+    Returns: dict with pairs, routed, failed and timing (seconds)
+    """
+    pairs = unique_pairs(pairs)
+    stats = {'pairs': len(pairs), 'routed': 0, 'failed': 0, 'graph_seconds': 0.0, 'total_seconds': 0.0}
+    started = time.perf_counter()
+
+    # Build (or attach to) the graphs here first: in-process warming needs
+    # them anyway, and forked workers inherit them instead of rebuilding
+    for accessible in (False, True):
+        get_graph(accessible)
+    stats['graph_seconds'] = time.perf_counter() - started
+
+    chunks = list(_chunks(pairs, chunk_size))
+    done = 0
+
+    def collect(results):
+        nonlocal done
+        saved = save_routes(results)
+        stats['routed'] += saved
+        stats['failed'] += len(results) - saved
+        done += len(results)
+        if progress:
+            progress(done, len(pairs))
+
+    if (processes is not None and processes <= 1) or len(chunks) <= 1:
+        for chunk in chunks:
+            collect(compute_routes(chunk))
+    else:
+        # Forked children must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processes, mp_context=get_context('fork')) as pool:
+            for results in pool.map(compute_routes, chunks):
+                collect(results)
+
+    stats['total_seconds'] = time.perf_counter() - started
+    return stats
+
+
+def start_background_warmup(limit=None):
+    """
+    Warm the graphs and the most recently used routes in a daemon thread,
+    so the process starts serving immediately.
+    """
+    limit = getattr(settings, 'NAVIGATOR_WARMUP_LIMIT', DEFAULT_LIMIT) if limit is None else limit
+
+    def run():
+        try:
+            # In-process: forking from inside a serving worker is not safe
+            stats = warm_routes(mine_routes(limit), processes=0)
+            logger.info(
+                'Route warmup: %d routed, %d failed in %.2fs',
+                stats['routed'], stats['failed'], stats['total_seconds'],
+            )
+        except Exception:
+            logger.exception('Route warmup failed')
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=run, name='navigator-warmup', daemon=True)
+    thread.start()
+    return thread
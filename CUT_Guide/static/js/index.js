@@ -0,0 +1,46 @@
+// Initialize Leaflet map if element exists
+function initMap(elementId, center, zoom) {
+  const map = L.map(elementId).setView(center, zoom);
+  L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+    attribution: '© OpenStreetMap contributors',
+    maxZoom: 19,
+  }).addTo(map);
+  return map;
+}
+
+// Add marker to map
+function addMarker(map, lat, lon, title, popup) {
+  const marker = L.marker([lat, lon]).addTo(map);
+  if (popup) {
+    marker.bindPopup(popup);
+  }
+  if (title) {
+    marker.bindTooltip(title);
+  }
+  return marker;
+}
+
+// Send the visitor's position with searches so nearer results rank first.
+// Only when location access was already granted: a search never prompts.
+document.querySelectorAll('form[data-geo-search]').forEach(function (form) {
+  if (!navigator.geolocation || !navigator.permissions) {
+    return;
+  }
+  navigator.permissions.query({ name: 'geolocation' }).then(function (status) {
+    if (status.state !== 'granted') {
+      return;
+    }
+    navigator.geolocation.getCurrentPosition(function (position) {
+      ['lat', 'lon'].forEach(function (name, i) {
+        let input = form.querySelector('input[name="' + name + '"]');
+        if (!input) {
+          input = document.createElement('input');
+          input.type = 'hidden';
+          input.name = name;
+          form.appendChild(input);
+        }
+        input.value = (i === 0 ? position.coords.latitude : position.coords.longitude).toFixed(6);
+      });
+    }, function () {}, { maximumAge: 60000, timeout: 5000 });
+  });
+});